@@ -0,0 +1,256 @@
+import os
+import io
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.profiler import Profiler
+from modules.loaders import (
+    clear_cache,
+    load_big_numbers_uf,
+    load_city_cases,
+    load_se_summary,
+    load_semana_epidemiologica,
+)
+from modules.tabnet_parser import read_city_cases
+from modules.workbook_session import WorkbookSession
+from modules.validation import validate_workbook
+from data_transformation_pipeline.stages import STAGES
+from benchmarks.synthetic import SCALES, generate_scale
+
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+REGRESSION_RATIO = 1.25   # median wall time this much slower than the baseline...
+REGRESSION_MIN_DELTA = 0.05  # ...and at least this many seconds slower is a regression
+
+LOADERS = {
+    "load_city_cases": ("city_cases", load_city_cases),
+    "load_semana_epidemiologica": ("semana_epidemiologica", load_semana_epidemiologica),
+    "load_big_numbers_uf": ("big_numbers_uf", load_big_numbers_uf),
+    "load_se_summary": ("SE-Y", load_se_summary),
+}
+
+
+@contextlib.contextmanager
+def _working_dir(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _quiet(verbose):
+    # The transforms log every step; keep the benchmark output readable
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- One repetition ---
+def run_once(workspace, profiler):
+    """
+    Times the loaders (cold), the raw city cases parse, every transform on a fresh copy
+    of the synthetic workbook, the save and the validation.
+
+    :return: ValidationReport of the transformed workbook
+    """
+    # === [1] Loaders, each on an empty cache ===
+    for name, (kind, loader) in LOADERS.items():
+        clear_cache()
+        with profiler.step(name, "loader") as record:
+            result = loader(workspace.paths[kind])
+            record.rows = len(result)
+    with profiler.step("parse_tabnet_city_cases", "prepare") as record:
+        record.rows = len(read_city_cases(workspace.paths["city_cases"]))
+
+    # === [2] Transforms, in pipeline order, starting cold like a run does ===
+    clear_cache()
+    source = os.path.join(workspace.root, "temp", os.path.basename(workspace.workbook))
+    output = os.path.join(workspace.root, "temp", f"Epidemiology_Dengue_{workspace.date}.xlsx")
+    shutil.copy2(workspace.workbook, source)
+    with profiler.step("load_workbook", "transform"):
+        session = WorkbookSession(source, output, patch=True)
+    for stage in STAGES:
+        with profiler.step(stage.name, "transform") as record:
+            record.rows = stage.run(session)
+    with profiler.step("save_workbook", "transform"):
+        session.save()
+
+    # === [3] Validation (sources already parsed, like in main.py) ===
+    report = validate_workbook(output, profiler=profiler)
+    os.remove(output)
+    return report
+
+
+def summarize(runs):
+    """Aggregates the records of every repetition per 'category/name' step."""
+    steps = {}
+    for profiler in runs:
+        for r in profiler.records:
+            steps.setdefault(f"{r['category']}/{r['name']}", []).append(r)
+
+    summary = {}
+    for key, records in steps.items():
+        walls = [r["wall"] for r in records]
+        cpus = [r["cpu"] for r in records if r.get("cpu") is not None]
+        peaks = [r["peak_memory"] for r in records if r.get("peak_memory") is not None]
+        summary[key] = {
+            "wall_median": statistics.median(walls),
+            "wall_min": min(walls),
+            "wall_max": max(walls),
+            "cpu_median": statistics.median(cpus) if cpus else None,
+            "peak_memory": max(peaks) if peaks else None,
+            "rows": records[-1].get("rows"),
+        }
+    return summary
+
+
+def bench_scale(scale, repeat=3, memory=False, workspace_dir=None, seed=0, verbose=False):
+    """
+    Generates the synthetic inputs of one scale and benchmarks them `repeat` times.
+
+    :return: {"params": ..., "validation_passed": bool, "steps": {step: timings}}
+    """
+    root = workspace_dir or tempfile.mkdtemp(prefix=f"dengue_bench_{scale}_")
+    try:
+        with _quiet(verbose):
+            workspace = generate_scale(root, scale, seed)
+        runs, passed = [], True
+        with _working_dir(workspace.root):
+            for i in range(repeat):
+                profiler = Profiler(memory=memory)
+                with _quiet(verbose):
+                    report = run_once(workspace, profiler)
+                runs.append(profiler)
+                if not report.passed:
+                    passed = False
+                    failed = [r.name for r in report.results.values() if not r.passed]
+                    print(f"[WARN] {scale}: validation failed on run {i + 1}: {', '.join(failed)}")
+        return {"params": workspace.params, "validation_passed": passed, "steps": summarize(runs)}
+    finally:
+        if workspace_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+# --- Baseline comparison ---
+def compare(results, baseline, ratio=REGRESSION_RATIO, min_delta=REGRESSION_MIN_DELTA):
+    """
+    Compares median wall times with a previous results file.
+
+    :return: list of (scale, step, baseline seconds, current seconds) that regressed
+    """
+    regressions = []
+    for scale, current in results["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if not previous:
+            continue
+        for step, timing in current["steps"].items():
+            before = previous["steps"].get(step)
+            if not before:
+                continue
+            timing["baseline_wall_median"] = before["wall_median"]
+            timing["ratio"] = timing["wall_median"] / before["wall_median"] if before["wall_median"] else None
+            if timing["wall_median"] > before["wall_median"] * ratio \
+                    and timing["wall_median"] - before["wall_median"] >= min_delta:
+                regressions.append((scale, step, before["wall_median"], timing["wall_median"]))
+    return regressions
+
+
+def print_results(results):
+    for scale, data in results["scales"].items():
+        params = ", ".join(f"{k}={v}" for k, v in data["params"].items())
+        print(f"[BENCH] {scale} ({params})")
+        for step, t in data["steps"].items():
+            line = f"[BENCH]   {step:<45} {t['wall_median']:8.3f}s (min {t['wall_min']:.3f}s)"
+            if t.get("rows") is not None:
+                line += f" {t['rows']:>8} rows"
+            if t.get("peak_memory") is not None:
+                line += f" {t['peak_memory'] / 2**20:7.1f} MiB"
+            if t.get("ratio"):
+                line += f"  x{t['ratio']:.2f} vs baseline"
+            print(line)
+
+
+def write_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the loaders, transforms and validation on synthetic inputs.")
+    parser.add_argument("--scales", default="real", help=f"Comma-separated: {', '.join(SCALES)} (default: real)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scale; medians are reported (default: 3)")
+    parser.add_argument("--memory", action="store_true", help="Also track peak memory per step (slower)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also store these results as the baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 if any step regressed")
+    parser.add_argument("--workspace", help="Keep the generated inputs in this directory (single scale)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show the transforms' own logs")
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+
+    started = datetime.now()
+    results = {
+        "created_at": started.isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "scales": {},
+    }
+    for scale in scales:
+        print(f"[INFO] Benchmarking scale '{scale}' ({args.repeat} run(s))...")
+        results["scales"][scale] = bench_scale(scale, args.repeat, args.memory, args.workspace,
+                                               args.seed, args.verbose)
+
+    regressions = []
+    has_baseline = os.path.exists(args.baseline)
+    if has_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+
+    print_results(results)
+    path = write_results(results, os.path.join(RESULTS_DIR, f"bench_{started.strftime('%Y_%m_%d_%H%M%S')}.json"))
+    print(f"[INFO] Results written to {path}")
+    if args.save_baseline:
+        print(f"[INFO] Baseline saved to {write_results(results, args.baseline)}")
+
+    for scale, step, before, now in regressions:
+        print(f"[REGRESSION] {scale} {step}: {before:.3f}s -> {now:.3f}s (x{now / before:.2f})")
+    if has_baseline and not regressions:
+        print("[SUCCESS] No regressions against the baseline.")
+    elif not has_baseline and not args.save_baseline:
+        print("[INFO] No baseline to compare against (use --save-baseline).")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+import os
+import sys
+import shutil
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yaml
+from openpyxl import load_workbook
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import get_latest_epidemiology_file, current_date, SOURCE_DIR
+from modules.sheet_writer import write_columns, clear_rows
+
+
+# IBGE code prefix and number of municipalities of each UF (5,570 in total)
+UF_MUNICIPALITIES = {
+    "RO": (11, 52), "AC": (12, 22), "AM": (13, 62), "RR": (14, 15), "PA": (15, 144),
+    "AP": (16, 16), "TO": (17, 139), "MA": (21, 217), "PI": (22, 224), "CE": (23, 184),
+    "RN": (24, 167), "PB": (25, 223), "PE": (26, 185), "AL": (27, 102), "SE": (28, 75),
+    "BA": (29, 417), "MG": (31, 853), "ES": (32, 78), "RJ": (33, 92), "SP": (35, 645),
+    "PR": (41, 399), "SC": (42, 295), "RS": (43, 497), "MS": (50, 79), "MT": (51, 141),
+    "GO": (52, 246), "DF": (53, 1),
+}
+TOTAL_MUNICIPALITIES = sum(n for _, n in UF_MUNICIPALITIES.values())
+
+# Sizes of the generated inputs; 'real' matches a current snapshot
+SCALES = {
+    "real": dict(municipalities=TOTAL_MUNICIPALITIES, se_rows=10_000, informe_rows=120),
+    "medium": dict(municipalities=TOTAL_MUNICIPALITIES, se_rows=40_000, informe_rows=500),
+    "large": dict(municipalities=TOTAL_MUNICIPALITIES, se_rows=100_000, informe_rows=2_000),
+}
+
+NEW_WEEKS = 2       # weeks of the snapshot not yet in the workbook (appended by se_completa)
+REVISED_WEEKS = 4   # last weeks already in the workbook whose counts change (updated in place)
+
+
+class SyntheticWorkspace:
+    """
+    A throwaway project tree (output/, temp/, _results/) with one synthetic snapshot,
+    laid out like the real one so the transforms and the validation run unchanged
+    with `root` as the working directory.
+    """
+
+    def __init__(self, root, date, params):
+        self.root = os.path.abspath(root)
+        self.date = date
+        self.params = params
+        self.snapshot_dir = os.path.join(self.root, "output", f"dengue_{date}")
+        self.workbook = os.path.join(self.root, "_results", "Epidemiology_Dengue_synthetic.xlsx")
+        self.paths = {}  # artifact kind -> generated file
+
+
+def _rng(seed):
+    return np.random.default_rng(seed)
+
+
+def _published_uf(name):
+    # The dashboards publish 'Mato Grosso Do Sul', the workbook has 'Mato Grosso do Sul'
+    return name.replace(" do ", " Do ").replace(" de ", " De ")
+
+
+def _en_us(value, decimals=0):
+    return f"{value:,.{decimals}f}"
+
+
+# --- Inputs ---
+def municipalities(n=TOTAL_MUNICIPALITIES, seed=0):
+    """
+    Synthetic municipalities with valid 6-digit IBGE codes (UF prefix + 4 digits), spread
+    over the UFs like the real ones, and heavy-tailed probable case counts.
+
+    :return: DataFrame ['Cod Mun', 'Nome Mun', 'Casos Provaveis', 'UF']
+    """
+    rng = _rng(seed)
+    scale = n / TOTAL_MUNICIPALITIES
+    rows = []
+    for sigla, (prefix, count) in UF_MUNICIPALITIES.items():
+        for i in range(max(1, round(count * scale))):
+            rows.append((f"{prefix}{i * 10 + 10:04d}", f"MUNICIPIO {sigla} {i + 1:04d}", sigla))
+    df = pd.DataFrame(rows[:n], columns=["Cod Mun", "Nome Mun", "UF"])
+    df["Casos Provaveis"] = rng.lognormal(3.5, 1.6, len(df)).astype("int64")
+    return df[["Cod Mun", "Nome Mun", "Casos Provaveis", "UF"]]
+
+
+def write_raw_city_cases(path, df):
+    """Writes municipalities as a raw Tabnet export (the cityCases fetcher output)."""
+    lines = [
+        "Dengue - Notificações registradas no Sistema de Informação de Agravos de Notificação - Brasil",
+        "Casos Prováveis por Município de residência",
+        f"Período:{current_date[:4]}",
+        '"Município de residência";"Casos_Prováveis"',
+    ]
+    lines += [f'"{cod} {nome}";{casos}' for cod, nome, casos in
+              zip(df["Cod Mun"], df["Nome Mun"], df["Casos Provaveis"])]
+    lines += [
+        '"000000 Município ignorado - AC";-',
+        f'"Total";{int(df["Casos Provaveis"].sum())}',
+        '"Fonte: Ministério da Saúde/SVSA - Sistema de Informação de Agravos de Notificação - Sinan Net"',
+        '"Notas:"',
+    ]
+    with open(path, "w", encoding="latin1", newline="\r\n") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def epidemiological_weeks(n_weeks, last_year, last_week):
+    """The `n_weeks` 'YYYY/WW' weeks ending at last_year/last_week (52 weeks per year)."""
+    weeks = []
+    year, week = last_year, last_week
+    for _ in range(n_weeks):
+        weeks.append(f"{year}/{week:02d}")
+        week -= 1
+        if week == 0:
+            year, week = year - 1, 52
+    return weeks[::-1]
+
+
+def weekly_cases(ufs, se_rows, last_year, last_week, seed=0):
+    """
+    Cases per UF and epidemiological week, ~`se_rows` rows ordered by week then UF like
+    the semana_epidemiologica export.
+
+    :return: DataFrame ['UF', 'Ano/Semana', 'Casos prováveis de Dengue']
+    """
+    rng = _rng(seed + 1)
+    weeks = epidemiological_weeks(max(NEW_WEEKS + 1, -(-se_rows // len(ufs))), last_year, last_week)
+    # Seasonal curve (peak around week 12) scaled per UF
+    week_numbers = np.array([int(w[5:]) for w in weeks])
+    season = 1 + 9 * np.exp(-((week_numbers - 12) % 52) / 8)
+    uf_scale = rng.uniform(5, 500, len(ufs))
+    casos = rng.poisson(np.outer(season, uf_scale)).astype("int64")
+    return pd.DataFrame({
+        "UF": np.tile(ufs, len(weeks)),
+        "Ano/Semana": np.repeat(weeks, len(ufs)),
+        "Casos prováveis de Dengue": casos.ravel(),
+    })
+
+
+def write_semana_epidemiologica(path, df):
+    out = df.copy()
+    out["UF"] = out["UF"].map(_published_uf)
+    out["Ano/Semana"] = out["Ano/Semana"] + " "  # the export pads the week
+    out.to_csv(path, index=False, encoding="utf-8")
+
+
+def big_numbers(ufs, seed=0):
+    """Per-UF metrics in the big_numbers_uf YAML layout (en-US numbers as strings)."""
+    rng = _rng(seed + 2)
+    data = {}
+    for uf, casos in zip(ufs, rng.integers(500, 400_000, len(ufs))):
+        data[uf] = {
+            "Casos prováveis de Dengue": _en_us(casos),
+            "Óbitos em investigação": str(rng.integers(0, 50)),
+            "Óbitos por Dengue": _en_us(rng.integers(0, 400)),
+            "Coeficiente de incidência": _en_us(rng.uniform(10, 3000), 1),
+        }
+    return data
+
+
+def se_summary(uf_data, week):
+    casos = sum(int(v["Casos prováveis de Dengue"].replace(",", "")) for v in uf_data.values())
+    obitos = sum(int(v["Óbitos por Dengue"].replace(",", "")) for v in uf_data.values())
+    return {
+        "All_Semanas_Data": {
+            "Casos prováveis de Dengue": _en_us(casos),
+            "Coeficiente de incidência": f"{casos / 2_130_000:.1f}".replace(".", ","),
+            "Letalidade (óbito) em casos graves": "4.55",
+            "Letalidade (óbito) em casos prováveis": f"{100 * obitos / max(casos, 1):.2f}",
+            "Óbitos em investigação": str(sum(int(v["Óbitos em investigação"]) for v in uf_data.values())),
+            "Óbitos por Dengue": _en_us(obitos),
+        },
+        "Last_Epidemiological_Week": str(week),
+    }
+
+
+def _dump_yaml(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+
+
+# --- Workbook ---
+def _sheet_ufs(wb):
+    rows = wb["Big Numbers UF"].iter_rows(min_row=2, min_col=2, max_col=2, values_only=True)
+    return [value.strip() for (value,) in rows if isinstance(value, str) and value.strip()]
+
+
+def _fill_se_completa(ws, weekly):
+    """History of every week but the NEW_WEEKS last ones; the REVISED_WEEKS before them differ."""
+    weeks = weekly["Ano/Semana"].unique()
+    history = weekly[weekly["Ano/Semana"].isin(weeks[:-NEW_WEEKS])].reset_index(drop=True)
+    revised = history["Ano/Semana"].isin(weeks[-NEW_WEEKS - REVISED_WEEKS:-NEW_WEEKS])
+    casos = history["Casos prováveis de Dengue"].to_numpy().copy()
+    casos[revised.to_numpy()] = (casos[revised.to_numpy()] * 0.9).astype("int64")
+    history["Casos prováveis de Dengue"] = casos
+
+    clear_rows(ws, 2)
+    write_columns(ws, history, 2, {"UF": 1, "Ano/Semana": 2, "Casos prováveis de Dengue": 3})
+
+
+def _fill_informe(ws, n_rows, last_date, last_week):
+    """`n_rows` weekly bulletins ending the week before the snapshot, styled like the last template row."""
+    template = [c.value for c in ws[ws.max_row]]
+    dates = [last_date - timedelta(days=7 * (n_rows - i)) for i in range(n_rows)]
+    weeks = epidemiological_weeks(n_rows, last_date.year, max(last_week - 1, 1))
+    columns = {
+        "informe": [f"SE {int(w[5:])}" for w in weeks],
+        "data": dates,
+        "incidencia": [template[2]] * n_rows,
+        "casos": [template[3]] * n_rows,
+        "municipios": [template[4]] * n_rows,
+        "graves": [0] * n_rows,
+        "obitos_investigacao": [template[6]] * n_rows,
+        "obitos": [template[7]] * n_rows,
+        "letalidade": [f"=H{row}/D{row}" for row in range(2, n_rows + 2)],
+        "variacao": [0] * n_rows,
+    }
+    clear_rows(ws, 2)
+    write_columns(ws, columns, 2, {name: col for col, name in enumerate(columns, start=1)})
+
+
+def _ensure_year_column(ws, year):
+    headers = [ws.cell(row=1, column=col).value for col in range(1, ws.max_column + 1)]
+    if str(year) not in map(str, headers):
+        col = ws.max_column + 1
+        ws.cell(row=1, column=col, value=year)
+        for row in range(2, 14):
+            ws.cell(row=row, column=col, value=0)
+
+
+def build_workbook(path, weekly, informe_rows, last_week, template=None):
+    """
+    Copy of the latest real workbook with years of 'SE Completa' and 'Informe Semana
+    Epidemiologica' history, saved to `path`.
+    """
+    template = template or get_latest_epidemiology_file(os.path.join(BASE_DIR, SOURCE_DIR))
+    wb = load_workbook(template)
+    today = datetime.now()
+    _fill_se_completa(wb["SE Completa"], weekly)
+    _fill_informe(wb["Informe Semana Epidemiologica"], informe_rows, today, last_week)
+    _ensure_year_column(wb["Dengue Cases Year"], today.year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wb.save(path)
+    return path
+
+
+# --- Workspace ---
+def generate_workspace(root, municipalities_count=TOTAL_MUNICIPALITIES, se_rows=10_000,
+                       informe_rows=120, seed=0, template=None):
+    """
+    Generates a complete synthetic snapshot dated today (the transforms look up today's
+    city cases file) under `root`.
+
+    :param root: Directory of the workspace (created; an existing one is replaced)
+    :param municipalities_count: Municipalities in city_cases (5,570 = all of Brazil)
+    :param se_rows: Rows of semana_epidemiologica (27 UFs x weeks)
+    :param informe_rows: Weekly bulletins already in 'Informe Semana Epidemiologica'
+    :param seed: Random seed (same seed, same files)
+    :param template: Workbook to start from (default: latest one in _results/)
+    :return: SyntheticWorkspace
+    """
+    params = dict(municipalities=municipalities_count, se_rows=se_rows, informe_rows=informe_rows, seed=seed)
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    workspace = SyntheticWorkspace(root, current_date, params)
+    for folder in (workspace.snapshot_dir, os.path.join(workspace.root, "temp"), os.path.dirname(workspace.workbook)):
+        os.makedirs(folder, exist_ok=True)
+
+    template = template or get_latest_epidemiology_file(os.path.join(BASE_DIR, SOURCE_DIR))
+    ufs = _sheet_ufs(load_workbook(template, read_only=True))
+    today = datetime.now()
+    last_week = min(today.isocalendar().week, 52)
+
+    # === [1] City cases (raw Tabnet export) ===
+    city_df = municipalities(municipalities_count, seed)
+    workspace.paths["city_cases"] = os.path.join(workspace.snapshot_dir, f"city_cases_{current_date}.csv")
+    write_raw_city_cases(workspace.paths["city_cases"], city_df)
+
+    # === [2] Weekly cases per UF ===
+    weekly = weekly_cases(ufs, se_rows, today.year, last_week, seed)
+    workspace.paths["semana_epidemiologica"] = os.path.join(workspace.snapshot_dir, f"semana_epidemiologica_{current_date}.yaml")
+    write_semana_epidemiologica(workspace.paths["semana_epidemiologica"], weekly)
+
+    # === [3] Big numbers and national summary ===
+    uf_data = big_numbers(ufs, seed)
+    workspace.paths["big_numbers_uf"] = os.path.join(workspace.snapshot_dir, f"big_numbers_uf_{current_date}.yaml")
+    _dump_yaml(workspace.paths["big_numbers_uf"], uf_data)
+    workspace.paths["SE-Y"] = os.path.join(workspace.snapshot_dir, f"SE-Y-{last_week}_{current_date}.yaml")
+    _dump_yaml(workspace.paths["SE-Y"], se_summary(uf_data, last_week))
+
+    # === [4] Workbook with history ===
+    build_workbook(workspace.workbook, weekly, informe_rows, last_week, template)
+    print(f"[INFO] Synthetic workspace in {workspace.root}: {len(city_df)} municipalities, "
+          f"{len(weekly)} weekly rows, {informe_rows} bulletins")
+    return workspace
+
+
+def generate_scale(root, scale, seed=0):
+    """generate_workspace with one of the SCALES presets."""
+    params = SCALES[scale]
+    return generate_workspace(root, params["municipalities"], params["se_rows"],
+                              params["informe_rows"], seed)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.synthetic <dir> [real|medium|large]
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.synthetic <dir> [" + "|".join(SCALES) + "]")
+        sys.exit(1)
+    generate_scale(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "real")
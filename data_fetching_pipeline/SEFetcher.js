@@ -1,7 +1,7 @@
 const fs = require('fs');
 const yaml = require('js-yaml');
 const path = require('path');
-const { navigateToDengue, generateDatedFilename, extractCardsData } = require('./utils');
+const { navigateToDengue, generateDatedFilename, extractCardsData, runDateStr } = require('./utils');
 
 async function SEFetcher() {
     let browser;
@@ -113,7 +113,7 @@ async function SEFetcher() {
             All_Semanas_Data: cardData
         };
 
-        const dateStr = new Date().toISOString().split('T')[0].replace(/-/g, '_');
+        const dateStr = runDateStr();
         const outputDir = path.join(__dirname, '..', 'output', `dengue_${dateStr}`);
         fs.mkdirSync(outputDir, { recursive: true });
         const filePath = generateDatedFilename(`SE-Y-${lastWeek}`, "yaml", outputDir);
@@ -133,5 +133,8 @@ async function SEFetcher() {
 module.exports = { SEFetcher };
 
 if (require.main === module) {
-    SEFetcher().catch(console.error);
+    SEFetcher().catch((err) => {
+        console.error(err);
+        process.exitCode = 1;
+    });
 }
\ No newline at end of file
@@ -1,7 +1,7 @@
 const fs = require('fs');
 const yaml = require('js-yaml');
 const path = require('path');
-const { navigateToDengue, generateDatedFilename, extractCardsData } = require('./utils');
+const { navigateToDengue, generateDatedFilename, extractCardsData, runDateStr } = require('./utils');
 
 async function ensureDropdownOpen(page, selector) {
     const dropdown = page.locator(selector);
@@ -104,7 +104,7 @@ async function bigNumbersUF() {
             }
         }
 
-        const dateStr = new Date().toISOString().split('T')[0].replace(/-/g, '_');
+        const dateStr = runDateStr();
         const outputDir = path.join(__dirname, '..', 'output', `dengue_${dateStr}`);
         const outputPath = generateDatedFilename('big_numbers_uf', 'yaml', outputDir);
         fs.mkdirSync(outputDir, { recursive: true });
@@ -123,5 +123,8 @@ async function bigNumbersUF() {
 module.exports = { bigNumbersUF };
 
 if (require.main === module) {
-    bigNumbersUF().catch(console.error);
+    bigNumbersUF().catch((err) => {
+        console.error(err);
+        process.exitCode = 1;
+    });
 }
\ No newline at end of file
@@ -1,6 +1,7 @@
 const { chromium } = require('playwright');
 const fs = require('fs');
 const path = require('path');
+const { runDateStr } = require('./utils');
 
 /**
  * Downloads the Dengue CSV from Datasus Tabnet with "Município de residência" selected.
@@ -8,7 +9,7 @@ const path = require('path');
 async function cityCases() {
     const scriptDir = __dirname;
     const projectRoot = path.resolve(scriptDir, '..');
-    const timestamp = new Date().toISOString().slice(0, 10).replace(/-/g, '_'); // "yyyy_mm_dd"
+    const timestamp = runDateStr(); // "yyyy_mm_dd"
     const outputDir = path.join(projectRoot, 'output', `dengue_${timestamp}`);
 
     // Ensure output directory exists
@@ -64,4 +65,11 @@ async function cityCases() {
     await browser.close();
 }
 
-module.exports = { cityCases };
\ No newline at end of file
+module.exports = { cityCases };
+
+if (require.main === module) {
+    cityCases().catch((err) => {
+        console.error(err);
+        process.exitCode = 1;
+    });
+}
\ No newline at end of file
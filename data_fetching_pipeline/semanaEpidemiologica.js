@@ -1,7 +1,7 @@
 const fs = require("fs");
 const path = require("path");
 const { exec } = require("child_process");
-const { navigateToDengueHeadless, generateDatedFilename } = require("./utils");
+const { navigateToDengueHeadless, generateDatedFilename, runDateStr } = require("./utils");
 
 function parseCopiedData(header, rawData) {
     const lines = rawData.trim().split("\n");
@@ -122,7 +122,7 @@ async function semanaEpidemiologica() {
             }
         }
 
-        const dateStr = new Date().toISOString().split('T')[0].replace(/-/g, '_');
+        const dateStr = runDateStr();
         const outputDir = path.join(__dirname, '..', 'output', `dengue_${dateStr}`);
         fs.mkdirSync(outputDir, { recursive: true });
 
@@ -143,5 +143,8 @@ async function semanaEpidemiologica() {
 module.exports = { semanaEpidemiologica };
 
 if (require.main === module) {
-    semanaEpidemiologica().catch(console.error);
+    semanaEpidemiologica().catch((err) => {
+        console.error(err);
+        process.exitCode = 1;
+    });
 }
\ No newline at end of file
@@ -35,6 +35,15 @@ async function navigateToDengueHeadless() {
     return { browser, page };
 }
 
+/**
+ * Data da execução no formato YYYY_MM_DD.
+ * Usa DENGUE_RUN_DATE quando definido (o orquestrador Python passa a data da execução).
+ * @returns {string}
+ */
+function runDateStr() {
+    return process.env.DENGUE_RUN_DATE || new Date().toISOString().split('T')[0].replace(/-/g, '_');
+}
+
 /**
  * Gera um nome de arquivo com data no formato YYYY_MM_DD
  * @param {string} baseName
@@ -43,8 +52,7 @@ async function navigateToDengueHeadless() {
  * @returns {string}
  */
 function generateDatedFilename(baseName, extension, outputDir = 'output') {
-    const today = new Date();
-    const dateStr = today.toISOString().split('T')[0].replace(/-/g, '_');
+    const dateStr = runDateStr();
     const filename = `${baseName}_${dateStr}.${extension}`;
     return path.join(outputDir, filename);
 }
@@ -104,5 +112,6 @@ module.exports = {
     navigateToDengue,
     navigateToDengueHeadless,
     generateDatedFilename,
-    extractCardsData
+    extractCardsData,
+    runDateStr
 };
\ No newline at end of file
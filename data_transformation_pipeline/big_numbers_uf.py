@@ -1,16 +1,13 @@
-import yaml, os, openpyxl, sys
+import os, sys
 
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from modules.utils import (
-    find_latest_file_in_subfolders,
-    get_latest_epidemiology_file,
-    OUTPUT_DIR,
-    TEMP_DIR
-)
+from modules.workbook_session import run_in_session
+from modules.loaders import load_big_numbers_uf
+from modules.sheet_writer import write_columns
 
 def normalize_key(key: str) -> str:
     return (
@@ -20,67 +17,50 @@ def normalize_key(key: str) -> str:
            .lower()
     )
 
-def big_numbers_uf():
+def big_numbers_uf(session=None):
+    if session is None:
+        return run_in_session(big_numbers_uf)
+
     # === [1] Carrega YAML mais recente no padrão big_numbers_uf_*.yaml ===
     try:
-        yaml_path = find_latest_file_in_subfolders('big_numbers_uf_*.yaml', output_dir=OUTPUT_DIR)
+        yaml_path = session.artifact('big_numbers_uf_*.yaml')
     except FileNotFoundError as e:
         print(f"[ERROR] YAML file not found: {e}")
         return
 
-    with open(yaml_path, "r", encoding="utf-8") as f:
-        yaml_data = yaml.safe_load(f)
-
-    yaml_data_normalized = {
-        normalize_key(k): v for k, v in yaml_data.items()
-    }
+    uf_data = load_big_numbers_uf(yaml_path)
+    session.add_table("big_numbers_uf", uf_data.reset_index())
+    uf_data.index = uf_data.index.map(normalize_key)
 
-    # === [2] Carrega planilha mais recente ===
+    # === [2] Pega a aba da planilha aberta na sessão ===
     try:
-        excel_path = get_latest_epidemiology_file(TEMP_DIR)
-        wb = openpyxl.load_workbook(excel_path)
-        ws = wb["Big Numbers UF"]
-    except FileNotFoundError:
-        print(f"[ERROR] Excel file not found in: {TEMP_DIR}")
-        return
+        ws = session.sheet("Big Numbers UF")
     except KeyError:
-        print(f"[ERROR] Sheet 'Big Numbers UF' not found in {excel_path}")
+        print(f"[ERROR] Sheet 'Big Numbers UF' not found in {session.source_path}")
         return
 
     # === [3] Mapeamento das colunas na planilha ===
     col_map = {
-        'casos prováveis de dengue': 'G',
-        'coeficiente de incidência': 'K',
-        'óbitos em investigação': 'P',
-        'óbitos por dengue': 'Q',
+        'casos_provaveis': 'G',
+        'incidencia': 'K',
+        'obitos_investigacao': 'P',
+        'obitos': 'Q',
     }
 
-    # === [4] Itera sobre os estados ===
-    for row in ws.iter_rows(min_row=2):
-        estado_nome = row[1].value.strip() if row[1].value else None  # Coluna B
-        estado_normalizado = normalize_key(estado_nome) if estado_nome else None
-
-        if not estado_normalizado or estado_normalizado not in yaml_data_normalized:
-            continue
+    # === [4] Alinha os estados da planilha (coluna B, a partir da linha 2) com o YAML ===
+    first_row = 2
+    estados = [
+        normalize_key(cell.value.strip()) if isinstance(cell.value, str) and cell.value.strip() else None
+        for cell in ws['B'][first_row - 1:]
+    ]
+    updates = uf_data.reindex(estados).reset_index(drop=True)
+    col_map = {metric: col for metric, col in col_map.items() if metric in updates}
 
-        dados_estado = yaml_data_normalized[estado_normalizado]
-        for campo_yaml, valor in dados_estado.items():
-            campo_normalizado = normalize_key(campo_yaml)
-            for key_map, col_letter in col_map.items():
-                if key_map in campo_normalizado:
-                    if col_letter == 'G':
-                        valor_limpo = int(str(valor).replace('.', '').replace(',', ''))
-                        ws[f"{col_letter}{row[0].row}"] = valor_limpo
-                    else:
-                        try:
-                            valor_convertido = float(str(valor).replace(',', '.'))
-                            ws[f"{col_letter}{row[0].row}"] = valor_convertido
-                        except ValueError:
-                            print(f"[WARN] Valor inválido '{valor}' para {estado_nome} - {campo_yaml}")
+    # === [5] Escreve as colunas de uma vez (células sem valor ficam intactas) ===
+    write_columns(ws, updates, first_row, col_map, skip_na=True)
 
-    # === [5] Salva planilha modificada ===
-    wb.save(excel_path)
-    print(f"✅ Planilha atualizada: {excel_path}")
+    print(f"✅ Aba '{ws.title}' atualizada")
+    return int(updates[list(col_map)].notna().any(axis=1).sum())
 
 if __name__ == "__main__":
     big_numbers_uf()
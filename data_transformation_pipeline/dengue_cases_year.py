@@ -1,64 +1,31 @@
-import os, yaml, sys
-from datetime import datetime
-from openpyxl import load_workbook
+import os, sys
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from modules.utils import (
-    get_latest_epidemiology_file, OUTPUT_DIR, TEMP_DIR
-)
+from modules.workbook_session import run_in_session
+from modules.loaders import load_big_numbers_uf
 
 
-def normalize_key(key):
-    return key.split(":")[0].strip().lower()
+def dengue_cases_year(session=None):
+    if session is None:
+        return run_in_session(dengue_cases_year)
 
-def parse_int(value):
-    if value is None:
-        return 0
-    try:
-        return int(str(value).replace('.', '').replace(',', ''))
-    except ValueError:
-        return 0
-
-def dengue_cases_year():
     # === [1] Locate the most recent YAML file ===
     try:
-        yaml_path = next(
-            f for f in sorted(
-                (os.path.join(root, file)
-                 for root, _, files in os.walk(OUTPUT_DIR)
-                 for file in files if file.startswith("big_numbers_uf_") and file.endswith(".yaml")),
-                reverse=True
-            )
-        )
-    except StopIteration:
+        yaml_path = session.artifact('big_numbers_uf_*.yaml')
+    except FileNotFoundError:
         print("[ERROR] No YAML file found.")
         return
 
-    with open(yaml_path, "r", encoding="utf-8") as f:
-        yaml_data = yaml.safe_load(f)
+    uf_data = load_big_numbers_uf(yaml_path)
+    total_casos = int(uf_data["casos_provaveis"].sum()) if "casos_provaveis" in uf_data else 0
 
-    total_casos = 0
-    for estado, dados in yaml_data.items():
-        if isinstance(dados, dict):
-            for campo_yaml, valor in dados.items():
-                if normalize_key(campo_yaml) == "casos prováveis de dengue":
-                    total_casos += parse_int(valor)
-                    break
-
-    # === [2] Locate the latest Excel epidemiology file ===
+    # === [2] Get the sheet from the session workbook ===
     try:
-        excel_path = get_latest_epidemiology_file(TEMP_DIR)
-    except FileNotFoundError:
-        print(f"[ERROR] No Excel file found in {TEMP_DIR}")
-        return
-
-    wb = load_workbook(excel_path)
-    try:
-        ws = wb["Dengue Cases Year"]
+        ws = session.sheet("Dengue Cases Year")
     except KeyError:
-        print(f"[ERROR] Sheet 'Dengue Cases Year' not found in {excel_path}")
+        print(f"[ERROR] Sheet 'Dengue Cases Year' not found in {session.source_path}")
         return
 
     # === [3] Map month to row (January = 2, ..., December = 13) ===
@@ -67,8 +34,8 @@ def dengue_cases_year():
         'may': 6, 'june': 7, 'july': 8, 'august': 9,
         'september': 10, 'october': 11, 'november': 12, 'december': 13
     }
-    current_year = datetime.now().year
-    current_month = datetime.now().strftime("%B").lower()
+    current_year = session.run_date.year
+    current_month = session.run_date.strftime("%B").lower()
 
     # === [4] Find column for current year ===
     year_col = None
@@ -89,8 +56,16 @@ def dengue_cases_year():
         return
 
     ws.cell(row=row, column=year_col, value=total_casos)
-    wb.save(excel_path)
+
+    # === [6] Whole month x year grid as written, for the columnar export ===
+    session.add_table("dengue_cases_year", [
+        {"ano": ws.cell(row=1, column=col).value, "mes": month_row - 1,
+         "casos_provaveis": ws.cell(row=month_row, column=col).value}
+        for col in range(2, ws.max_column + 1) if str(ws.cell(row=1, column=col).value or "").strip().isdigit()
+        for month_row in month_row_map.values()
+    ])
     print(f"[SUCCESS] Inserted {total_casos} into 'Dengue Cases Year' -> row {row}, col {year_col} ({current_month.capitalize()} {current_year})")
+    return len(uf_data)
 
 
 if __name__ == "__main__":
@@ -1,106 +1,92 @@
-import os, sys, re, yaml
-import pandas as pd
+import os, sys, re
+import numpy as np
 from datetime import datetime
-from openpyxl import load_workbook
 from openpyxl.styles import Alignment
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from modules.utils import (
-    find_latest_file_in_subfolders,
-    get_latest_epidemiology_file,
-    OUTPUT_DIR,
-    DENGUE_DIR,
-    TEMP_DIR
-)
+from modules.workbook_session import run_in_session
+from modules.loaders import load_city_cases, load_se_summary
+from modules.sheet_writer import register_column_style, write_columns, clear_rows
 
-today_str = datetime.now().strftime("%Y_%m_%d")
-file_name = f"city_cases_{today_str}.csv"
+def city_cases(csv_path):
 
-def city_cases():
-
-    municipios = pd.read_csv(OUTPUT_DIR + DENGUE_DIR + file_name)
+    municipios = load_city_cases(csv_path)
     numero_de_municipios = municipios["Cod Mun"].count()
     return numero_de_municipios
 
-def informe_semana_epidemiologica():
+def incidence_display(value):
+    """Incidence as shown in the sheet: pt-BR text, e.g. 713.5 -> '713,5'."""
+    return np.format_float_positional(value, trim='-').replace('.', ',')
+
+def sheet_number(value):
+    """Number in a cell of the sheet: as is, pt-BR text ('713,5') or a sum like '=6533585-7'; None otherwise."""
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value or "").strip()
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    if re.fullmatch(r"\d+,\d+", text):
+        return float(text.replace(',', '.'))
+    if re.fullmatch(r"=\d+([+-]\d+)+", text):
+        return sum(int(term) for term in re.findall(r"[+-]?\d+", text[1:]))
+    return None
+
+def informe_record(ws, row, data):
+    """One weekly row of the sheet, with the columns of the export (modules.export)."""
+    number = lambda col: sheet_number(ws.cell(row=row, column=col).value)
+    return {
+        'se': int(re.match(r"SE (\d+)", str(ws.cell(row=row, column=1).value)).group(1)),
+        'data': data,
+        'casos_provaveis': number(4),
+        'incidencia': number(3),
+        'municipios': number(5),
+        'obitos_investigacao': number(7),
+        'obitos': number(8),
+    }
+
+def informe_semana_epidemiologica(session=None):
+    if session is None:
+        return run_in_session(informe_semana_epidemiologica)
+
     # Step 1: Find the latest SE-Y-*.yaml file
     try:
-        yaml_path = find_latest_file_in_subfolders('SE-Y-*.yaml', output_dir=OUTPUT_DIR)
+        yaml_path = session.artifact('SE-Y-*.yaml')
     except FileNotFoundError as e:
         print(f"Error: {e}")
         return
 
-    try:
-        with open(yaml_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-    except FileNotFoundError:
-        print(f"Error: YAML file not found at {yaml_path}")
-        return
-
-    # Normalize 'Coeficiente de incidência'
-    for key in data.get('All_Semanas_Data', {}):
-        if "Coeficiente de incidência" in key:
-            value = data['All_Semanas_Data'][key]
-            if '.' in value:
-                data['All_Semanas_Data'][key] = value.replace('.', ',')
-            break
-
-    # Save YAML
-    with open(yaml_path, 'w', encoding='utf-8') as f:
-        yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
-    print("Updated YAML")
-
-    # Step 2: Extract values
-    se_number = data.get('Last_Epidemiological_Week')
-    all_semanas_data = data.get('All_Semanas_Data', {})
+    # Step 2: Extract values (parsed and typed by the loader)
+    summary = load_se_summary(yaml_path)
+    se_number = summary.get('se')
 
-    if not se_number or not all_semanas_data:
+    if not se_number:
         print("Error: Missing key data in YAML.")
         return
 
-    print("Keys in All_Semanas:")
-    for key, value in all_semanas_data.items():
+    print("Metrics in All_Semanas:")
+    for key, value in summary.items():
         print(f"- '{key}': '{value}'")
 
-    # Metrics parsing
-    required_metrics = {
-        "Casos prováveis de Dengue": None,
-        "Coeficiente de incidência": None,
-        "Óbitos em investigação": None,
-        "Óbitos por Dengue": None
-    }
-
-    for key, value in all_semanas_data.items():
-        key_normalized = key.encode().decode('utf-8', errors='replace')
-        for metric in required_metrics:
-            if metric in key_normalized:
-                required_metrics[metric] = value
-
-    if any(v is None for v in required_metrics.values()):
+    required_metrics = ("casos_provaveis", "incidencia", "obitos_investigacao", "obitos")
+    missing = [k for k in required_metrics if summary.get(k) is None]
+    if missing:
         print("Missing required metrics in YAML:")
-        for k, v in required_metrics.items():
-            if v is None:
-                print(f"- {k}")
+        for k in missing:
+            print(f"- {k}")
         return
 
-    try:
-        casos_provaveis = int(required_metrics["Casos prováveis de Dengue"].replace(',', ''))
-        incidencia_display = required_metrics["Coeficiente de incidência"].replace('.', ',').rstrip('-')
-        obitos_investigacao = int(required_metrics["Óbitos em investigação"].replace(',', ''))
-        obitos = int(required_metrics["Óbitos por Dengue"].replace(',', ''))
-    except ValueError as e:
-        print(f"Error converting values: {e}")
-        return
+    casos_provaveis = summary["casos_provaveis"]
+    incidencia_display = incidence_display(summary["incidencia"])
+    obitos_investigacao = summary["obitos_investigacao"]
+    obitos = summary["obitos"]
 
-    # Step 3: Load Excel
+    # Step 3: Get sheet from the session workbook (loaded from TEMP)
     try:
-        excel_path = get_latest_epidemiology_file('_results')
-        wb = load_workbook(excel_path)
-        ws = wb['Informe Semana Epidemiologica']
-    except (FileNotFoundError, KeyError) as e:
+        ws = session.sheet('Informe Semana Epidemiologica')
+    except KeyError as e:
         print(f"Error loading workbook or sheet: {e}")
         return
 
@@ -126,33 +112,51 @@ def informe_semana_epidemiologica():
     next_row = last_row + 1
     print(f"[INFO] Selected last row: {last_row} → Writing to row: {next_row}")
 
-    # Step 5: Write new row
-    ws.cell(row=next_row, column=1, value=f"SE {se_number}")
-    ws.cell(row=next_row, column=2, value=datetime.now()).number_format = 'dd-mmm-yyyy'
-    ws.cell(row=next_row, column=3, value=incidencia_display)
-    ws.cell(row=next_row, column=4, value=casos_provaveis).number_format = '#,##0'
-    ws.cell(row=next_row, column=5, value=city_cases()).number_format = '#,##0'
-    ws.cell(row=next_row, column=6, value=0)
-    ws.cell(row=next_row, column=7, value=obitos_investigacao)
-    ws.cell(row=next_row, column=8, value=obitos)
-    ws.cell(row=next_row, column=9, value=f"=H{next_row}/D{next_row}").number_format = '0.00%'
-    ws.cell(row=next_row, column=10, value=0).number_format = '0%'
-
-    # Step 6: Center alignment
-    center = Alignment(horizontal='center')
-    for col in range(1, 11):
-        ws.cell(row=next_row, column=col).alignment = center
+    # Step 5: Write new row (one named style per column, based on the previous row)
+    new_row = {
+        'informe_se': f"SE {se_number}",
+        'informe_data': session.run_date,
+        'informe_incidencia': incidencia_display,
+        'informe_casos': casos_provaveis,
+        'informe_municipios': city_cases(session.artifact(f"city_cases_{session.date_str}.csv")),
+        'informe_graves': 0,
+        'informe_obitos_investigacao': obitos_investigacao,
+        'informe_obitos': obitos,
+        'informe_letalidade': f"=H{next_row}/D{next_row}",
+        'informe_variacao': 0,
+    }
+    number_formats = {
+        'informe_data': 'dd-mmm-yyyy',
+        'informe_casos': '#,##0',
+        'informe_municipios': '#,##0',
+        'informe_letalidade': '0.00%',
+        'informe_variacao': '0%',
+    }
 
-    # Step 7: Clear excess rows
+    center = Alignment(horizontal='center')
+    columns, styles = {}, {}
+    for col, name in enumerate(new_row, start=1):
+        columns[name] = col
+        styles[name] = register_column_style(
+            session.wb, name,
+            alignment=center,
+            number_format=number_formats.get(name),
+            template=ws.cell(row=last_row, column=col),
+        )
+    write_columns(ws, {name: [value] for name, value in new_row.items()}, next_row, columns, styles)
+    # The whole weekly history as in the sheet, not only this run's row, for the columnar export
+    history = sorted((row, data) for row, data in valid_rows if row <= last_row)
+    session.add_table("informe_semana_epidemiologica", [
+        informe_record(ws, row, data) for row, data in history + [(next_row, session.run_date)]
+    ])
+
+    # Step 6: Clear excess rows
     if next_row + 1 <= ws.max_row:
-        ws.delete_rows(next_row + 1, ws.max_row - next_row)
+        clear_rows(ws, next_row + 1)
         print(f"[INFO] Cleared rows from {next_row + 1} to {ws.max_row}")
 
-    # Step 8: Save
-    today_str = datetime.now().strftime("%Y_%m_%d")
-    output_path = os.path.join(TEMP_DIR, f"Epidemiology_Dengue_{today_str}.xlsx")
-    wb.save(output_path)
-    print(f"✅ Excel file updated and saved to {output_path}")
+    print(f"✅ Sheet '{ws.title}' updated (row {next_row})")
+    return 1
 
 
 if __name__ == "__main__":
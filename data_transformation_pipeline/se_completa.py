@@ -1,93 +1,71 @@
 import os, sys
-import pandas as pd
-from openpyxl import load_workbook
 
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from modules.utils import (
-    find_latest_file_in_subfolders,
-    get_latest_epidemiology_file,
-    OUTPUT_DIR,
-    TEMP_DIR
-)
+from modules.workbook_session import run_in_session
+from modules.loaders import load_semana_epidemiologica
+from modules.sheet_writer import upsert_rows
+
+KEY_FIELDS = ("UF", "Ano/Semana")
+
+def se_completa(session=None):
+    if session is None:
+        return run_in_session(se_completa)
 
-def se_completa():
     # === [1] Encontrar o arquivo CSV mais recente (semana_epidemiologica_*.yaml) ===
     try:
-        yaml_path = find_latest_file_in_subfolders('semana_epidemiologica_*.yaml', output_dir=OUTPUT_DIR)
+        yaml_path = session.artifact('semana_epidemiologica_*.yaml')
     except FileNotFoundError as e:
         print(f"[ERROR] YAML/CSV file not found: {e}")
         return
 
     # === [2] Carregar os dados CSV ===
-    df_yaml = pd.read_csv(yaml_path, dtype=str)
-    df_yaml.columns = df_yaml.columns.str.strip()
-    df_yaml['Ano/Semana'] = df_yaml['Ano/Semana'].str.strip().str.replace('\xa0', '', regex=False)
-    df_yaml["Casos prováveis de Dengue"] = pd.to_numeric(df_yaml["Casos prováveis de Dengue"], errors="coerce")
+    df_yaml = load_semana_epidemiologica(yaml_path)
 
-    # === [3] Encontrar o Excel mais recente ===
+    # === [3] Pegar a aba da planilha aberta na sessão ===
     try:
-        excel_path = get_latest_epidemiology_file(TEMP_DIR)
-        wb = load_workbook(excel_path)
-        ws = wb["SE Completa"]
-    except FileNotFoundError:
-        print(f"[ERROR] Excel file not found in: {TEMP_DIR}")
-        return
+        ws = session.sheet("SE Completa")
     except KeyError:
-        print(f"[ERROR] Sheet 'SE Completa' not found in {excel_path}")
+        print(f"[ERROR] Sheet 'SE Completa' not found in {session.source_path}")
         return
 
-    # === [4] Identificar a linha de cabeçalho e coluna 'Ano/Semana' ===
+    # === [4] Identificar a linha de cabeçalho e as colunas que batem com o CSV ===
     header_row = None
-    ano_semana_col = None
-
     for row in ws.iter_rows(min_row=1, max_row=10):
-        for cell in row:
-            if cell.value and str(cell.value).strip().lower() == "ano/semana":
-                header_row = cell.row
-                ano_semana_col = cell.column
-                break
-        if header_row:
+        if any(cell.value and str(cell.value).strip().lower() == "ano/semana" for cell in row):
+            header_row = row[0].row
             break
 
-    if not ano_semana_col:
+    if not header_row:
         raise Exception("Column 'Ano/Semana' not found in Excel sheet.")
 
-    start_ano_semana = df_yaml['Ano/Semana'].iloc[0]
-
-    # === [5] Encontrar a linha no Excel correspondente ao primeiro 'Ano/Semana' ===
-    start_row = None
-    for row in ws.iter_rows(min_row=header_row + 1, max_col=ano_semana_col):
-        cell = row[ano_semana_col - 1]
-        if cell.value and str(cell.value).strip() == start_ano_semana:
-            start_row = cell.row
-            break
-
-    if not start_row:
-        raise Exception(f"Starting Ano/Semana '{start_ano_semana}' not found in Excel.")
-
-    # === [6] Mapear colunas do Excel que batem com o CSV ===
     col_map = {}
     for cell in ws[header_row]:
         header = str(cell.value).strip() if cell.value else None
         if header in df_yaml.columns:
             col_map[header] = cell.column
 
-    # === [7] Escrever dados na planilha
-    for i, yaml_row in df_yaml.iterrows():
-        excel_row = start_row + i
-        for col_name, col_idx in col_map.items():
-            val = yaml_row[col_name]
-            if col_name == "Casos prováveis de Dengue":
-                val = int(val) if pd.notna(val) else None
-            ws.cell(row=excel_row, column=col_idx, value=val)
-
-    # === [8] Salvar planilha ===
-    wb.save(excel_path)
-    print(f"✅ Planilha '{ws.title}' atualizada a partir da linha {start_row} (Ano/Semana: {start_ano_semana})")
+    missing = [key for key in KEY_FIELDS if key not in col_map]
+    if missing:
+        raise Exception(f"Key columns {missing} not found in Excel sheet.")
+
+    # === [5] Índice (UF, Ano/Semana) -> linha, montado uma vez por sessão ===
+    index = session.row_index(ws.title, [col_map[key] for key in KEY_FIELDS], header_row + 1)
+    if index.duplicates:
+        # Só a primeira linha (a mais acima) de cada chave repetida é atualizada; as cópias ficam como estão
+        sample = ", ".join("/".join(map(str, key)) for key in index.duplicate_keys[:3])
+        print(f"[WARN] {index.duplicates} linha(s) duplicada(s) de (UF, Ano/Semana) em '{ws.title}' "
+              f"(ex.: {sample}); só a primeira de cada chave é atualizada.")
+
+    # === [6] Upsert: atualiza só as células alteradas e acrescenta as semanas novas em bloco ===
+    updated, appended = upsert_rows(ws, df_yaml, index, KEY_FIELDS, col_map)
+    session.add_table("se_completa", df_yaml)
+
+    print(f"✅ Planilha '{ws.title}' atualizada: {updated} célula(s) alterada(s), {appended} linha(s) nova(s)")
+    return len(df_yaml)
 
 if __name__ == "__main__":
     se_completa()
@@ -0,0 +1,45 @@
+import importlib
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One transform of the pipeline and what it depends on.
+
+    :param name: Function name, also the module name in data_transformation_pipeline/
+    :param sheet: Sheet of the workbook the stage writes to
+    :param inputs: Artifact patterns (under output/dengue_*/) the stage reads
+    :param params: Optional callable of the run date (None: now) returning extra values the output depends on
+    :param after: Stages that must have written their sheet before this one (see modules.scheduler)
+    """
+    name: str
+    sheet: str
+    inputs: tuple = ()
+    params: object = field(default=None, compare=False)
+    after: tuple = ()
+
+    def load(self):
+        """Imports the transform lazily and returns the function."""
+        module = importlib.import_module(f"data_transformation_pipeline.{self.name}")
+        return getattr(module, self.name)
+
+    def run(self, session):
+        return self.load()(session)
+
+
+def _current_month(run_date=None):
+    # dengue_cases_year writes into the cell of the run's month/year
+    return {"month": (run_date or datetime.now()).strftime("%Y_%m")}
+
+
+STAGES = (
+    Stage("informe_semana_epidemiologica", "Informe Semana Epidemiologica",
+          inputs=("SE-Y-*.yaml", "city_cases_*.csv")),
+    Stage("big_numbers_uf", "Big Numbers UF", inputs=("big_numbers_uf_*.yaml",)),
+    Stage("se_completa", "SE Completa", inputs=("semana_epidemiologica_*.yaml",)),
+    Stage("update_city_cases", "City Cases", inputs=("city_cases_*.csv",)),
+    Stage("dengue_cases_year", "Dengue Cases Year", inputs=("big_numbers_uf_*.yaml",),
+          params=_current_month),
+)
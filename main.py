@@ -1,64 +1,366 @@
-import time, subprocess
-from pathlib import Path
+import os
+import sys
+import time
+import argparse
+import importlib
 from datetime import datetime
 
+# Only light modules here: pandas, openpyxl and yaml are imported by the commands that need them
 from modules.utils import (
     ensure_directories_exist,
     get_latest_epidemiology_file,
     copy_latest_file_to_temp,
     SOURCE_DIR,
+    OUTPUT_DIR,
+    TEMP_DIR,
+    current_date,
 )
-from modules.cityCasesFormatter import city_cases_formatter
+from modules.profiler import Profiler, profiler_from_env
 
-from data_transformation_pipeline.informe_semana_epidemiologica import informe_semana_epidemiologica
-from data_transformation_pipeline.big_numbers_uf import big_numbers_uf
-from data_transformation_pipeline.se_completa import se_completa
-from data_transformation_pipeline.update_city_cases import update_city_cases
-from data_transformation_pipeline.dengue_cases_year import dengue_cases_year
+from data_transformation_pipeline.stages import STAGES
 
 
-def main():
-    start = time.time()
-    print(f"[START] Data pipeline started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+# Third-party libraries imported first, so --timings shows their share of the startup
+HEAVY_IMPORTS = ("pandas", "openpyxl", "yaml")
 
-    base_dir = Path(__file__).resolve().parent
 
-    # 1. Run JS scraping
-    js_file_path = (base_dir / "data_fetching_pipeline" / "main.js").resolve()
-    try:
-        subprocess.run(["node", str(js_file_path)], check=True)
-        print("[INFO] JavaScript pipeline executed successfully.")
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] JavaScript pipeline failed: {e}")
-        return
+def lazy_import(profiler, *names):
+    """Imports the modules a command needs, one 'import' step per first import (see --timings)."""
+    modules = []
+    for name in names:
+        if name in sys.modules:
+            modules.append(sys.modules[name])
+            continue
+        with profiler.step(name, "import"):
+            modules.append(importlib.import_module(name))
+    return modules if len(modules) > 1 else modules[0]
 
-    # 2. Prepare data
-    city_cases_formatter()
+
+# --- Pipeline steps (shared by `run` and the single-step commands) ---
+def fetch(profiler, date=current_date, browser=False):
+    """
+    Runs the Python fetchers (Tabnet and Power BI clients); artifacts already fetched for `date`
+    are reused. Returns True if all succeeded.
+
+    :param browser: Run the Playwright scrapers instead (see fetch_orchestrator.fetch_command)
+    """
+    orchestrator = lazy_import(profiler, "modules.fetch_orchestrator")
+    with profiler.step("fetch_all", "fetch"):
+        results = orchestrator.fetch_all(date=date, profiler=profiler, browser=browser)
+    failed = orchestrator.failed_steps(results)
+    if failed:
+        print(f"[ERROR] Fetchers failed: {', '.join(failed)}. Rerun to retry only those.")
+        return False
+    print("[INFO] Fetchers executed successfully.")
+    return True
+
+
+def prepare(profiler, date=current_date, pinned=False):
+    """
+    Formats the raw city cases and keeps the history database and the deltas in sync.
+
+    :param pinned: Format the city cases of `date` instead of the latest ones (--date)
+    """
+    lazy_import(profiler, *HEAVY_IMPORTS)
+    formatter, history_store, deltas = lazy_import(
+        profiler, "modules.cityCasesFormatter", "modules.history_store", "modules.deltas")
+
+    with profiler.step("city_cases_formatter", "prepare") as record:
+        record.rows = formatter.city_cases_formatter(date if pinned else None)
     ensure_directories_exist()
-    get_latest_epidemiology_file(SOURCE_DIR)
-    copy_latest_file_to_temp()
+
+    # Keep the history database in sync with today's artifacts (idempotent per snapshot)
+    with profiler.step("ingest_snapshot", "prepare") as record:
+        try:
+            record.rows = sum(history_store.ingest_snapshot(date).values())
+        except Exception as e:
+            print(f"[WARN] Could not ingest snapshot {date} into the history database: {e}")
+
+    # What changed since the previous snapshot (output/_deltas/), compact and cheap to report on
+    with profiler.step("compute_delta", "prepare"):
+        try:
+            deltas.compute_delta(date)
+        except Exception as e:
+            print(f"[WARN] Could not compute the delta of snapshot {date}: {e}")
+
+
+def transform(profiler, run_date=None, stages=None, force=False):
+    """
+    Runs the stages on a copy of the latest published workbook and saves it to TEMP.
+
+    :param run_date: Read the artifacts of that day's snapshot (default: the latest ones)
+    :param stages: Stages to run (default: every stage whose inputs or sheet changed)
+    :param force: Run `stages` even if nothing changed
+    :return: (path of the workbook in TEMP, names of the stages that failed), or (None, [])
+             if there was nothing to do
+    """
+    lazy_import(profiler, *HEAVY_IMPORTS)
+    incremental, workbook_session, scheduler = lazy_import(
+        profiler, "modules.incremental", "modules.workbook_session", "modules.scheduler")
+    source_workbook = get_latest_epidemiology_file(SOURCE_DIR)
+
+    # Skip stages whose inputs and target sheet didn't change since the last successful run
+    with profiler.step("plan_stages", "prepare"):
+        to_run, skipped = incremental.plan_stages(stages or STAGES, source_workbook, force=force,
+                                                  run_date=run_date)
+    for stage in skipped:
+        print(f"[SKIP] {stage.name}: inputs and '{stage.sheet}' unchanged")
+    if not to_run:
+        print("[SUCCESS] Nothing changed since the last run. Workbook is up to date.")
+        return None, []
+
+    with profiler.step("copy_to_temp", "prepare"):
+        copy_latest_file_to_temp()
+
+    # Inputs parsed in parallel with the workbook load, then one write at a time; one save
+    session, outcomes = scheduler.run_stages(
+        to_run, lambda: workbook_session.WorkbookSession(patch=True, run_date=run_date),
+        run_date=run_date, profiler=profiler)
+    if session.touched:
+        with profiler.step("save_workbook", "transform"):
+            session.save()
+    # Typed Parquet/Feather + JSON summary of what was written, published with the workbook
+    if session.tables:
+        export = lazy_import(profiler, "modules.export")
+        with profiler.step("export_tables", "transform") as record:
+            export.export_tables(session.tables, session.run_date)
+            record.rows = len(session.tables)
+    failed = scheduler.failed_stages(outcomes)
+    for name in failed:
+        print(f"[ERROR] Stage {name} {outcomes[name].status}: {outcomes[name].error}")
+    return session.output_path, failed
+
+
+def validate(profiler, workbook, run_date=None):
+    """Validates a workbook against its sources (in-process, sources already parsed by a run)."""
+    lazy_import(profiler, *HEAVY_IMPORTS)
+    validation = lazy_import(profiler, "modules.validation")
+    print("[INFO] Validating workbook...")
+    report = validation.validate_workbook(workbook, profiler=profiler, run_date=run_date)
+    report.print_summary()
+    return report
+
+
+def publish(profiler, workbook, date=current_date, run_date=None):
+    """
+    Moves a validated workbook to _results/, records the stage fingerprints and stores the snapshot
+    (validation.publish_run, shared with watch mode). Older snapshots are only compacted on demand:
+    python -m modules.deltas compact.
+
+    :param run_date: Date the workbook was built for (None: the latest artifacts)
+    """
+    validation = lazy_import(profiler, "modules.validation")
+    return validation.publish_run(workbook, STAGES, date, OUTPUT_DIR, run_date, profiler)
+
+
+def run_pipeline(profiler, run_date=None, skip_fetch=False, force=False, browser=False):
+    """
+    Full chain: fetch -> format -> transform -> validate -> publish.
+
+    :return: (ok, workbook): True if published (or nothing changed), and the workbook the run
+        published or left in TEMP (None if it built none)
+    """
+    date = run_date.strftime("%Y_%m_%d") if run_date else current_date
+
+    # 1. Fetch over HTTP (Tabnet and Power BI clients run concurrently; artifacts already fetched today are reused)
+    if not skip_fetch and not fetch(profiler, date, browser):
+        return False, None
+
+    # 2. Prepare data
+    prepare(profiler, date, pinned=run_date is not None)
 
     # 3. Transform data
-    informe_semana_epidemiologica()
-    big_numbers_uf()
-    se_completa()
-    update_city_cases()
-    dengue_cases_year()
+    workbook, failed = transform(profiler, run_date, force=force)
+    if workbook is None:
+        return True, None
+    if failed:
+        print(f"[ERROR] {len(failed)} stage(s) failed. Output files will remain in TEMP.")
+        return False, workbook
+
+    # 4. VALIDATION (in-process: one read-only workbook load, sources already parsed by the transforms)
+    report = validate(profiler, workbook, run_date)
+    if not report.passed:
+        print("[ERROR] Some checks failed. Review logs above. Output files will remain in TEMP.")
+        return False, workbook
+    final_path = publish(profiler, workbook, date, run_date)
+    print("[SUCCESS] All checks passed. Pipeline is valid and complete.")
+    return True, final_path
+
+
+# --- Commands ---
+def _stages(names):
+    by_name = {stage.name: stage for stage in STAGES}
+    return [by_name[name] for name in names] if names else None
+
+
+def _temp_workbook(args, profiler):
+    lazy_import(profiler, *HEAVY_IMPORTS)
+    validation = lazy_import(profiler, "modules.validation")
+    workbook = args.workbook or validation.latest_temp_workbook()
+    if not workbook:
+        print(f"[ERROR] No Excel file found in {TEMP_DIR}")
+    return workbook
+
+
+def cmd_run(args, profiler):
+    print(f"[START] Data pipeline started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    start = time.time()
+    ok, workbook = False, None
+    try:
+        ok, workbook = run_pipeline(profiler, args.run_date, args.skip_fetch, args.force, args.browser)
+    finally:
+        # Per-step trace in output/_profile/ (DENGUE_PROFILE=1 adds memory + Chrome trace)
+        profiler.summary()
+        for path in profiler.write(chrome=profiler.memory):
+            print(f"[INFO] Trace written to {path}")
+        # Cross-run history (output/_metrics/history.jsonl) and what moved against previous runs
+        try:
+            metrics_history = lazy_import(profiler, "modules.metrics_history")
+            metrics_history.record_run(profiler, args.date, "passed" if ok else "failed", workbook=workbook)
+        except Exception as e:
+            print(f"[WARN] Could not record the run's metrics: {e}")
+        if "modules.artifact_cache" in sys.modules:
+            stats = sys.modules["modules.artifact_cache"].CACHE.stats()
+            print(f"[INFO] Artifact cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+                  f"{stats['bytes'] / 2**20:.1f} MiB in {stats['entries']} entries")
+    print(f"[END] Pipeline completed in {time.time() - start:.2f} seconds at "
+          f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    return 0 if ok else 1
+
+
+def cmd_fetch(args, profiler):
+    return 0 if fetch(profiler, args.date, args.browser) else 1
+
+
+def cmd_format(args, profiler):
+    prepare(profiler, args.date, pinned=args.run_date is not None)
+    return 0
+
+
+def cmd_transform(args, profiler):
+    workbook, failed = transform(profiler, args.run_date, _stages(args.stage), force=args.force or bool(args.stage))
+    if workbook and not failed:
+        print(f"[INFO] Next: python main.py validate {workbook}")
+    return 1 if failed else 0
+
+
+def cmd_validate(args, profiler):
+    workbook = _temp_workbook(args, profiler)
+    if not workbook:
+        return 1
+    return 0 if validate(profiler, workbook, args.run_date).passed else 1
+
+
+def cmd_publish(args, profiler):
+    workbook = _temp_workbook(args, profiler)
+    if not workbook:
+        return 1
+    # Never publish a workbook that doesn't pass validation
+    if not validate(profiler, workbook, args.run_date).passed:
+        print("[ERROR] Some checks failed. The workbook stays in TEMP.")
+        return 1
+    publish(profiler, workbook, args.date, args.run_date)
+    return 0
+
+
+def cmd_watch(args, profiler):
+    watch = lazy_import(profiler, "modules.watch")
+    watch.watch(debounce=args.debounce, use_watchdog=not args.poll)
+    return 0
+
+
+def cmd_report(args, profiler):
+    metrics_history = lazy_import(profiler, "modules.metrics_history")
+    findings = metrics_history.report(window=args.window, threshold=args.threshold,
+                                      rows_threshold=args.rows_threshold, min_seconds=args.min_seconds)
+    return 1 if findings else 0
+
+
+def _run_date(value):
+    try:
+        return datetime.strptime(value, "%Y_%m_%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY_MM_DD")
+
+
+def build_parser():
+    # Accepted before or after the command; SUPPRESS keeps a subcommand from resetting them
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--date", dest="run_date", type=_run_date, default=argparse.SUPPRESS, metavar="YYYY_MM_DD",
+                        help="Snapshot date YYYY_MM_DD to work on (default: today / the latest artifacts)")
+    common.add_argument("--timings", action="store_true", default=argparse.SUPPRESS,
+                        help="Print import and step timings at the end")
+
+    parser = argparse.ArgumentParser(
+        description="Dengue data pipeline: fetch -> format -> transform -> validate -> publish.",
+        parents=[common])
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    run = commands.add_parser("run", parents=[common], help="Full pipeline (default when no command is given)")
+    run.add_argument("--skip-fetch", action="store_true", help="Use the artifacts already in output/")
+    run.add_argument("--force", action="store_true", help="Run every stage even if its inputs didn't change")
+    run.set_defaults(handler=cmd_run)
+
+    fetch_cmd = commands.add_parser("fetch", parents=[common],
+                                    help="Run the fetchers (Tabnet and Power BI clients) only")
+    fetch_cmd.set_defaults(handler=cmd_fetch)
+    # Fallback for when the clients' model names or form fields no longer match the sites
+    for command in (run, fetch_cmd):
+        command.add_argument("--browser", action="store_true",
+                             help="Fetch with the Playwright scrapers in data_fetching_pipeline/ (needs Node.js)")
+    commands.add_parser("format", parents=[common],
+                        help="Format city cases, update the history database and deltas").set_defaults(handler=cmd_format)
+
+    transform_cmd = commands.add_parser("transform", parents=[common], help="Run stages into a workbook in TEMP")
+    transform_cmd.add_argument("--stage", action="append", choices=[s.name for s in STAGES],
+                               help="Stage to run (repeatable; default: the stages whose inputs changed)")
+    transform_cmd.add_argument("--force", action="store_true", help="Run every stage even if its inputs didn't change")
+    transform_cmd.set_defaults(handler=cmd_transform)
+
+    for name, handler, text in (("validate", cmd_validate, "Validate a workbook (default: the latest in TEMP)"),
+                                ("publish", cmd_publish, "Validate, then move a workbook from TEMP to _results/")):
+        command = commands.add_parser(name, parents=[common], help=text)
+        command.add_argument("workbook", nargs="?", help="Epidemiology_Dengue_*.xlsx")
+        command.set_defaults(handler=handler)
+
+    watch_cmd = commands.add_parser("watch", parents=[common], help="Update the workbook whenever artifacts change")
+    watch_cmd.add_argument("--debounce", type=float, default=0.5, help="Seconds of quiet before updating (default: 0.5)")
+    watch_cmd.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed")
+    watch_cmd.set_defaults(handler=cmd_watch)
+
+    report_cmd = commands.add_parser("report", parents=[common],
+                                     help="Trend of past runs; flags steps/row counts that moved (exit 1)")
+    # Same options as python -m modules.metrics_history, without importing it for --help
+    report_cmd.add_argument("--window", type=int, default=8, help="Previous runs in the rolling median (default: 8)")
+    report_cmd.add_argument("--threshold", type=float, default=0.5,
+                            help="Relative duration change to flag (default: 0.5)")
+    report_cmd.add_argument("--rows-threshold", type=float, default=0.1,
+                            help="Relative row count change to flag (default: 0.1)")
+    report_cmd.add_argument("--min-seconds", type=float, default=0.5,
+                            help="Ignore duration changes smaller than this (default: 0.5)")
+    report_cmd.set_defaults(handler=cmd_report)
+    return parser
 
-    # 4. TESTS
-    print("[INFO] Running validation tests...")
-    test_result = subprocess.run(["pytest", "test/test.py", "-v"], cwd=base_dir)
 
-    if test_result.returncode != 0:
-        print("[ERROR] Some tests failed. Review logs above. Output files will remain in TEMP.")
-        return
-    else:
-        print("[SUCCESS] All tests passed. Pipeline is valid and complete.")
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(["run", *(argv if argv is not None else sys.argv[1:])])
+    args.run_date = getattr(args, "run_date", None)
+    args.timings = getattr(args, "timings", False)
+    args.date = args.run_date.strftime("%Y_%m_%d") if args.run_date else current_date
 
-    end = time.time()
-    elapsed = end - start
-    print(f"[END] Pipeline completed in {elapsed:.2f} seconds at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    # The full run always profiles (output/_profile/); single commands only with --timings
+    profiler = profiler_from_env() if args.command == "run" else Profiler()
+    code = args.handler(args, profiler)
+    if args.timings:
+        if args.command != "run":
+            profiler.summary()
+        imports = [r for r in profiler.records if r["category"] == "import"]
+        print(f"[TIMINGS] {len(imports)} lazy import(s): {sum(r['wall'] for r in imports):.3f}s")
+    return code
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
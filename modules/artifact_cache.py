@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# Memory cap of the process-wide cache (DENGUE_CACHE_MB=0 disables it)
+DEFAULT_MAX_MB = 512
+
+
+def sizeof(value):
+    """Approximate memory held by a cached value (DataFrames/Series measured deeply)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ArtifactCache:
+    """
+    Parsed artifacts of this process, keyed by (name, path, mtime, size) so that a file
+    rewritten on disk is never served stale, with LRU eviction under a memory cap.
+
+    Loaders go through `get_or_load`; writers `put` what they just wrote, so the next
+    stage gets the in-memory value without reading the file back.
+
+    :param max_bytes: Memory cap; values bigger than it are never cached
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(name, path):
+        stat = os.stat(path)
+        return name, os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def get_or_load(self, name, path, load):
+        """
+        Cached value of `load(path)` for the current version of the file.
+
+        :param name: What is cached for the path (e.g. the loader name)
+        :param load: Called with `path` on a miss
+        """
+        key = self.key(name, path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        value = load(path)
+        self._store(key, value)
+        return value
+
+    def put(self, name, path, value):
+        """Caches `value` for the file just written at `path` (call after the write)."""
+        self._store(self.key(name, path), value)
+        return value
+
+    def _store(self, key, value):
+        size = sizeof(value)
+        with self._lock:
+            # Older versions of the same file are unreachable from now on
+            for old in [k for k in self._entries if k[:2] == key[:2] and k != key]:
+                self._drop(old)
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def invalidate(self, path):
+        """Drops every value cached for `path`."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == path]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"entries": len(self), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+CACHE = ArtifactCache(int(float(os.environ.get("DENGUE_CACHE_MB", DEFAULT_MAX_MB)) * 2**20))
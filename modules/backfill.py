@@ -0,0 +1,172 @@
+import os
+import io
+import re
+import sys
+import time
+import shutil
+import argparse
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import OUTPUT_DIR, SOURCE_DIR, TEMP_DIR
+from modules.manifest import load_manifest, ARTIFACT_KINDS
+
+
+BACKFILL_DIR = os.path.join(TEMP_DIR, "backfill")
+DATE_FORMAT = "%Y_%m_%d"
+
+
+def snapshot_dates(start=None, end=None, output_dir=OUTPUT_DIR):
+    """
+    Snapshot dates ('YYYY_MM_DD') of output/dengue_* between `start` and `end` (inclusive).
+
+    :return: {date: [artifact kinds missing from that snapshot]}
+    """
+    artifacts = load_manifest(output_dir)["artifacts"]
+    dates = sorted({date for entries in artifacts.values() for date in entries})
+    return {
+        date: [kind for kind in ARTIFACT_KINDS if date not in artifacts.get(kind, {})]
+        for date in dates
+        if (start is None or date >= start) and (end is None or date <= end)
+    }
+
+
+def _workbook_date(path):
+    match = re.search(r"(\d{4}_\d{2}_\d{2})", os.path.basename(path))
+    return match.group(1) if match else ""
+
+
+def base_workbook(date, results_dir=SOURCE_DIR):
+    """
+    Workbook a snapshot is rebuilt from: the latest published one dated before it (the one
+    the daily run would have started from), or the oldest one if none is older.
+    """
+    files = [os.path.join(results_dir, f) for f in os.listdir(results_dir)
+             if f.startswith("Epidemiology_Dengue_") and f.endswith(".xlsx")] if os.path.isdir(results_dir) else []
+    if not files:
+        raise FileNotFoundError(f"No Epidemiology_Dengue_*.xlsx files found in {results_dir}")
+    older = [f for f in files if _workbook_date(f) < date]
+    return max(older, key=_workbook_date) if older else min(files, key=_workbook_date)
+
+
+def rebuild_snapshot(date, base_path, backfill_dir=BACKFILL_DIR, output_dir=OUTPUT_DIR):
+    """
+    Rebuilds one snapshot into its own workbook: every stage runs with the snapshot date as
+    run date (reading only output/dengue_<date>/), then the workbook is validated.
+
+    Runs in a worker process; the stages' logs go to <workbook>.log instead of stdout.
+
+    :param date: Snapshot date 'YYYY_MM_DD'
+    :param base_path: Workbook to start from (copied, never modified)
+    :return: dict with date, status ('ok', 'invalid' or 'error'), workbook, log, seconds, failures
+    """
+    # Imported here so the parent process stays light and each worker loads them once
+    from modules.workbook_session import WorkbookSession
+    from modules.validation import validate_workbook
+    from modules.scheduler import run_stages, failed_stages
+    from data_transformation_pipeline.stages import STAGES
+
+    start = time.perf_counter()
+    run_date = datetime.strptime(date, DATE_FORMAT)
+    os.makedirs(backfill_dir, exist_ok=True)
+    workbook = os.path.join(backfill_dir, f"Epidemiology_Dengue_{date}.xlsx")
+    log_path = workbook.replace(".xlsx", ".log")
+    result = {"date": date, "base": base_path, "workbook": workbook, "log": log_path, "failures": []}
+
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            # The copy is both source and output: the session never touches the base workbook
+            shutil.copy2(base_path, workbook)
+            session, outcomes = run_stages(
+                STAGES, lambda: WorkbookSession(workbook, workbook, patch=True, run_date=run_date, output_dir=output_dir),
+                run_date=run_date, output_dir=output_dir)
+            if session.touched:
+                session.save()
+            report = validate_workbook(workbook, run_date=run_date, output_dir=output_dir)
+            report.print_summary()
+        failed = failed_stages(outcomes)
+        result["failures"] = [f"{name}: {outcomes[name].error}" for name in failed]
+        result["failures"] += [f"{r.name}: {msg}" for r in report.results.values() for msg in r.failures]
+        result["status"] = "ok" if report.passed and not failed else "invalid"
+    except Exception as e:
+        result["status"] = "error"
+        result["failures"] = [f"{type(e).__name__}: {e}"]
+    finally:
+        with open(log_path, "w", encoding="utf-8") as f:
+            f.write(log.getvalue())
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def backfill(start=None, end=None, workers=None, base=None, backfill_dir=BACKFILL_DIR,
+             output_dir=OUTPUT_DIR, results_dir=SOURCE_DIR):
+    """
+    Rebuilds every snapshot between `start` and `end` into its own workbook, one job per
+    snapshot on a process pool.
+
+    :param start: First snapshot date 'YYYY_MM_DD' (default: the oldest)
+    :param end: Last snapshot date (default: the newest)
+    :param workers: Worker processes (default: one per core)
+    :param base: Workbook to start every snapshot from (default: see base_workbook)
+    :return: list of per-snapshot results (see rebuild_snapshot), in date order
+    """
+    snapshots = snapshot_dates(start, end, output_dir)
+    if not snapshots:
+        print(f"[WARN] No snapshots between {start or 'the first'} and {end or 'the last'} in {output_dir}")
+        return []
+
+    results, jobs = [], {}
+    for date, missing in snapshots.items():
+        if missing:
+            print(f"[SKIP] {date}: missing {', '.join(missing)}")
+            results.append({"date": date, "status": "skipped", "failures": [f"missing {', '.join(missing)}"]})
+        else:
+            jobs[date] = base or base_workbook(date, results_dir)
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    print(f"[INFO] Rebuilding {len(jobs)} snapshot(s) on {workers} process(es) into {backfill_dir}")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(rebuild_snapshot, date, base_path, backfill_dir, output_dir)
+                   for date, base_path in jobs.items()]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            label = {"ok": "[SUCCESS]", "invalid": "[FAILED]", "error": "[ERROR]"}[result["status"]]
+            print(f"{label} {result['date']} ({result['seconds']:.1f}s, from {os.path.basename(result['base'])})"
+                  f" -> {result['workbook']}")
+            for message in result["failures"][:5]:
+                print(f"          {message}")
+
+    results.sort(key=lambda r: r["date"])
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    print("[INFO] Backfill done: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    return results
+
+
+if __name__ == "__main__":
+    # python -m modules.backfill --from 2025_06_01 --to 2025_06_30 [--workers 4] [--base WORKBOOK]
+    parser = argparse.ArgumentParser(description="Rebuilds past snapshots into their own workbooks.")
+    parser.add_argument("--from", dest="start", help="First snapshot date YYYY_MM_DD (default: oldest)")
+    parser.add_argument("--to", dest="end", help="Last snapshot date YYYY_MM_DD (default: newest)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--base", help="Workbook to rebuild every snapshot from (default: the one published before it)")
+    parser.add_argument("--output-dir", default=BACKFILL_DIR, help=f"Where the workbooks go (default: {BACKFILL_DIR})")
+    args = parser.parse_args()
+
+    for value in (args.start, args.end):
+        if value:
+            try:
+                datetime.strptime(value, DATE_FORMAT)
+            except ValueError:
+                parser.error(f"Invalid date {value!r}, expected YYYY_MM_DD")
+
+    results = backfill(args.start, args.end, args.workers, args.base, args.output_dir)
+    sys.exit(0 if all(r["status"] in ("ok", "skipped") for r in results) else 1)
@@ -1,41 +1,56 @@
 import os
-import glob
 import pandas as pd
 
-def city_cases_formatter():
+from modules.manifest import latest_artifact, artifact_for_date, register_artifact, is_delta
+from modules.tabnet_parser import write_city_cases
+from modules.loaders import store_city_cases
+
+def city_cases_formatter(date=None, output_root=None):
     try:
         # === [1] Setup paths ===
         script_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.dirname(script_dir)
 
-        # Encontra o CSV mais recente no padrão output/dengue_*/city_cases_*.csv
-        search_pattern = os.path.join(project_root, "output", "dengue_*", "city_cases_*.csv")
-        csv_files = glob.glob(search_pattern)
+        # Encontra o CSV mais recente no padrão output/dengue_*/city_cases_*.csv (via manifest),
+        # ou o do snapshot `date` ('YYYY_MM_DD') quando informado
+        output_root = output_root or os.path.join(project_root, "output")
+        if date:
+            latest_csv = artifact_for_date("city_cases", date, output_root)
+        else:
+            latest_csv = latest_artifact("city_cases", output_root)
 
-        if not csv_files:
+        if not latest_csv:
             raise FileNotFoundError("Nenhum arquivo 'city_cases_*.csv' encontrado em output/dengue_*/")
 
-        latest_csv = max(csv_files, key=os.path.getmtime)
         print(f"[INFO] Usando arquivo mais recente: {latest_csv}")
 
         # Extrai timestamp do nome do arquivo
         timestamp = os.path.basename(latest_csv).replace("city_cases_", "").replace(".csv", "")
         output_dir = os.path.dirname(latest_csv)
 
-        # === [2] Processa CSV original ===
-        df = pd.read_csv(latest_csv, skiprows=3, sep=';', encoding='latin1', quotechar='"')
+        # Compactado (modules.deltas.compact): só existe como base + delta, já formatado
+        if is_delta(latest_csv):
+            print(f"[INFO] {latest_csv} is compacted (base + delta), skipping.")
+            return
 
-        df['Cod Mun'] = df['Município de residência'].str[:6]
-        df['Nome Mun'] = df['Município de residência'].str[7:].str.strip()
-        df = df[['Cod Mun', 'Nome Mun', 'Casos_Prováveis']]
-        df.columns = ['Cod Mun', 'Nome Mun', 'Casos Provaveis']
-        df = df[df['Cod Mun'].str.match(r'^\d{6}$') & (df['Cod Mun'] != '000000')]
+        # Reaproveitado de uma execução anterior: já está limpo
+        with open(latest_csv, 'r', encoding='utf-8-sig', errors='replace') as f:
+            if f.readline().startswith('Cod Mun'):
+                print(f"[INFO] {latest_csv} already formatted, skipping.")
+                return
 
-        # === [3] Salva arquivo processado com mesmo nome, mas reescreve limpo ===
+        # === [2] Processa o CSV original em streaming e grava o arquivo limpo uma única vez (mesmo nome) ===
         final_output_path = os.path.join(output_dir, f"city_cases_{timestamp}.csv")
-        df.to_csv(final_output_path, index=False, encoding='utf-8-sig')
+        chunks = []
+        rows = write_city_cases(latest_csv, final_output_path, chunks=chunks)
+        register_artifact(final_output_path, output_root)
+
+        # === [3] Entrega a tabela em memória para os próximos estágios (o arquivo fica gravado para auditoria) ===
+        if chunks:
+            store_city_cases(final_output_path, pd.concat(chunks, ignore_index=True))
 
         print(f"[SUCCESS] Processed file saved as: {final_output_path}")
+        return rows
 
     except Exception as e:
         print(f"[ERROR] Failed to process city_cases CSV: {e}")
@@ -0,0 +1,495 @@
+import os
+import re
+import sys
+import glob
+import json
+import argparse
+
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import OUTPUT_DIR
+from modules.manifest import load_manifest, artifact_for_date, artifact_name, register_folder, is_delta, DELTA_SUFFIX
+from modules.object_store import (resolve, file_digest, find_object, is_ref, object_path, object_view,
+                                  put_object, read_ref)
+from modules.loaders import (
+    load_big_numbers_uf,
+    load_city_cases,
+    load_semana_epidemiologica,
+    SE_CASES_COLUMN,
+)
+
+
+DELTAS_DIR = os.path.join(OUTPUT_DIR, "_deltas")
+DELTA_COLUMNS = ["kind", "key", "op", "field", "old", "new"]
+KEY_SEP = "|"
+KEEP_FULL = 1  # newest snapshots `compact` never touches (the next delta and the daily run read them)
+MAX_CHAIN = 7  # compacted snapshots in a row before `compact` keeps one in full (bounds a rebuild)
+RAW_CODEC = "gzip"  # codec of the raw bytes `compact` keeps in the object store
+
+# Artifact kind -> (loader returning a flat frame, key columns)
+DELTA_KINDS = {
+    "city_cases": (load_city_cases, ("Cod Mun",)),
+    "big_numbers_uf": (lambda path: load_big_numbers_uf(path).reset_index(), ("UF",)),
+    "semana_epidemiologica": (load_semana_epidemiologica, ("UF", "Ano/Semana")),
+}
+# Flat frame -> frame as its loader returns it
+LOADER_SHAPE = {
+    "big_numbers_uf": lambda df: df.set_index("UF"),
+}
+
+_DELTA_FILE_RE = re.compile(r"^delta_(\d{4}_\d{2}_\d{2})__(\d{4}_\d{2}_\d{2})\.csv\.gz$")
+
+
+# --- Frames ---
+def _keyed(df, keys):
+    """Frame indexed by its key columns joined as text ('Acre|2025/01'), first row per key kept."""
+    index = df[keys[0]].astype(str)
+    for key in keys[1:]:
+        index = index + KEY_SEP + df[key].astype(str)
+    keyed = df.drop(columns=list(keys)).set_axis(index.to_numpy(), axis=0)
+    if keyed.index.has_duplicates:
+        print(f"[WARN] {keyed.index.duplicated().sum()} duplicated key(s) in ({', '.join(keys)}), kept the first.")
+        keyed = keyed[~keyed.index.duplicated()]
+    return keyed
+
+
+def _unkeyed(keyed, keys, dtypes):
+    """Inverse of _keyed, with the column types of the original frame."""
+    parts = pd.Series(keyed.index, dtype=str).str.split(KEY_SEP, n=len(keys) - 1, expand=True)
+    df = pd.DataFrame({key: parts[i].to_numpy() for i, key in enumerate(keys)})
+    for column in keyed.columns:
+        df[column] = keyed[column].to_numpy()
+    return _cast(df, dtypes)
+
+
+def _cast(df, dtypes):
+    for column, dtype in dtypes.items():
+        if column not in df:
+            continue
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+        df[column] = df[column].astype(dtype)
+    return df
+
+
+def _text(values):
+    """Values as stored in a delta file: exact text, '' for NA."""
+    return [None if pd.isna(v) else (repr(float(v)) if isinstance(v, float) else str(v)) for v in values]
+
+
+# --- Diff ---
+def diff_frames(old, new, keys):
+    """
+    Vectorized diff of two versions of a table on its key columns.
+
+    :param old: Previous version (DataFrame with `keys` + value columns)
+    :param new: New version, same columns
+    :param keys: Key column names
+    :return: DataFrame [key, op, field, old, new]; op is 'add' (one row per field of a new
+             key), 'del' (one row per removed key), 'chg' (one row per changed cell) or 'ord'
+             (one row per key with its position, only when the new version isn't in the old
+             order with the new keys appended)
+    """
+    old_k, new_k = _keyed(old, keys), _keyed(new, keys)
+    fields = [c for c in new_k.columns if c in old_k.columns]
+    frames = []
+
+    # === [1] Keys only in the new version: every field, new values ===
+    added = new_k.index.difference(old_k.index, sort=False)
+    for field in fields:
+        frames.append(pd.DataFrame({"key": added, "op": "add", "field": field, "old": None,
+                                    "new": _text(new_k.loc[added, field])}))
+
+    # === [2] Keys gone from the new version ===
+    removed = old_k.index.difference(new_k.index, sort=False)
+    frames.append(pd.DataFrame({"key": removed, "op": "del", "field": None, "old": None, "new": None}))
+
+    # === [3] Changed cells of the common keys (NA == NA) ===
+    common = new_k.index.intersection(old_k.index, sort=False)
+    for field in fields:
+        a = old_k.loc[common, field].astype(object)
+        b = new_k.loc[common, field].astype(object)
+        a_na, b_na = a.isna().to_numpy(), b.isna().to_numpy()
+        differs = (a_na != b_na) | (~a_na & ~b_na & (a.where(~a_na, 0) != b.where(~b_na, 0)).to_numpy())
+        changed = common[differs]
+        frames.append(pd.DataFrame({"key": changed, "op": "chg", "field": field,
+                                    "old": _text(a[differs]), "new": _text(b[differs])}))
+
+    # === [4] Row order, when apply_delta wouldn't give it back ===
+    if not new_k.index.equals(old_k.index.drop(removed).append(added)):
+        frames.append(pd.DataFrame({"key": new_k.index, "op": "ord", "field": None, "old": None,
+                                    "new": [str(i) for i in range(len(new_k))]}))
+
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=DELTA_COLUMNS[1:])
+    return pd.concat(frames, ignore_index=True)
+
+
+def apply_delta(base, delta, keys):
+    """
+    Applies a diff_frames() result to `base`, giving the new version of the table (rows in
+    the new version's order; column types of `base`).
+    """
+    dtypes = base.dtypes.to_dict()
+    keyed = _keyed(base, keys).astype(object)
+
+    keyed = keyed.drop(index=delta.loc[delta["op"] == "del", "key"], errors="ignore")
+
+    added = delta[delta["op"] == "add"]
+    if len(added):
+        wide = added.pivot(index="key", columns="field", values="new")
+        # pivot sorts the keys: back to the order they were added in
+        wide = wide.reindex(index=added["key"].drop_duplicates(), columns=keyed.columns)
+        keyed = pd.concat([keyed, wide])
+
+    changed = delta[delta["op"] == "chg"]
+    for field, rows in changed.groupby("field"):
+        keyed.loc[rows["key"].to_numpy(), field] = rows["new"].to_numpy()
+
+    order = delta[delta["op"] == "ord"]
+    if len(order):
+        keyed = keyed.loc[order["key"].to_numpy()[pd.to_numeric(order["new"]).to_numpy().argsort()]]
+
+    return _unkeyed(keyed, keys, dtypes).reset_index(drop=True)
+
+
+# --- Snapshots ---
+def snapshot_dates(output_dir=OUTPUT_DIR):
+    """Dates with at least one of the DELTA_KINDS artifacts, oldest first."""
+    artifacts = load_manifest(output_dir)["artifacts"]
+    return sorted({date for kind in DELTA_KINDS for date in artifacts.get(kind, {})})
+
+
+def load_snapshot_table(kind, date, output_dir=OUTPUT_DIR):
+    path = artifact_for_date(kind, date, output_dir)
+    if path is None:
+        return None
+    load, _ = DELTA_KINDS[kind]
+    return load(path)
+
+
+def delta_path(prev_date, date, deltas_dir=DELTAS_DIR):
+    return os.path.join(deltas_dir, f"delta_{prev_date}__{date}.csv.gz")
+
+
+def compute_delta(date, prev_date=None, output_dir=OUTPUT_DIR, deltas_dir=DELTAS_DIR):
+    """
+    Diffs snapshot `date` against the previous one (city cases by municipality code, big
+    numbers by UF, weekly series by UF + Ano/Semana) and writes the changed rows to
+    output/_deltas/delta_<prev>__<date>.csv.gz.
+
+    :param prev_date: Snapshot to diff against (default: the one before `date`)
+    :return: Path of the delta file, or None if there is no previous snapshot
+    """
+    if prev_date is None:
+        earlier = [d for d in snapshot_dates(output_dir) if d < date]
+        if not earlier:
+            print(f"[INFO] {date} is the first snapshot, nothing to diff against.")
+            return None
+        prev_date = earlier[-1]
+
+    frames = []
+    for kind, (_, keys) in DELTA_KINDS.items():
+        old = load_snapshot_table(kind, prev_date, output_dir)
+        new = load_snapshot_table(kind, date, output_dir)
+        if old is None or new is None:
+            print(f"[WARN] {kind} missing from {prev_date if old is None else date}, not diffed.")
+            continue
+        delta = diff_frames(old, new, keys)
+        delta.insert(0, "kind", kind)
+        frames.append(delta)
+
+    delta = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=DELTA_COLUMNS)
+    os.makedirs(deltas_dir, exist_ok=True)
+    path = delta_path(prev_date, date, deltas_dir)
+    tmp_path = f"{path}.tmp"
+    delta[DELTA_COLUMNS].to_csv(tmp_path, index=False, compression={"method": "gzip", "mtime": 0})
+    os.replace(tmp_path, path)
+
+    counts = delta.groupby(["kind", "op"])["key"].nunique()
+    summary = ", ".join(f"{kind} {op}={n}" for (kind, op), n in counts.items()) or "no changes"
+    print(f"[SUCCESS] Delta {prev_date} -> {date}: {summary} ({os.path.getsize(path) / 1024:.1f} KiB)")
+    return path
+
+
+def read_delta(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+
+
+def delta_files(deltas_dir=DELTAS_DIR):
+    """{date: (prev_date, path)} of every delta file."""
+    files = {}
+    for path in glob.glob(os.path.join(deltas_dir, "delta_*.csv.gz")):
+        match = _DELTA_FILE_RE.match(os.path.basename(path))
+        if match:
+            files[match.group(2)] = (match.group(1), path)
+    return files
+
+
+def rebuild_snapshot(date, base_date=None, output_dir=OUTPUT_DIR, deltas_dir=DELTAS_DIR):
+    """
+    Rebuilds the tables of snapshot `date` from a full base snapshot plus the chain of
+    deltas after it, without reading the artifacts of the snapshots in between.
+
+    :param base_date: Full snapshot to start from (default: follow the delta chain back
+                      to its first snapshot)
+    :return: {kind: DataFrame} with the columns of the loaders
+    """
+    files = delta_files(deltas_dir)
+    chain, current = [], date
+    while current != base_date and current in files:
+        prev_date, path = files[current]
+        chain.append(path)
+        current = prev_date
+    if base_date is not None and current != base_date:
+        raise FileNotFoundError(f"No delta chain from {base_date} to {date} in {deltas_dir}")
+
+    tables = {kind: load_snapshot_table(kind, current, output_dir) for kind in DELTA_KINDS}
+    for path in reversed(chain):
+        delta = read_delta(path)
+        for kind, (_, keys) in DELTA_KINDS.items():
+            if tables[kind] is not None:
+                tables[kind] = apply_delta(tables[kind], delta[delta["kind"] == kind], keys)
+    return tables
+
+
+def what_changed(date, deltas_dir=DELTAS_DIR, top=10):
+    """Prints the delta of snapshot `date`: counts per table and the biggest case increases."""
+    files = delta_files(deltas_dir)
+    if date not in files:
+        print(f"[ERROR] No delta for {date} in {deltas_dir}")
+        return None
+    prev_date, path = files[date]
+    delta = read_delta(path)
+    print(f"[INFO] Changes {prev_date} -> {date}")
+    for kind, rows in delta.groupby("kind"):
+        ops = rows.groupby("op")["key"].nunique().to_dict()
+        print(f"  {kind}: {ops.get('chg', 0)} changed, {ops.get('add', 0)} added, {ops.get('del', 0)} removed")
+
+    for kind, field, label in (("city_cases", "Casos Provaveis", "municipalities"),
+                               ("semana_epidemiologica", SE_CASES_COLUMN, "UF weeks")):
+        cases = delta[(delta["kind"] == kind) & (delta["op"] == "chg") & (delta["field"] == field)]
+        if cases.empty:
+            continue
+        increase = pd.to_numeric(cases["new"]) - pd.to_numeric(cases["old"])
+        biggest = cases.assign(increase=increase).nlargest(top, "increase")
+        print(f"  Biggest case increases ({label}):")
+        for key, old, new, inc in biggest[["key", "old", "new", "increase"]].itertuples(index=False):
+            print(f"    {key}: {old} -> {new} ({inc:+.0f})")
+    return delta
+
+
+def backfill(output_dir=OUTPUT_DIR, deltas_dir=DELTAS_DIR):
+    """Computes the missing deltas between every pair of consecutive snapshots."""
+    dates = snapshot_dates(output_dir)
+    existing = delta_files(deltas_dir)
+    for prev_date, date in zip(dates, dates[1:]):
+        if existing.get(date, (None,))[0] != prev_date:
+            compute_delta(date, prev_date, output_dir, deltas_dir)
+
+
+# --- Compaction ---
+def _same_frame(a, b):
+    try:
+        pd.testing.assert_frame_equal(a, b, check_exact=True)
+    except AssertionError:
+        return False
+    return True
+
+
+def read_marker(marker_path):
+    with open(marker_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rebuild_artifact(marker_path):
+    """
+    Table of a compacted artifact, as its loader returns it: read from its raw bytes when
+    `compact` kept them in the object store, otherwise the previous snapshot's table (itself
+    possibly compacted) plus the delta named in the marker. Used by modules.loaders.
+
+    :raises ValueError: If the base snapshot changed since the artifact was compacted
+    """
+    marker = read_marker(marker_path)
+    output_dir = os.path.dirname(os.path.dirname(os.path.abspath(marker_path)))
+    kind = marker["kind"]
+    load, keys = DELTA_KINDS[kind]
+    raw = marker.get("raw")
+    if raw and find_object(raw["object"], output_dir):
+        name = artifact_name(os.path.basename(marker_path))
+        table = load(object_view(raw["object"], raw["codec"], name, output_dir)).reset_index(drop=True)
+        return LOADER_SHAPE.get(kind, lambda df: df)(table)
+
+    base_path = artifact_for_date(kind, marker["base"], output_dir)
+    if base_path is None:
+        raise FileNotFoundError(f"Base snapshot {marker['base']} of {marker_path} is missing")
+    if file_digest(base_path) != marker["base_sha256"]:
+        raise ValueError(f"Base snapshot {marker['base']} of {marker_path} changed since it was compacted")
+    base = load_snapshot_table(kind, marker["base"], output_dir)
+    delta = read_delta(os.path.join(output_dir, marker["delta"]))
+    table = apply_delta(base, delta[delta["kind"] == kind], keys)
+    return LOADER_SHAPE.get(kind, lambda df: df)(table)
+
+
+def _keep_raw(path, output_dir):
+    """
+    Makes sure the bytes of an artifact about to be compacted are in the object store.
+
+    :return: Marker entry {object, codec, stored: bytes this added to the store}
+    """
+    if is_ref(path):
+        ref = read_ref(path)
+        return {"object": ref["object"], "codec": ref["codec"], "stored": 0}
+    existed = find_object(file_digest(path), output_dir) is not None
+    digest, codec = put_object(path, RAW_CODEC, output_dir)
+    stored = 0 if existed else os.path.getsize(object_path(digest, codec, output_dir))
+    return {"object": digest, "codec": codec, "stored": stored}
+
+
+def compact(output_dir=OUTPUT_DIR, deltas_dir=DELTAS_DIR, keep=KEEP_FULL, max_chain=MAX_CHAIN, keep_raw=True):
+    """
+    Replaces the full artifacts of older snapshots by a small <name>.delta marker, but only
+    where the previous snapshot plus the delta rebuilds the artifact exactly (same rows, order,
+    values and types as its loader reads from the file). The loaders rebuild compacted artifacts
+    transparently. The first snapshot of a chain and the `keep` newest ones stay full, and so
+    does one snapshot after every `max_chain` compacted ones, so no rebuild goes further back.
+
+    Only run on demand (python -m modules.deltas compact): the pipeline never compacts.
+
+    :param keep_raw: Keep each artifact's bytes in the object store (compressed, see
+                     modules.object_store; `gc` keeps them): nothing is lost and the loaders read
+                     them instead of rebuilding. False drops them for good.
+    :return: (artifacts compacted, bytes no longer stored in full; for artifacts that were in
+             the object store and weren't kept raw, once its `gc` dropped their objects)
+    """
+    dates = snapshot_dates(output_dir)
+    files = delta_files(deltas_dir)
+    artifacts = load_manifest(output_dir)["artifacts"]
+    # A full artifact some marker was built on stays full (the marker checks its digest)
+    anchors = set()
+    # Compacted snapshots in a row up to each artifact (0: full)
+    depth = {}
+    for kind in DELTA_KINDS:
+        for date in dates:
+            rel_path = artifacts.get(kind, {}).get(date)
+            if rel_path is not None and is_delta(rel_path):
+                base = read_marker(os.path.join(output_dir, *rel_path.split("/")))["base"]
+                anchors.add((kind, base))
+                depth[(kind, date)] = depth.get((kind, base), 0) + 1
+
+    compacted = freed = 0
+    for date in dates[:len(dates) - keep]:
+        if date not in files:
+            continue
+        prev_date, delta_file = files[date]
+        artifacts = load_manifest(output_dir)["artifacts"]
+        delta = None
+        for kind, (load, keys) in DELTA_KINDS.items():
+            rel_path = artifacts.get(kind, {}).get(date)
+            if rel_path is None or is_delta(rel_path) or (kind, date) in anchors:
+                continue
+            if depth.get((kind, prev_date), 0) + 1 > max_chain:
+                continue  # this one stays full: the next chain starts from it
+            path = os.path.join(output_dir, *rel_path.split("/"))
+            base_path = artifact_for_date(kind, prev_date, output_dir)
+            if base_path is None:
+                continue
+            base = load_snapshot_table(kind, prev_date, output_dir)
+            delta = read_delta(delta_file) if delta is None else delta
+            rebuilt = apply_delta(base, delta[delta["kind"] == kind], keys)
+            if not _same_frame(rebuilt, load(resolve(path)).reset_index(drop=True)):
+                print(f"[SKIP] {rel_path}: {prev_date} + delta doesn't rebuild it exactly, kept in full.")
+                continue
+
+            size = os.path.getsize(resolve(path))
+            # The base's content digest: a refetched base would silently change what this rebuilds
+            marker = {"kind": kind, "base": prev_date, "base_sha256": file_digest(base_path),
+                      "delta": os.path.relpath(delta_file, output_dir), "rows": len(rebuilt), "size": size}
+            if keep_raw:
+                marker["raw"] = _keep_raw(path, output_dir)
+                freed -= marker["raw"]["stored"]
+            marker_path = os.path.join(os.path.dirname(path), artifact_name(rel_path) + DELTA_SUFFIX)
+            tmp_path = f"{marker_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(marker, f)
+            os.replace(tmp_path, marker_path)
+            os.remove(path)
+            freed += size - os.path.getsize(marker_path)
+            compacted += 1
+            depth[(kind, date)] = depth.get((kind, prev_date), 0) + 1
+            register_folder(os.path.dirname(path), output_dir)
+
+    print(f"[INFO] Compacted {compacted} artifact(s), {freed / 1024:.0f} KiB no longer stored in full")
+    return compacted, freed
+
+
+def storage_report(output_dir=OUTPUT_DIR, deltas_dir=DELTAS_DIR):
+    """Bytes stored for the DELTA_KINDS artifacts (full files, markers and deltas) vs all of them in full."""
+    manifest = load_manifest(output_dir)["artifacts"]
+    stored = full = 0
+    raws = {}
+    for kind in DELTA_KINDS:
+        for date, rel_path in manifest.get(kind, {}).items():
+            size = os.path.getsize(os.path.join(output_dir, *rel_path.split("/")))
+            stored += size
+            if is_delta(rel_path):
+                marker = read_marker(os.path.join(output_dir, *rel_path.split("/")))
+                size = marker["size"]
+                if marker.get("raw"):
+                    raws[marker["raw"]["object"]] = max(raws.get(marker["raw"]["object"], 0), marker["raw"]["stored"])
+            full += size
+    deltas = delta_files(deltas_dir)
+    stored += sum(os.path.getsize(path) for _, path in deltas.values())
+    # Raw bytes `compact` put in the object store (once per object)
+    stored += sum(raws.values())
+    print(f"[INFO] {len(snapshot_dates(output_dir))} snapshot(s): {full / 1024:.0f} KiB as full artifacts, "
+          f"{stored / 1024:.0f} KiB stored (full + compacted + {len(deltas)} delta(s))")
+    return full, stored
+
+
+if __name__ == "__main__":
+    # python -m modules.deltas                  -> compute the missing deltas
+    # python -m modules.deltas report DATE      -> what changed in snapshot DATE
+    # python -m modules.deltas rebuild DATE DIR -> write the rebuilt tables of DATE as CSV into DIR
+    # python -m modules.deltas compact [--keep 1] [--max-chain 7] [--drop-raw]
+    #                                           -> replace verified older artifacts by base + delta
+    # python -m modules.deltas storage          -> bytes of full artifacts vs what is stored
+    parser = argparse.ArgumentParser(description="Week-over-week deltas between snapshots.")
+    parser.add_argument("command", nargs="?", default="compute",
+                        choices=["compute", "report", "rebuild", "compact", "storage"])
+    parser.add_argument("date", nargs="?", help="Snapshot date YYYY_MM_DD")
+    parser.add_argument("out_dir", nargs="?", help="Where 'rebuild' writes the tables")
+    parser.add_argument("--keep", type=int, default=KEEP_FULL,
+                        help=f"Newest snapshots 'compact' keeps in full (default: {KEEP_FULL})")
+    parser.add_argument("--max-chain", type=int, default=MAX_CHAIN,
+                        help=f"Compacted snapshots in a row before one stays full (default: {MAX_CHAIN})")
+    parser.add_argument("--drop-raw", action="store_true",
+                        help="Don't keep the compacted artifacts' bytes in the object store (irreversible)")
+    args = parser.parse_args()
+
+    if args.command == "compute":
+        if args.date:
+            compute_delta(args.date)
+        else:
+            backfill()
+    elif args.command == "report":
+        what_changed(args.date or snapshot_dates()[-1])
+    elif args.command == "rebuild":
+        if not args.date or not args.out_dir:
+            parser.error("rebuild needs a DATE and an output directory")
+        os.makedirs(args.out_dir, exist_ok=True)
+        for kind, table in rebuild_snapshot(args.date).items():
+            if table is not None:
+                path = os.path.join(args.out_dir, f"{kind}_{args.date}.csv")
+                table.to_csv(path, index=False)
+                print(f"[SUCCESS] {kind}: {len(table)} rows -> {path}")
+    elif args.command == "compact":
+        compact(keep=args.keep, max_chain=args.max_chain, keep_raw=not args.drop_raw)
+        storage_report()
+    else:
+        storage_report()
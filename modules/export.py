@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (Parquet/Feather engine)
+except ImportError:
+    pyarrow = None
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import SOURCE_DIR, TEMP_DIR
+
+
+EXPORT_DIRNAME = "export"
+FORMATS = ("parquet", "feather")
+SUMMARY_FILE = "summary.json"
+SCHEMA_FILE = "schema.json"
+
+# Table -> {column in the stage's frame: (exported column, dtype)}; the exported schema never
+# depends on what a given artifact happened to contain
+SCHEMAS = {
+    "city_cases": {
+        "Cod Mun": ("cod_mun", "int32"),
+        "Nome Mun": ("nome_mun", "string"),
+        "Casos Provaveis": ("casos_provaveis", "Int64"),
+    },
+    "big_numbers_uf": {
+        "UF": ("uf", "string"),
+        "casos_provaveis": ("casos_provaveis", "Int64"),
+        "incidencia": ("incidencia", "float64"),
+        "obitos_investigacao": ("obitos_investigacao", "Int64"),
+        "obitos": ("obitos", "Int64"),
+    },
+    "se_completa": {
+        "UF": ("uf", "string"),
+        "Ano/Semana": ("ano_semana", "string"),
+        "Casos prováveis de Dengue": ("casos_provaveis", "Int64"),
+    },
+    "informe_semana_epidemiologica": {
+        "se": ("se", "Int64"),
+        "data": ("data", "datetime64[ns]"),
+        "casos_provaveis": ("casos_provaveis", "Int64"),
+        "incidencia": ("incidencia", "float64"),
+        "municipios": ("municipios", "Int64"),
+        "obitos_investigacao": ("obitos_investigacao", "Int64"),
+        "obitos": ("obitos", "Int64"),
+    },
+    "dengue_cases_year": {
+        "ano": ("ano", "int16"),
+        "mes": ("mes", "int8"),
+        "casos_provaveis": ("casos_provaveis", "Int64"),
+    },
+    "municipios_uf": {
+        "Sigla": ("sigla", "string"),
+        "UF": ("uf", "string"),
+        "Região": ("regiao", "string"),
+        "Municipios": ("municipios", "int32"),
+        "Casos Provaveis": ("casos_provaveis", "Int64"),
+    },
+    "municipios_regiao": {
+        "Região": ("regiao", "string"),
+        "Municipios": ("municipios", "int32"),
+        "Casos Provaveis": ("casos_provaveis", "Int64"),
+    },
+}
+
+TOP_UFS = 5
+
+
+def conform(name, table):
+    """A stage's table with the exported column names and types (missing columns are NA)."""
+    frame = table if isinstance(table, pd.DataFrame) else pd.DataFrame([table] if isinstance(table, dict) else table)
+    schema = SCHEMAS[name]
+    columns = {}
+    for source, (column, dtype) in schema.items():
+        values = frame[source] if source in frame else pd.Series(pd.NA, index=frame.index, dtype=object)
+        if dtype.startswith("datetime"):
+            columns[column] = pd.to_datetime(values).astype(dtype)
+        elif dtype == "string":
+            columns[column] = values.astype(object).where(values.notna(), None).astype(dtype)
+        else:
+            # Numeric text (e.g. '3' read from a sheet cell) too; anything else is an error
+            columns[column] = pd.to_numeric(values).astype(dtype)
+    return pd.DataFrame(columns).reset_index(drop=True)
+
+
+def summarize(tables, run_date):
+    """
+    Headline numbers for the dashboard cards, from the exported tables present.
+
+    :return: dict with 'generated_at', 'run_date' and one section per table available
+    """
+    summary = {"generated_at": datetime.now().isoformat(timespec="seconds"),
+               "run_date": run_date.strftime("%Y-%m-%d")}
+
+    def plain(value):
+        return None if pd.isna(value) else value.item() if hasattr(value, "item") else value
+
+    informe = tables.get("informe_semana_epidemiologica")
+    if informe is not None and len(informe):
+        row = informe.iloc[-1]
+        summary["brasil"] = {column: plain(row[column]) for column in informe.columns if column != "data"}
+        if pd.notna(row["data"]):
+            summary["brasil"]["data"] = row["data"].strftime("%Y-%m-%d")
+
+    ufs = tables.get("big_numbers_uf")
+    if ufs is not None and len(ufs):
+        top = ufs.dropna(subset=["casos_provaveis"]).nlargest(TOP_UFS, "casos_provaveis")
+        summary["ufs"] = {
+            "total_casos_provaveis": plain(ufs["casos_provaveis"].sum()),
+            "top_casos_provaveis": [{column: plain(v) for column, v in row.items()} for _, row in top.iterrows()],
+        }
+
+    cities = tables.get("city_cases")
+    if cities is not None and len(cities):
+        summary["municipios"] = {
+            "com_casos": int((cities["casos_provaveis"].fillna(0) > 0).sum()),
+            "total": len(cities),
+            "maior_numero_de_casos": {column: plain(v) for column, v in
+                                      cities.loc[cities["casos_provaveis"].fillna(0).idxmax()].items()},
+        }
+
+    regions = tables.get("municipios_regiao")
+    if regions is not None and len(regions):
+        summary["regioes"] = [{column: plain(v) for column, v in row.items()} for _, row in regions.iterrows()]
+    return summary
+
+
+def export_dir(date, root=TEMP_DIR):
+    return os.path.join(root, EXPORT_DIRNAME, date)
+
+
+def latest_export(results_dir=SOURCE_DIR):
+    """Most recent published export folder (_results/export/<date>/), or None."""
+    root = os.path.join(results_dir, EXPORT_DIRNAME)
+    dates = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d))) if os.path.isdir(root) else []
+    return os.path.join(root, dates[-1]) if dates else None
+
+
+def export_tables(tables, run_date, formats=FORMATS, root=TEMP_DIR, results_dir=SOURCE_DIR):
+    """
+    Writes the tables of a run as typed Parquet/Feather files plus summary.json and
+    schema.json into TEMP/export/<date>/, published with the workbook (see publish_export).
+
+    Tables of stages that were skipped (unchanged inputs) are carried over from the last
+    published export, so every export folder is complete.
+
+    :param tables: {table: frame or rows}, as collected by WorkbookSession.add_table
+    :param formats: Any of FORMATS; both need pyarrow (only the JSON files are written without it)
+    :return: Path of the export folder
+    """
+    date = run_date.strftime("%Y_%m_%d")
+    target = export_dir(date, root)
+    tmp_dir = f"{target}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    previous = latest_export(results_dir)
+    if previous:
+        shutil.copytree(previous, tmp_dir)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    frames = {name: conform(name, table) for name, table in tables.items() if name in SCHEMAS}
+    if pyarrow is None:
+        print("[WARN] pyarrow is not installed: only the JSON summary is exported (pip install pyarrow).")
+    for name, frame in frames.items():
+        for fmt in FORMATS:
+            path = os.path.join(tmp_dir, f"{name}.{fmt}")
+            if pyarrow is not None and fmt in formats:
+                if fmt == "parquet":
+                    frame.to_parquet(path, index=False)
+                else:
+                    frame.to_feather(path)
+            elif os.path.exists(path):
+                os.remove(path)  # stale copy carried over from the previous export
+
+    # Summary: sections of the tables re-exported now, the others from the previous export
+    summary_path = os.path.join(tmp_dir, SUMMARY_FILE)
+    summary = {}
+    if os.path.exists(summary_path):
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+    summary.update(summarize(frames, run_date))
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(tmp_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+        json.dump({name: dict(schema.values()) for name, schema in SCHEMAS.items()}, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp_dir, target)
+    print(f"[SUCCESS] Exported {len(frames)} table(s) to {target}")
+    return target
+
+
+def publish_export(temp_dir=TEMP_DIR, results_dir=SOURCE_DIR):
+    """Moves the export folders of TEMP to _results/export/ (call before TEMP is emptied)."""
+    source = os.path.join(temp_dir, EXPORT_DIRNAME)
+    published = []
+    for date in sorted(os.listdir(source)) if os.path.isdir(source) else []:
+        target = os.path.join(results_dir, EXPORT_DIRNAME, date)
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(os.path.join(source, date), target)
+        published.append(target)
+    return published
@@ -0,0 +1,152 @@
+import os
+import sys
+import glob
+import time
+import asyncio
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import current_date, OUTPUT_DIR
+from modules.manifest import register_folder
+from modules.object_store import REF_SUFFIX
+from modules.profiler import NULL_PROFILER
+
+
+# The original Playwright scrapers (<step>.js), run with --browser only
+FETCH_DIR = os.path.join(BASE_DIR, "data_fetching_pipeline")
+
+# fetcher -> artifact it writes into output/dengue_<date>/
+FETCHERS = {
+    "semanaEpidemiologica": "semana_epidemiologica_{date}.yaml",
+    "bigNumbersUF": "big_numbers_uf_{date}.yaml",
+    "SEFetcher": "SE-Y-*_{date}.yaml",
+    "cityCases": "city_cases_{date}.csv",
+}
+
+# Python client of each fetcher (run as `python -m <module> [args]`)
+PYTHON_FETCHERS = {
+    "cityCases": ("modules.tabnet_client",),
+    "semanaEpidemiologica": ("modules.powerbi_client", "semana_epidemiologica"),
+    "bigNumbersUF": ("modules.powerbi_client", "big_numbers_uf"),
+    "SEFetcher": ("modules.powerbi_client", "se_cards"),
+}
+
+FETCH_CONCURRENCY = 4     # fetchers running at the same time
+FETCH_TIMEOUT = 600       # seconds per attempt
+FETCH_RETRIES = 2         # extra attempts after the first one
+FETCH_BACKOFF = 10        # seconds, doubled after every failed attempt
+
+
+def existing_artifact(step, date=current_date, output_dir=OUTPUT_DIR):
+    """Returns the artifact (or its object store reference) of `step` already in output/dengue_<date>/, or None."""
+    pattern = os.path.join(output_dir, f"dengue_{date}", FETCHERS[step].format(date=date))
+    files = glob.glob(pattern) or glob.glob(pattern + REF_SUFFIX)
+    return files[0] if files else None
+
+
+async def _pump(step, stream):
+    """Forwards a fetcher's output line by line, prefixed with its name."""
+    async for line in stream:
+        print(f"[{step}] {line.decode('utf-8', errors='replace').rstrip()}", flush=True)
+
+
+def fetch_command(step, browser=False):
+    """
+    Command line of one fetcher: its Python client, or with `browser` the Playwright scraper
+    it replaced (Node.js + Playwright needed). The browser is the fallback for when the
+    Power BI model names modules.powerbi_client queries (DENGUE_ENTITY, ...) no longer match
+    the report, or Tabnet changes its form: the scrapers click through the pages instead.
+    """
+    if browser:
+        return ("node", os.path.join(FETCH_DIR, f"{step}.js"))
+    return (sys.executable, "-m", *PYTHON_FETCHERS[step])
+
+
+async def _run_once(step, date, timeout, browser=False):
+    env = dict(os.environ, DENGUE_RUN_DATE=date)
+    command = fetch_command(step, browser)
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=BASE_DIR, env=env,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        await asyncio.wait_for(asyncio.gather(_pump(step, proc.stdout), proc.wait()), timeout)
+    except asyncio.TimeoutError:
+        print(f"[WARN] {step} timed out after {timeout}s, killing it.")
+        proc.kill()
+        await proc.wait()
+        return None
+    return proc.returncode
+
+
+async def _run_step(step, semaphore, date, output_dir, timeout, retries, backoff, profiler, browser):
+    """Runs one fetcher with retries; returns (status, seconds)."""
+    start = time.perf_counter()
+    if existing_artifact(step, date, output_dir):
+        profiler.add_record(step, "fetch", start, 0.0, status="reused", attempts=0)
+        return "reused", 0.0
+
+    for attempt in range(1, retries + 2):
+        async with semaphore:
+            print(f"[INFO] {step}: attempt {attempt}/{retries + 1}")
+            returncode = await _run_once(step, date, timeout, browser)
+
+        # Some fetchers log errors and exit 0, so success means the artifact is there
+        if returncode == 0 and existing_artifact(step, date, output_dir):
+            seconds = time.perf_counter() - start
+            profiler.add_record(step, "fetch", start, seconds, status="fetched", attempts=attempt)
+            return "fetched", seconds
+
+        print(f"[WARN] {step} failed (exit code {returncode}).")
+        if attempt <= retries:
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+
+    seconds = time.perf_counter() - start
+    profiler.add_record(step, "fetch", start, seconds, status="failed", attempts=retries + 1)
+    return "failed", seconds
+
+
+async def fetch_all_async(steps=None, date=current_date, output_dir=OUTPUT_DIR,
+                          concurrency=FETCH_CONCURRENCY, timeout=FETCH_TIMEOUT,
+                          retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, profiler=NULL_PROFILER, browser=False):
+    steps = list(steps or FETCHERS)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(
+        _run_step(step, semaphore, date, output_dir, timeout, retries, backoff, profiler, browser)
+        for step in steps
+    ))
+    return dict(zip(steps, results))
+
+
+def fetch_all(steps=None, date=current_date, output_dir=OUTPUT_DIR, **options):
+    """
+    Runs the fetchers as independent concurrent subprocesses.
+
+    Steps whose artifact already exists in output/dengue_<date>/ are reused, so a rerun
+    only fetches what is missing. Each attempt has a timeout and failed steps are retried
+    with exponential backoff, without affecting the other steps.
+
+    :param steps: Fetcher names (default: all of FETCHERS)
+    :param date: Run date 'YYYY_MM_DD', passed to the fetchers as DENGUE_RUN_DATE
+    :param options: concurrency, timeout, retries, backoff, profiler (one record per fetcher),
+                    browser (run the Playwright scrapers instead, see fetch_command)
+    :return: {step: (status, seconds)} with status 'fetched', 'reused' or 'failed'
+    """
+    results = asyncio.run(fetch_all_async(steps, date, output_dir, **options))
+    register_folder(os.path.join(output_dir, f"dengue_{date}"), output_dir)
+
+    for step, (status, seconds) in results.items():
+        print(f"[INFO] {step}: {status} ({seconds:.1f}s)")
+    return results
+
+
+def failed_steps(results):
+    return [step for step, (status, _) in results.items() if status == "failed"]
+
+
+if __name__ == "__main__":
+    # python -m modules.fetch_orchestrator [--browser]
+    sys.exit(1 if failed_steps(fetch_all(browser="--browser" in sys.argv[1:])) else 0)
@@ -0,0 +1,270 @@
+import os
+import sys
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import OUTPUT_DIR
+from modules.manifest import load_manifest, artifact_for_date
+from modules.loaders import (
+    load_big_numbers_uf,
+    load_city_cases,
+    load_se_summary,
+    load_semana_epidemiologica,
+    uf_name,
+    SE_CASES_COLUMN,
+)
+
+
+def db_path_for(output_dir=OUTPUT_DIR):
+    """History database of an output folder (<output_dir>/_index/history.sqlite3)."""
+    return os.path.join(output_dir, "_index", "history.sqlite3")
+
+
+DB_PATH = db_path_for(OUTPUT_DIR)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_date TEXT PRIMARY KEY,          -- 'YYYY_MM_DD' of the output/dengue_* folder
+    se            INTEGER,                   -- last epidemiological week of the snapshot
+    ingested_at   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS city_cases (
+    snapshot_date TEXT NOT NULL,
+    cod_mun       TEXT NOT NULL,
+    nome_mun      TEXT,
+    casos         INTEGER,
+    PRIMARY KEY (snapshot_date, cod_mun)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS uf_metrics (
+    snapshot_date TEXT NOT NULL,
+    uf            TEXT NOT NULL,
+    metric        TEXT NOT NULL,
+    value         REAL,
+    PRIMARY KEY (snapshot_date, uf, metric)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weekly_cases (
+    snapshot_date TEXT NOT NULL,
+    uf            TEXT NOT NULL,
+    ano           INTEGER NOT NULL,
+    semana        INTEGER NOT NULL,
+    casos         INTEGER,
+    PRIMARY KEY (snapshot_date, uf, ano, semana)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS national_metrics (
+    snapshot_date TEXT NOT NULL,
+    metric        TEXT NOT NULL,
+    value         REAL,
+    PRIMARY KEY (snapshot_date, metric)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_city_cases_mun ON city_cases (cod_mun, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_uf_metrics_uf ON uf_metrics (uf, metric, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_weekly_cases_uf ON weekly_cases (uf, ano, semana);
+CREATE INDEX IF NOT EXISTS idx_national_metric ON national_metrics (metric, snapshot_date);
+"""
+
+SNAPSHOT_TABLES = ("city_cases", "uf_metrics", "weekly_cases", "national_metrics", "snapshots")
+
+
+# --- Rows (from the canonical loaders) ---
+def _none(value):
+    return None if pd.isna(value) else value
+
+
+def _city_cases_rows(date, path):
+    df = load_city_cases(path)
+    return [
+        (date, f"{cod:06d}", nome, _none(casos))
+        for cod, nome, casos in zip(df['Cod Mun'].tolist(), df['Nome Mun'].tolist(),
+                                    df['Casos Provaveis'].tolist())
+    ]
+
+
+def _uf_metric_rows(date, path):
+    long = load_big_numbers_uf(path).stack(future_stack=True)
+    return [
+        (date, uf_name(uf), metric, _none(value))
+        for (uf, metric), value in long.items()
+    ]
+
+
+def _weekly_rows(date, path):
+    df = load_semana_epidemiologica(path)
+    ano_semana = df['Ano/Semana'].str.split('/', expand=True).astype(int)
+    return [
+        (date, uf_name(uf), ano, semana, _none(casos))
+        for uf, ano, semana, casos in zip(df['UF'].tolist(), ano_semana[0].tolist(),
+                                          ano_semana[1].tolist(), df[SE_CASES_COLUMN].tolist())
+    ]
+
+
+def _national_rows(date, path):
+    summary = load_se_summary(path)
+    se = summary.pop('se')
+    return [(date, metric, value) for metric, value in summary.items()], se
+
+
+# --- Database ---
+def connect(db_path=DB_PATH):
+    """Opens (and creates, if needed) the history database."""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def ingest_snapshot(date, conn=None, output_dir=OUTPUT_DIR, db_path=None):
+    """
+    Loads the artifacts of output/dengue_<date>/ into the history database.
+
+    Idempotent: the snapshot is replaced as a whole in one transaction, so re-ingesting
+    a date (or a partially fetched one, later completed) never duplicates rows.
+
+    :param date: Snapshot date 'YYYY_MM_DD'
+    :param db_path: History database (default: the one of `output_dir`, see db_path_for)
+    :return: {table: rows inserted}
+    """
+    paths = {kind: artifact_for_date(kind, date, output_dir)
+             for kind in ("city_cases", "big_numbers_uf", "semana_epidemiologica", "SE-Y")}
+    if not any(paths.values()):
+        print(f"[WARN] No artifacts for snapshot {date}, nothing to ingest.")
+        return {}
+
+    rows = {table: [] for table in SNAPSHOT_TABLES[:-1]}
+    se = None
+    if paths["city_cases"]:
+        rows["city_cases"] = _city_cases_rows(date, paths["city_cases"])
+    if paths["big_numbers_uf"]:
+        rows["uf_metrics"] = _uf_metric_rows(date, paths["big_numbers_uf"])
+    if paths["semana_epidemiologica"]:
+        rows["weekly_cases"] = _weekly_rows(date, paths["semana_epidemiologica"])
+    if paths["SE-Y"]:
+        rows["national_metrics"], se = _national_rows(date, paths["SE-Y"])
+
+    own_conn = conn is None
+    conn = conn or connect(db_path or db_path_for(output_dir))
+    try:
+        with conn:  # one transaction: commit on success, rollback on error
+            for table in SNAPSHOT_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE snapshot_date = ?", (date,))
+            conn.execute("INSERT INTO snapshots VALUES (?, ?, ?)",
+                         (date, se, datetime.now().isoformat(timespec="seconds")))
+            conn.executemany("INSERT INTO city_cases VALUES (?, ?, ?, ?)", rows["city_cases"])
+            conn.executemany("INSERT INTO uf_metrics VALUES (?, ?, ?, ?)", rows["uf_metrics"])
+            conn.executemany("INSERT INTO weekly_cases VALUES (?, ?, ?, ?, ?)", rows["weekly_cases"])
+            conn.executemany("INSERT INTO national_metrics VALUES (?, ?, ?)", rows["national_metrics"])
+    finally:
+        if own_conn:
+            conn.close()
+
+    counts = {table: len(r) for table, r in rows.items()}
+    print(f"[INFO] Snapshot {date} ingested: " + ", ".join(f"{t}={n}" for t, n in counts.items()))
+    return counts
+
+
+def backfill(output_dir=OUTPUT_DIR, db_path=None):
+    """
+    Ingests every snapshot found in output/dengue_* (one-shot history rebuild).
+
+    :param db_path: History database (default: the one of `output_dir`, see db_path_for)
+    """
+    db_path = db_path or db_path_for(output_dir)
+    artifacts = load_manifest(output_dir)["artifacts"]
+    dates = sorted({date for entries in artifacts.values() for date in entries})
+    conn = connect(db_path)
+    try:
+        for date in dates:
+            ingest_snapshot(date, conn=conn, output_dir=output_dir)
+    finally:
+        conn.close()
+    print(f"[SUCCESS] {len(dates)} snapshot(s) ingested into {db_path}")
+    return dates
+
+
+# --- Query API ---
+def _query(sql, params=(), db_path=DB_PATH):
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def snapshots(db_path=DB_PATH):
+    """All ingested snapshots: snapshot_date, se, ingested_at."""
+    return _query("SELECT * FROM snapshots ORDER BY snapshot_date", db_path=db_path)
+
+
+def city_cases_history(cod_mun, last=None, db_path=DB_PATH):
+    """
+    Cumulative probable cases of one municipality per snapshot, oldest first.
+
+    :param cod_mun: IBGE code with 6 digits, e.g. '355030'
+    :param last: Keep only the `last` most recent snapshots
+    """
+    sql = """
+        SELECT c.snapshot_date, s.se, c.nome_mun, c.casos
+        FROM city_cases c JOIN snapshots s USING (snapshot_date)
+        WHERE c.cod_mun = ?
+        ORDER BY c.snapshot_date DESC
+    """
+    params = [str(cod_mun).zfill(6)]
+    if last:
+        sql += " LIMIT ?"
+        params.append(int(last))
+    return _query(sql, params, db_path).iloc[::-1].reset_index(drop=True)
+
+
+def uf_metric_history(uf, metric="incidencia", db_path=DB_PATH):
+    """Trend of one UF metric (see loaders.METRICS) across snapshots, oldest first."""
+    return _query("""
+        SELECT u.snapshot_date, s.se, u.value
+        FROM uf_metrics u JOIN snapshots s USING (snapshot_date)
+        WHERE u.uf = ? AND u.metric = ?
+        ORDER BY u.snapshot_date
+    """, (uf_name(uf), metric), db_path)
+
+
+def national_metric_history(metric="casos_provaveis", db_path=DB_PATH):
+    """Trend of one national metric across snapshots, oldest first."""
+    return _query("""
+        SELECT n.snapshot_date, s.se, n.value
+        FROM national_metrics n JOIN snapshots s USING (snapshot_date)
+        WHERE n.metric = ?
+        ORDER BY n.snapshot_date
+    """, (metric,), db_path)
+
+
+def weekly_cases(uf=None, snapshot_date=None, db_path=DB_PATH):
+    """
+    Cases per epidemiological week as published in one snapshot (default: the latest).
+
+    :param uf: Restrict to one UF
+    """
+    if snapshot_date is None:
+        latest = _query("SELECT MAX(snapshot_date) AS d FROM weekly_cases", db_path=db_path)
+        snapshot_date = latest["d"].iloc[0]
+    sql = "SELECT uf, ano, semana, casos FROM weekly_cases WHERE snapshot_date = ?"
+    params = [snapshot_date]
+    if uf:
+        sql += " AND uf = ?"
+        params.append(uf_name(uf))
+    return _query(sql + " ORDER BY uf, ano, semana", params, db_path)
+
+
+if __name__ == "__main__":
+    # python -m modules.history_store                 -> backfill every output/dengue_* folder
+    # python -m modules.history_store 2025_06_29 ...  -> (re)ingest the given snapshots
+    if len(sys.argv) > 1:
+        for snapshot_date in sys.argv[1:]:
+            ingest_snapshot(snapshot_date)
+    else:
+        backfill()
@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import zipfile
+
+from modules.utils import find_snapshot_file, OUTPUT_DIR
+from modules.xlsx_patch import sheet_parts
+
+
+STATE_SUFFIX = ".stages.json"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sheet_digests(workbook_path):
+    """sha256 of every worksheet part of an .xlsx, keyed by sheet name."""
+    digests = {}
+    with zipfile.ZipFile(workbook_path) as zf:
+        for name, part in sheet_parts(zf).items():
+            digests[name] = hashlib.sha256(zf.read(part)).hexdigest()
+    return digests
+
+
+def state_path(workbook_path):
+    """Sidecar file holding the stage fingerprints of a workbook."""
+    return workbook_path + STATE_SUFFIX
+
+
+def load_state(workbook_path):
+    try:
+        with open(state_path(workbook_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def input_fingerprint(stage, output_dir=OUTPUT_DIR, run_date=None):
+    """
+    Content hashes of the artifacts a stage reads, plus its extra params.
+    A missing artifact is recorded as None (the stage will run and report it).
+
+    :param run_date: Date the run stands for (--date, backfills): the artifacts of that day's
+                     snapshot are hashed, like the stages read them (default: the latest ones)
+    """
+    snapshot_date = run_date.strftime("%Y_%m_%d") if run_date else None
+    inputs = {}
+    for pattern in stage.inputs:
+        try:
+            path = find_snapshot_file(pattern, snapshot_date, output_dir)
+        except FileNotFoundError:
+            inputs[pattern] = None
+            continue
+        inputs[pattern] = file_digest(path)
+
+    return {
+        "inputs": inputs,
+        "params": stage.params(run_date) if stage.params else {},
+    }
+
+
+def plan_stages(stages, workbook_path, output_dir=OUTPUT_DIR, force=False, run_date=None):
+    """
+    Splits `stages` into (to_run, skipped) for the workbook the run starts from.
+
+    A stage is skipped when its input artifacts, its params and its target sheet are
+    all unchanged since the last successful run that produced `workbook_path`.
+
+    :param run_date: Date the run stands for (default: now, with the latest artifacts)
+    """
+    if force:
+        return list(stages), []
+
+    state = load_state(workbook_path)
+    sheets = sheet_digests(workbook_path) if state else {}
+
+    to_run, skipped = [], []
+    for stage in stages:
+        previous = state.get(stage.name)
+        current = input_fingerprint(stage, output_dir, run_date)
+        unchanged = (
+            previous is not None
+            and None not in current["inputs"].values()
+            and previous.get("inputs") == current["inputs"]
+            and previous.get("params") == current["params"]
+            and previous.get("sheet") == sheets.get(stage.sheet)
+        )
+        (skipped if unchanged else to_run).append(stage)
+    return to_run, skipped
+
+
+def record_run(stages, workbook_path, output_dir=OUTPUT_DIR, run_date=None):
+    """
+    Stores the fingerprints of every stage next to the validated workbook, so the next
+    run can skip what didn't change. Call only after the workbook passed validation,
+    with the `run_date` the workbook was built for.
+    """
+    sheets = sheet_digests(workbook_path)
+    state = {}
+    for stage in stages:
+        fingerprint = input_fingerprint(stage, output_dir, run_date)
+        fingerprint["sheet"] = sheets.get(stage.sheet)
+        state[stage.name] = fingerprint
+
+    path = state_path(workbook_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return state
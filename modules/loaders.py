@@ -0,0 +1,213 @@
+import os
+import sys
+import yaml
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import find_latest_file_in_subfolders, OUTPUT_DIR
+from modules.manifest import is_delta
+from modules.tabnet_parser import read_city_cases, CITY_CASES_COLUMNS
+from modules.artifact_cache import CACHE
+
+
+# YAML label (prefix, lowercase) -> metric id; counts are integers, the rest are rates
+METRICS = {
+    "casos prováveis": "casos_provaveis",
+    "coeficiente de incidência": "incidencia",
+    "óbitos em investigação": "obitos_investigacao",
+    "óbitos por dengue": "obitos",
+    "letalidade (óbito) em casos graves": "letalidade_graves",
+    "letalidade (óbito) em casos prováveis": "letalidade_provaveis",
+}
+COUNT_METRICS = {"casos_provaveis", "obitos_investigacao", "obitos"}
+
+SE_CASES_COLUMN = "Casos prováveis de Dengue"
+
+# --- Parsing ---
+def parse_br_numbers(values, integer=False):
+    """
+    Parses a whole column of dashboard numbers at once.
+
+    The dashboards publish en-US numbers ('1,516,819', '1029.4', '4.55'), but older
+    artifacts also hold pt-BR ones ('713,5', '9.065'). Rules:
+      - integer=True: every '.' and ',' is a thousands separator -> Int64
+      - otherwise the last separator is the decimal one, except a ',' that only groups
+        thousands ('1,029') -> float64
+    '-' and empty values become NA.
+
+    :param values: Iterable or Series of str/int/float
+    :return: Series (Int64 or float64) aligned with `values`
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    text = series.astype("string").str.replace(r"[\s\xa0]+|-+$", "", regex=True)
+    text = text.mask(text == "")
+
+    if integer:
+        digits = text.str.replace(r"[.,]", "", regex=True)
+        return pd.to_numeric(digits, errors="coerce").astype("Int64")
+
+    comma_decimal = (
+        text.str.contains(r",\d*$", regex=True)
+        & ~text.str.fullmatch(r"\d{1,3}(,\d{3})+")
+    ).fillna(False)
+    normalized = text.str.replace(",", "", regex=False).where(
+        ~comma_decimal,
+        text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    return pd.to_numeric(normalized, errors="coerce").astype("float64")
+
+
+def metric_id(label):
+    """Metric id of a dashboard label, e.g. 'Óbitos por Dengue' -> 'obitos', or None."""
+    label = str(label).strip().lower()
+    for key, metric in METRICS.items():
+        if label.startswith(key):
+            return metric
+    return None
+
+
+def uf_name(name):
+    """Canonical UF name, e.g. 'Mato Grosso Do Sul' -> 'Mato Grosso do Sul'."""
+    return (
+        " ".join(str(name).split()).title()
+           .replace(" Do ", " do ")
+           .replace(" De ", " de ")
+    )
+
+
+def _typed_metrics(df):
+    """Parses every metric column of a frame of raw strings with its own type."""
+    return pd.DataFrame(
+        {col: parse_br_numbers(df[col], integer=col in COUNT_METRICS) for col in df.columns},
+        index=df.index,
+    )
+
+
+# --- Memoization (process-wide modules.artifact_cache) ---
+def _memoized(loader, path):
+    """
+    Runs `loader(path)` once per file version, while it stays in the artifact cache.
+    A compacted artifact (<name>.delta, see modules.deltas.compact) is rebuilt instead.
+    """
+    if is_delta(path):
+        from modules.deltas import rebuild_artifact  # modules.deltas imports this module
+        loader = rebuild_artifact
+    result = CACHE.get_or_load(loader.__name__, path, loader)
+    # Callers get their own copy, the cached one stays pristine
+    return result.copy()
+
+
+def clear_cache():
+    CACHE.clear()
+
+
+def _resolve(path, pattern):
+    return path or find_latest_file_in_subfolders(pattern, output_dir=OUTPUT_DIR)
+
+
+# --- Loaders ---
+def _read_big_numbers_uf(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    raw = {
+        uf: {metric_id(label): value for label, value in (fields or {}).items() if metric_id(label)}
+        for uf, fields in data.items() if isinstance(fields, dict)
+    }
+    df = pd.DataFrame.from_dict(raw, orient="index", dtype=object)
+    df.index.name = "UF"
+    return _typed_metrics(df)
+
+
+def load_big_numbers_uf(path=None):
+    """
+    big_numbers_uf_*.yaml as a frame indexed by UF (name as published), one typed column
+    per metric id: casos_provaveis, incidencia, obitos_investigacao, obitos.
+    """
+    return _memoized(_read_big_numbers_uf, _resolve(path, 'big_numbers_uf_*.yaml'))
+
+
+def _read_se_summary(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    fields = data.get('All_Semanas_Data') or {}
+    raw = {metric_id(label): [value] for label, value in fields.items() if metric_id(label)}
+    typed = _typed_metrics(pd.DataFrame(raw, dtype=object))
+
+    summary = {"se": parse_br_numbers([data.get('Last_Epidemiological_Week')], integer=True)[0]}
+    for metric in typed.columns:
+        summary[metric] = typed[metric][0]
+    # Plain Python values (None for NA), ready to be written into cells
+    return {k: (None if pd.isna(v) else v.item() if hasattr(v, "item") else v) for k, v in summary.items()}
+
+
+def load_se_summary(path=None):
+    """
+    SE-Y-*.yaml as a dict: 'se' (last epidemiological week) plus one value per metric id
+    (casos_provaveis, incidencia, obitos_investigacao, obitos, letalidade_*).
+    """
+    return _memoized(_read_se_summary, _resolve(path, 'SE-Y-*.yaml'))
+
+
+def _read_semana_epidemiologica(path):
+    df = pd.read_csv(path, dtype=str)
+    df.columns = df.columns.str.strip()
+    df['Ano/Semana'] = df['Ano/Semana'].str.replace('\xa0', '', regex=False).str.strip()
+    df[SE_CASES_COLUMN] = parse_br_numbers(df[SE_CASES_COLUMN], integer=True)
+    return df
+
+
+def load_semana_epidemiologica(path=None):
+    """
+    semana_epidemiologica_*.yaml (a CSV despite the name) with the columns as published:
+    'UF', 'Ano/Semana' (e.g. '2025/01') and 'Casos prováveis de Dengue' (Int64).
+    """
+    return _memoized(_read_semana_epidemiologica, _resolve(path, 'semana_epidemiologica_*.yaml'))
+
+
+def _city_cases_frame(parsed):
+    """modules.tabnet_parser output (compact dtypes) -> load_city_cases columns."""
+    return pd.DataFrame({
+        'Cod Mun': parsed['Cod Mun'].astype("int64"),
+        'Nome Mun': parsed['Nome Mun'].astype(str),
+        'Casos Provaveis': parsed['Casos Provaveis'].astype("Int64"),
+    }).reset_index(drop=True)
+
+
+def _read_city_cases(path):
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        formatted = f.readline().startswith('Cod Mun')
+    if not formatted:
+        # Raw Tabnet export: the streaming parser already drops ignored/total rows
+        return _city_cases_frame(read_city_cases(path))
+
+    df = pd.read_csv(path, encoding='utf-8-sig', dtype=str)
+    df.columns = CITY_CASES_COLUMNS
+    df = df[df['Cod Mun'].str.fullmatch(r'\d{6}') & (df['Cod Mun'] != '000000')]
+    return pd.DataFrame({
+        'Cod Mun': df['Cod Mun'].astype("int64"),
+        'Nome Mun': df['Nome Mun'],
+        'Casos Provaveis': parse_br_numbers(df['Casos Provaveis'].str.replace(r'\.0$', '', regex=True),
+                                            integer=True),
+    }).reset_index(drop=True)
+
+
+def load_city_cases(path=None):
+    """
+    city_cases_*.csv (formatted or raw Tabnet export) with 'Cod Mun' (int64),
+    'Nome Mun' and 'Casos Provaveis' (Int64), ignored/total rows removed.
+    """
+    return _memoized(_read_city_cases, _resolve(path, 'city_cases_*.csv'))
+
+
+# --- Writers' handoff ---
+def store_city_cases(path, parsed):
+    """
+    Hands the table just written to `path` (city_cases_formatter) to the next stages:
+    load_city_cases(path) then returns it without reading the file back.
+
+    :param parsed: modules.tabnet_parser frame of what was written
+    """
+    CACHE.put(_read_city_cases.__name__, path, _city_cases_frame(parsed))
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import fnmatch
+
+from modules.object_store import REF_SUFFIX, resolve
+
+
+# Artifact families written to output/dengue_YYYY_MM_DD/ by the fetchers and the formatter
+ARTIFACT_KINDS = ("big_numbers_uf", "semana_epidemiologica", "city_cases", "SE-Y")
+MANIFEST_VERSION = 2
+INDEX_DIR = "_index"
+MANIFEST_FILE = "manifest.json"
+# Compacted artifact (modules.deltas.compact): rebuilt from the previous snapshot plus its delta
+DELTA_SUFFIX = ".delta"
+
+# Artifacts moved to the object store (modules.object_store) are indexed by their <name>.ref,
+# compacted ones by their <name>.delta
+_ARTIFACT_RE = re.compile(r"^.+_(\d{4}_\d{2}_\d{2})\.\w+(?:\.ref|\.delta)?$")
+
+# In-process copy of each manifest, keyed by absolute output dir
+_loaded = {}
+
+
+def artifact_kind(name):
+    """Returns the artifact family of a file name (or glob pattern), or None."""
+    for kind in ARTIFACT_KINDS:
+        if name.startswith(kind):
+            return kind
+    return None
+
+
+def is_delta(path):
+    return path.endswith(DELTA_SUFFIX)
+
+
+def artifact_name(rel_path):
+    """File name of an indexed artifact, without the .ref of stored or .delta of compacted ones."""
+    name = os.path.basename(rel_path)
+    for suffix in (REF_SUFFIX, DELTA_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _manifest_path(output_dir):
+    return os.path.join(output_dir, INDEX_DIR, MANIFEST_FILE)
+
+
+def _dir_mtime(output_dir):
+    try:
+        return os.stat(output_dir).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _add_entry(manifest, folder_name, file_name):
+    kind = artifact_kind(file_name)
+    match = _ARTIFACT_RE.match(file_name)
+    if not kind or not match:
+        return False
+    manifest["artifacts"].setdefault(kind, {})[match.group(1)] = f"{folder_name}/{file_name}"
+    return True
+
+
+def _scan_folder(manifest, output_dir, folder_name):
+    """(Re)indexes one dengue_* folder: its previous entries are replaced by what it holds now."""
+    for entries in manifest["artifacts"].values():
+        for date in [date for date, rel_path in entries.items() if rel_path.split("/")[0] == folder_name]:
+            del entries[date]
+    # mtime taken before listing: a file written meanwhile makes the folder stale again
+    mtime = _dir_mtime(os.path.join(output_dir, folder_name))
+    if mtime is None:
+        manifest["folders"].pop(folder_name, None)
+        return
+    manifest["folders"][folder_name] = mtime
+    with os.scandir(os.path.join(output_dir, folder_name)) as entries:
+        names = {entry.name for entry in entries if entry.is_file()}
+    for name in sorted(names):
+        # A plain file wins over the object store reference or the compaction marker of the
+        # same artifact (mid-migration, mid-compaction)
+        if artifact_name(name) == name or artifact_name(name) not in names:
+            _add_entry(manifest, folder_name, name)
+
+
+def _write(manifest, output_dir):
+    """Writes the manifest atomically (temp file + rename)."""
+    path = _manifest_path(output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    manifest["output_dir_mtime_ns"] = _dir_mtime(output_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    _loaded[os.path.abspath(output_dir)] = manifest
+
+
+def rebuild_manifest(output_dir="output"):
+    """Rebuilds the manifest from a scan of every output/dengue_* folder."""
+    manifest = {"version": MANIFEST_VERSION, "artifacts": {}, "folders": {}}
+    if os.path.isdir(output_dir):
+        with os.scandir(output_dir) as entries:
+            folders = sorted(e.name for e in entries if e.is_dir() and e.name.startswith("dengue_"))
+        for folder_name in folders:
+            _scan_folder(manifest, output_dir, folder_name)
+    _write(manifest, output_dir)
+    return manifest
+
+
+def load_manifest(output_dir="output"):
+    """
+    Returns the artifact manifest of `output_dir`, rebuilding it from a scan only when
+    it is missing or stale (a dengue_* folder was added or removed since it was written).
+    A folder whose own mtime moved (a file added, rewritten as .ref or removed inside it)
+    is rescanned on its own.
+    """
+    key = os.path.abspath(output_dir)
+    mtime = _dir_mtime(output_dir)
+
+    manifest = _loaded.get(key)
+    if manifest is None:
+        try:
+            with open(_manifest_path(output_dir), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = None
+
+    if not manifest or manifest.get("version") != MANIFEST_VERSION \
+            or manifest.get("output_dir_mtime_ns") != mtime:
+        return rebuild_manifest(output_dir)
+
+    stale = [name for name, folder_mtime in manifest["folders"].items()
+             if _dir_mtime(os.path.join(output_dir, name)) != folder_mtime]
+    for folder_name in stale:
+        _scan_folder(manifest, output_dir, folder_name)
+    if stale:
+        _write(manifest, output_dir)
+
+    _loaded[key] = manifest
+    return manifest
+
+
+def register_artifact(path, output_dir="output"):
+    """Adds (or updates) a single artifact written under output/dengue_*/ to the manifest."""
+    manifest = load_manifest(output_dir)
+    folder_name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    if artifact_kind(os.path.basename(path)):
+        # The whole (small) folder, so its recorded mtime covers every file in it
+        _scan_folder(manifest, output_dir, folder_name)
+        _write(manifest, output_dir)
+
+
+def register_folder(folder, output_dir="output"):
+    """Adds every artifact of one output/dengue_* folder (e.g. right after the fetch step)."""
+    manifest = load_manifest(output_dir)
+    if os.path.isdir(folder):
+        _scan_folder(manifest, output_dir, os.path.basename(os.path.normpath(folder)))
+        _write(manifest, output_dir)
+
+
+def find_artifact(pattern, output_dir="output"):
+    """
+    Returns the most recent artifact whose file name matches `pattern` (by date in the name),
+    or None if the manifest has no match. Stored artifacts come back as readable views,
+    compacted ones as their .delta marker (the loaders rebuild them).
+    """
+    kind = artifact_kind(pattern)
+    if kind is None:
+        return None
+
+    for attempt in range(2):
+        entries = load_manifest(output_dir)["artifacts"].get(kind, {})
+        for date in sorted(entries, reverse=True):
+            rel_path = entries[date]
+            if fnmatch.fnmatch(artifact_name(rel_path), pattern):
+                path = os.path.join(output_dir, *rel_path.split("/"))
+                if os.path.exists(path):
+                    return resolve(path)
+                break  # indexed file is gone: the manifest is stale
+        if attempt == 0:
+            rebuild_manifest(output_dir)
+    return None
+
+
+def latest_artifact(kind, output_dir="output"):
+    """Latest artifact of a family, e.g. latest_artifact('big_numbers_uf')."""
+    return find_artifact(f"{kind}*", output_dir)
+
+
+def artifact_for_date(kind, date, output_dir="output"):
+    """Artifact of a family for one snapshot date ('YYYY_MM_DD'), or None."""
+    rel_path = load_manifest(output_dir)["artifacts"].get(kind, {}).get(date)
+    if rel_path is None:
+        return None
+    path = os.path.join(output_dir, *rel_path.split("/"))
+    return resolve(path) if os.path.exists(path) else None
+
+
+if __name__ == "__main__":
+    manifest = rebuild_manifest()
+    for kind, entries in manifest["artifacts"].items():
+        print(f"[INFO] {kind}: {len(entries)} snapshot(s), latest {max(entries)}")
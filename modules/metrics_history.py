@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+from datetime import datetime
+from dataclasses import dataclass
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import OUTPUT_DIR
+from modules.profiler import max_rss, children_max_rss
+
+
+METRICS_DIR = os.path.join("output", "_metrics")
+HISTORY_FILE = "history.jsonl"
+# node_exporter textfile collector, e.g. /var/lib/node_exporter/textfile/dengue_pipeline.prom
+TEXTFILE_ENV = "DENGUE_METRICS_TEXTFILE"
+
+WINDOW = 8                # previous runs the latest one is compared with (rolling median)
+DURATION_THRESHOLD = 0.5  # relative change of a step's duration that gets flagged...
+MIN_SECONDS = 0.5         # ...if it's also at least this many seconds
+ROWS_THRESHOLD = 0.1      # relative change of a row count that gets flagged
+
+
+# --- Records ---
+def _workbook(path):
+    """Path and size of the workbook a run produced (None if it produced none)."""
+    if not path or not os.path.exists(path):
+        return None
+    return {"path": path, "bytes": os.path.getsize(path)}
+
+
+def artifact_rows(date, output_dir=OUTPUT_DIR):
+    """{artifact kind: rows} of the snapshot of `date` (None for a missing or unreadable artifact)."""
+    from modules.manifest import artifact_for_date
+    from modules.scheduler import INPUT_LOADERS
+
+    rows = {}
+    for kind, loader in INPUT_LOADERS.items():
+        path = artifact_for_date(kind, date, output_dir)
+        try:
+            data = loader(path) if path else None
+        except Exception:
+            data = None
+        # SE-Y is one summary (a dict), the others are frames
+        rows[kind] = None if data is None else 1 if isinstance(data, dict) else len(data)
+    return rows
+
+
+def build_record(profiler, date, status, output_dir=OUTPUT_DIR, workbook=None):
+    """
+    One run of the pipeline as a metrics record.
+
+    A step that ran several times in the run (same category and name) is one entry: its
+    durations and rows are summed, 'calls' counts the runs.
+
+    :param profiler: The run's Profiler (steps, durations, rows, peak RSS at the end of each step)
+    :param status: 'passed' or 'failed'
+    :param workbook: Path of the workbook this run published (or left in TEMP), if any
+    :return: dict with run_at, date, status, seconds, peak RSS, steps, artifacts and workbook
+    """
+    steps = {}
+    for r in sorted(profiler.records, key=lambda r: r["start"]):
+        # Imports only happen once per process; reused fetches took no time
+        if r["category"] == "import" or r.get("status") == "reused":
+            continue
+        entry = steps.setdefault(f"{r['category']}/{r['name']}",
+                                 {"seconds": 0.0, "rows": None, "max_rss": None, "calls": 0})
+        entry["seconds"] = round(entry["seconds"] + r["wall"], 4)
+        if r.get("rows") is not None:
+            entry["rows"] = (entry["rows"] or 0) + r["rows"]
+        if r.get("max_rss") is not None:
+            entry["max_rss"] = max(entry["max_rss"] or 0, r["max_rss"])
+        entry["calls"] += 1
+    return {
+        "run_at": profiler.started_at.isoformat(timespec="seconds"),
+        "date": date,
+        "status": status,
+        "seconds": round(profiler.to_dict()["total_seconds"], 3),
+        "peak_rss": max_rss(),
+        "children_peak_rss": children_max_rss(),
+        "steps": steps,
+        "artifacts": artifact_rows(date, output_dir),
+        "workbook": _workbook(workbook),
+    }
+
+
+def append_record(record, metrics_dir=METRICS_DIR):
+    """Appends a record to <metrics_dir>/history.jsonl (one JSON object per line) and returns its path."""
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, HISTORY_FILE)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    return path
+
+
+def load_history(metrics_dir=METRICS_DIR):
+    """Every record of history.jsonl, oldest first (a truncated last line is ignored)."""
+    path = os.path.join(metrics_dir, HISTORY_FILE)
+    records = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+# --- Prometheus ---
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(record):
+    """The record in the Prometheus text exposition format (gauges of the last run)."""
+    metrics = [
+        ("dengue_pipeline_last_run_timestamp_seconds", "Start of the last run (unix time)",
+         [({}, datetime.fromisoformat(record["run_at"]).timestamp())]),
+        ("dengue_pipeline_last_run_success", "1 if the last run passed validation",
+         [({}, int(record["status"] == "passed"))]),
+        ("dengue_pipeline_duration_seconds", "Duration of the last run",
+         [({}, record["seconds"])]),
+        ("dengue_pipeline_peak_rss_bytes", "Peak resident memory of the last run",
+         [({"process": "pipeline"}, record["peak_rss"]), ({"process": "children"}, record["children_peak_rss"])]),
+        ("dengue_pipeline_step_duration_seconds", "Duration of each step of the last run",
+         [({"step": step}, values["seconds"]) for step, values in record["steps"].items()]),
+        ("dengue_pipeline_step_rows", "Rows handled by each step of the last run",
+         [({"step": step}, values["rows"]) for step, values in record["steps"].items()]),
+        ("dengue_pipeline_artifact_rows", "Rows of each artifact of the last run's snapshot",
+         [({"artifact": kind}, rows) for kind, rows in record["artifacts"].items()]),
+        ("dengue_pipeline_workbook_bytes", "Size of the workbook of the last run",
+         [({}, (record["workbook"] or {}).get("bytes"))]),
+    ]
+    lines = []
+    for name, help_text, samples in metrics:
+        samples = [(labels, value) for labels, value in samples if isinstance(value, (int, float))]
+        if not samples:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(record, path):
+    """Writes the textfile atomically (the collector must never read a half-written file)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(record))
+    os.replace(tmp_path, path)
+    return path
+
+
+def record_run(profiler, date, status, output_dir=OUTPUT_DIR, metrics_dir=METRICS_DIR, workbook=None):
+    """
+    Appends the run to the history (and to the Prometheus textfile when DENGUE_METRICS_TEXTFILE
+    is set), then prints what moved against the previous runs.
+
+    :param workbook: Path of the workbook this run produced, see build_record
+    :return: The record
+    """
+    record = build_record(profiler, date, status, output_dir, workbook)
+    print(f"[INFO] Metrics appended to {append_record(record, metrics_dir)}")
+    textfile = os.environ.get(TEXTFILE_ENV)
+    if textfile:
+        print(f"[INFO] Prometheus metrics written to {write_prometheus(record, textfile)}")
+    print_findings(compare_latest(load_history(metrics_dir)))
+    return record
+
+
+# --- Report ---
+@dataclass
+class Finding:
+    """A metric of the latest run that moved beyond the threshold against the rolling median."""
+    metric: str
+    kind: str        # 'seconds' or 'rows'
+    value: float
+    median: float
+
+    @property
+    def change(self):
+        """Relative change, None against a median of 0 (no relative change to speak of)."""
+        return (self.value - self.median) / self.median if self.median else None
+
+    def __str__(self):
+        unit = "s" if self.kind == "seconds" else " rows"
+        value = f"{self.value:.2f}" if self.kind == "seconds" else f"{self.value:,.0f}"
+        median = f"{self.median:.2f}" if self.kind == "seconds" else f"{self.median:,.0f}"
+        change = f"{self.change:+.0%}" if self.change is not None else "was 0"
+        return f"{self.metric} {self.kind}: {value}{unit} vs median {median}{unit} ({change})"
+
+
+def _metrics(record):
+    """{(metric, kind): value} of one record: step durations and rows, artifact rows."""
+    values = {}
+    for step, entry in record.get("steps", {}).items():
+        for kind in ("seconds", "rows"):
+            if isinstance(entry.get(kind), (int, float)):
+                values[(step, kind)] = entry[kind]
+    for kind, rows in record.get("artifacts", {}).items():
+        if isinstance(rows, (int, float)):
+            values[(f"artifact/{kind}", "rows")] = rows
+    return values
+
+
+def compare_latest(history, window=WINDOW, threshold=DURATION_THRESHOLD, rows_threshold=ROWS_THRESHOLD,
+                   min_seconds=MIN_SECONDS):
+    """
+    Metrics of the latest record that moved against the median of the `window` records before it.
+
+    A duration is flagged when it changed by more than `threshold` (relative) and `min_seconds`;
+    a row count when it changed by more than `rows_threshold`, or when it stopped being 0 for
+    a median of 0. Metrics with no previous value aren't flagged.
+
+    :return: list of Finding, largest change first (changes from a median of 0 before the others)
+    """
+    if len(history) < 2:
+        return []
+    latest, previous = _metrics(history[-1]), [_metrics(r) for r in history[-window - 1:-1]]
+    findings = []
+    for (metric, kind), value in latest.items():
+        past = [values[(metric, kind)] for values in previous if (metric, kind) in values]
+        if not past:
+            continue
+        median = statistics.median(past)
+        moved = abs(value - median)
+        if kind == "seconds":
+            flagged = moved > threshold * median and moved >= min_seconds
+        else:
+            flagged = moved > rows_threshold * median
+        if flagged:
+            findings.append(Finding(metric, kind, value, median))
+    return sorted(findings, key=lambda f: -abs(f.change) if f.change is not None else float("-inf"))
+
+
+def print_findings(findings):
+    for finding in findings:
+        print(f"[WARN] {finding}")
+    if not findings:
+        print("[INFO] No step or row count moved beyond its threshold against the previous runs.")
+
+
+def report(metrics_dir=METRICS_DIR, window=WINDOW, threshold=DURATION_THRESHOLD, rows_threshold=ROWS_THRESHOLD,
+           min_seconds=MIN_SECONDS):
+    """
+    Prints the trend of the latest runs and the metrics that moved.
+
+    :return: list of Finding of the latest run
+    """
+    history = load_history(metrics_dir)
+    if not history:
+        print(f"[INFO] No metrics yet in {os.path.join(metrics_dir, HISTORY_FILE)}.")
+        return []
+    for record in history[-window - 1:]:
+        workbook = (record.get("workbook") or {}).get("bytes")
+        rss = record.get("peak_rss")
+        print(f"[INFO] {record['run_at']} {record['date']} {record['status']:<6} {record['seconds']:8.2f}s"
+              + (f"  {rss / 2**20:7.1f} MiB peak" if rss else "")
+              + (f"  workbook {workbook / 2**20:.1f} MiB" if workbook else ""))
+    findings = compare_latest(history, window, threshold, rows_threshold, min_seconds)
+    print_findings(findings)
+    return findings
+
+
+if __name__ == "__main__":
+    # python -m modules.metrics_history [--window 8] [--threshold 0.5] [--rows-threshold 0.1]
+    # (same as: python main.py report); exits 1 when something moved
+    parser = argparse.ArgumentParser(description="Trend of the pipeline runs and metrics that moved.")
+    parser.add_argument("--window", type=int, default=WINDOW,
+                        help=f"Previous runs in the rolling median (default: {WINDOW})")
+    parser.add_argument("--threshold", type=float, default=DURATION_THRESHOLD,
+                        help=f"Relative duration change to flag (default: {DURATION_THRESHOLD})")
+    parser.add_argument("--rows-threshold", type=float, default=ROWS_THRESHOLD,
+                        help=f"Relative row count change to flag (default: {ROWS_THRESHOLD})")
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS,
+                        help=f"Ignore duration changes smaller than this (default: {MIN_SECONDS})")
+    args = parser.parse_args()
+    sys.exit(1 if report(window=args.window, threshold=args.threshold, rows_threshold=args.rows_threshold,
+                         min_seconds=args.min_seconds) else 0)
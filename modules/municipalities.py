@@ -0,0 +1,296 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+
+# Every IBGE municipality (7-digit code, 6-digit code as in Tabnet, name, UF, health region code),
+# compiled by `build` into the arrays loaded at run time
+REFERENCE_CSV = os.path.join(BASE_DIR, "modules", "reference", "municipalities.csv")
+REFERENCE_PATH = os.path.join(BASE_DIR, "modules", "reference", "municipalities.npz")
+NO_HEALTH_REGION = -1
+
+# IBGE code, sigla, name (as uf_name() writes it) and region of each UF, in IBGE code order
+UFS = (
+    (11, "RO", "Rondonia", "Norte"), (12, "AC", "Acre", "Norte"), (13, "AM", "Amazonas", "Norte"),
+    (14, "RR", "Roraima", "Norte"), (15, "PA", "Para", "Norte"), (16, "AP", "Amapa", "Norte"),
+    (17, "TO", "Tocantins", "Norte"),
+    (21, "MA", "Maranhao", "Nordeste"), (22, "PI", "Piaui", "Nordeste"), (23, "CE", "Ceara", "Nordeste"),
+    (24, "RN", "Rio Grande do Norte", "Nordeste"), (25, "PB", "Paraiba", "Nordeste"),
+    (26, "PE", "Pernambuco", "Nordeste"), (27, "AL", "Alagoas", "Nordeste"), (28, "SE", "Sergipe", "Nordeste"),
+    (29, "BA", "Bahia", "Nordeste"),
+    (31, "MG", "Minas Gerais", "Sudeste"), (32, "ES", "Espirito Santo", "Sudeste"),
+    (33, "RJ", "Rio de Janeiro", "Sudeste"), (35, "SP", "Sao Paulo", "Sudeste"),
+    (41, "PR", "Parana", "Sul"), (42, "SC", "Santa Catarina", "Sul"), (43, "RS", "Rio Grande do Sul", "Sul"),
+    (50, "MS", "Mato Grosso do Sul", "Centro-Oeste"), (51, "MT", "Mato Grosso", "Centro-Oeste"),
+    (52, "GO", "Goias", "Centro-Oeste"), (53, "DF", "Distrito Federal", "Centro-Oeste"),
+)
+REGIONS = ("Norte", "Nordeste", "Sudeste", "Sul", "Centro-Oeste")  # first digit of the IBGE code, 1-5
+
+# Array lookups: 2-digit code prefix -> position in UFS / REGIONS (-1: not a UF)
+_UF_BY_PREFIX = np.full(100, -1, dtype=np.intp)
+_UF_BY_PREFIX[[code for code, _, _, _ in UFS]] = np.arange(len(UFS))
+_REGION_BY_PREFIX = np.full(100, -1, dtype=np.intp)
+_REGION_BY_PREFIX[[code for code, _, _, _ in UFS]] = [REGIONS.index(region) for _, _, _, region in UFS]
+
+
+def uf_positions(codes):
+    """Position in UFS of each 6-digit IBGE code (-1 if the prefix isn't a UF)."""
+    # Out-of-range prefixes are clipped to 0 or 99, neither of which is a UF
+    return _UF_BY_PREFIX.take(np.asarray(codes) // 10_000, mode="clip")
+
+
+def region_positions(codes):
+    """Position in REGIONS of each 6-digit IBGE code (-1 if the prefix isn't a UF)."""
+    return _REGION_BY_PREFIX.take(np.asarray(codes) // 10_000, mode="clip")
+
+
+class MunicipalityIndex:
+    """
+    Municipality reference: the sorted 6-digit IBGE codes of every municipality with their UF,
+    region and health region as parallel NumPy arrays (modules/reference/municipalities.npz).
+
+    A code missing from the index (e.g. a municipality created after the reference was built)
+    still gets its UF and region from its first 2 digits; its health region is NO_HEALTH_REGION.
+    """
+
+    def __init__(self, codes, health_region=None):
+        order = np.argsort(codes, kind="stable")
+        self.codes = np.asarray(codes, dtype=np.int32)[order]
+        self.uf = uf_positions(self.codes).astype(np.int8)
+        self.region = region_positions(self.codes).astype(np.int8)
+        if health_region is None:
+            health_region = np.full(len(self.codes), NO_HEALTH_REGION)
+        self.health_region = np.asarray(health_region, dtype=np.int32)[order]
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def load(cls, path=REFERENCE_PATH):
+        with np.load(path) as data:
+            index = cls.__new__(cls)
+            index.codes, index.uf = data["codes"], data["uf"]
+            index.region, index.health_region = data["region"], data["health_region"]
+        return index
+
+    def save(self, path=REFERENCE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, codes=self.codes, uf=self.uf, region=self.region,
+                            health_region=self.health_region)
+        os.replace(tmp_path, path)
+        return path
+
+    def positions(self, codes):
+        """Position of each code in the index, -1 for codes it doesn't know."""
+        codes = np.asarray(codes, dtype=np.int64)
+        positions = np.searchsorted(self.codes, codes)
+        found = positions < len(self.codes)
+        found[found] = self.codes[positions[found]] == codes[found]
+        return np.where(found, positions, -1)
+
+    def lookup(self, codes):
+        """
+        UF, region and health region of each code, as positions in UFS, REGIONS and
+        health_regions() (-1 where unknown).
+
+        :return: (uf, region, health_region) arrays, one value per code
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        positions = self.positions(codes)
+        known, at = positions >= 0, positions.clip(0)
+        uf = np.where(known, self.uf[at], uf_positions(codes))
+        region = np.where(known, self.region[at], region_positions(codes))
+        health = np.where(known, self.health_region[at], NO_HEALTH_REGION)
+        # Dense ids 0..n-1 of the health regions (their codes are sparse)
+        regions = self.health_regions()
+        health = np.where(health != NO_HEALTH_REGION, np.searchsorted(regions, health), -1)
+        return uf, region, health
+
+    def health_regions(self):
+        """Sorted codes of the health regions the index knows."""
+        return np.unique(self.health_region[self.health_region != NO_HEALTH_REGION])
+
+
+_INDEX = None
+
+
+def reference():
+    """The bundled MunicipalityIndex, loaded on first use and kept for the process."""
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = MunicipalityIndex.load()
+    return _INDEX
+
+
+# --- Rollups ---
+def group_sums(groups, values, n_groups):
+    """
+    Sum of `values` and number of rows in each group 0..n_groups-1 (rows in group -1 are
+    left out), in one pass: np.bincount over the group positions.
+
+    :return: (sums int64, counts int64), both of length n_groups
+    """
+    # Shifted by one so group -1 lands in bin 0, which is dropped (no masking copy)
+    bins = np.asarray(groups, dtype=np.intp) + 1
+    sums = np.bincount(bins, weights=np.asarray(values, dtype=np.float64), minlength=n_groups + 1)[1:]
+    counts = np.bincount(bins, minlength=n_groups + 1)[1:]
+    return np.rint(sums).astype(np.int64), counts.astype(np.int64)
+
+
+def _cases(city_cases):
+    codes = city_cases["Cod Mun"].to_numpy()
+    cases = city_cases["Casos Provaveis"].fillna(0).to_numpy(dtype=np.int64)
+    return codes, cases
+
+
+def rollup_uf(city_cases, index=None):
+    """
+    Probable cases of a load_city_cases() frame summed by UF.
+
+    :return: DataFrame, one row per UF: 'Sigla', 'UF', 'Região', 'Municipios', 'Casos Provaveis'
+    """
+    index = index if index is not None else reference()
+    codes, cases = _cases(city_cases)
+    uf, _, _ = index.lookup(codes)
+    sums, counts = group_sums(uf, cases, len(UFS))
+    return pd.DataFrame({
+        "Sigla": [sigla for _, sigla, _, _ in UFS],
+        "UF": [name for _, _, name, _ in UFS],
+        "Região": [region for _, _, _, region in UFS],
+        "Municipios": counts,
+        "Casos Provaveis": sums,
+    })
+
+
+def rollup_region(city_cases, index=None):
+    """
+    Probable cases of a load_city_cases() frame summed by region.
+
+    :return: DataFrame, one row per region: 'Região', 'Municipios', 'Casos Provaveis'
+    """
+    index = index if index is not None else reference()
+    codes, cases = _cases(city_cases)
+    _, region, _ = index.lookup(codes)
+    sums, counts = group_sums(region, cases, len(REGIONS))
+    return pd.DataFrame({"Região": list(REGIONS), "Municipios": counts, "Casos Provaveis": sums})
+
+
+def rollup_health_region(city_cases, index=None):
+    """
+    Probable cases of a load_city_cases() frame summed by health region, for the
+    municipalities whose health region the index knows.
+
+    :return: DataFrame 'Regiao de Saude', 'Municipios', 'Casos Provaveis', one row per health
+        region of the index (empty if it knows none)
+    """
+    index = index if index is not None else reference()
+    codes, cases = _cases(city_cases)
+    _, _, health = index.lookup(codes)
+    regions = index.health_regions()
+    sums, counts = group_sums(health, cases, len(regions))
+    return pd.DataFrame({"Regiao de Saude": regions, "Municipios": counts, "Casos Provaveis": sums})
+
+
+def compare_uf(city_cases, big_numbers):
+    """
+    Municipality totals next to the dashboard's UF big numbers.
+
+    :param big_numbers: load_big_numbers_uf() frame
+    :return: rollup_uf() plus 'Casos Big Numbers' and 'Diferenca' (municipalities - big numbers)
+    """
+    from modules.loaders import uf_name
+
+    published = big_numbers["casos_provaveis"].rename(index=uf_name)
+    table = rollup_uf(city_cases)
+    table["Casos Big Numbers"] = table["UF"].map(published).astype("Int64")
+    table["Diferenca"] = table["Casos Provaveis"] - table["Casos Big Numbers"]
+    return table
+
+
+# --- Building the reference ---
+def read_reference(path=REFERENCE_CSV):
+    """The municipality table (modules/reference/municipalities.csv) as a DataFrame of strings."""
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def read_health_regions(path):
+    """
+    {6-digit IBGE code: health region code} from a CSV with 'cod_mun' (6 or 7 digits) and
+    'cod_regiao_saude' columns, e.g. the DATASUS table of regiões de saúde (CO_MUNICIP, CO_REGSAUD).
+    """
+    df = pd.read_csv(path, dtype=str, sep=None, engine="python")
+    df = df.rename(columns=lambda c: c.strip().lower()).rename(columns={"co_municip": "cod_mun",
+                                                                        "co_regsaud": "cod_regiao_saude"})
+    codes = df["cod_mun"].str.strip().str[:6]
+    return dict(zip(codes, df["cod_regiao_saude"].str.strip()))
+
+
+def build_reference(health_regions_path=None, csv_path=REFERENCE_CSV, path=REFERENCE_PATH):
+    """
+    Compiles the municipality table into the arrays loaded at run time. With a health region
+    table, its codes are first written into the municipality table's 'cod_regiao_saude'.
+
+    :return: The new MunicipalityIndex
+    """
+    table = read_reference(csv_path)
+    if health_regions_path:
+        health = read_health_regions(health_regions_path)
+        table["cod_regiao_saude"] = table["cod_mun"].map(health).fillna(table["cod_regiao_saude"])
+        table.to_csv(csv_path, index=False, lineterminator="\n")
+
+    regions = pd.to_numeric(table["cod_regiao_saude"].replace("", None)).fillna(NO_HEALTH_REGION)
+    index = MunicipalityIndex(table["cod_mun"].astype(np.int32).to_numpy(), regions.astype(np.int32).to_numpy())
+    index.save(path)
+
+    known = int((index.health_region != NO_HEALTH_REGION).sum())
+    print(f"[SUCCESS] {len(index)} municipalities ({known} with a health region) saved to {path}")
+    if not known:
+        print("[WARN] No health regions in the reference: run `build --health-regions <csv>` with the "
+              "DATASUS table of regiões de saúde to fill them.")
+    return index
+
+
+if __name__ == "__main__":
+    # python -m modules.municipalities build [--health-regions regioes_saude.csv]
+    # python -m modules.municipalities uf|region|health|compare [--date YYYY_MM_DD]
+    parser = argparse.ArgumentParser(description="Municipality reference index and rollups of city cases.")
+    parser.add_argument("command", choices=["build", "uf", "region", "health", "compare"])
+    parser.add_argument("--date", help="Snapshot date YYYY_MM_DD (default: latest)")
+    parser.add_argument("--health-regions", help="CSV with cod_mun and cod_regiao_saude (build)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_reference(args.health_regions)
+        sys.exit(0)
+
+    from modules.manifest import artifact_for_date
+    from modules.loaders import load_city_cases, load_big_numbers_uf
+
+    def artifact(kind):
+        # None: the loaders take the latest artifact
+        path = artifact_for_date(kind, args.date) if args.date else None
+        if args.date and path is None:
+            print(f"[ERROR] No {kind} artifact for {args.date}")
+            sys.exit(1)
+        return path
+
+    city_cases = load_city_cases(artifact("city_cases"))
+    if args.command == "uf":
+        table = rollup_uf(city_cases)
+    elif args.command == "region":
+        table = rollup_region(city_cases)
+    elif args.command == "health":
+        table = rollup_health_region(city_cases)
+        if table.empty:
+            print("[WARN] The reference knows no health regions yet (see `build --health-regions`).")
+    else:
+        table = compare_uf(city_cases, load_big_numbers_uf(artifact("big_numbers_uf")))
+    print(table.to_string(index=False))
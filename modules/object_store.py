@@ -0,0 +1,325 @@
+import os
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+
+try:
+    import zstandard  # optional: better ratio and much faster than gzip
+except ImportError:
+    zstandard = None
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+
+# output/_objects/<2 first hex>/<sha256>[.gz|.zst]: every artifact content stored once
+OBJECTS_DIR = "_objects"
+VIEWS_DIR = "views"
+REF_SUFFIX = ".ref"
+CODECS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+DEFAULT_CODEC = os.environ.get("DENGUE_OBJECT_CODEC", "none")
+CHUNK_SIZE = 1 << 20
+
+
+def is_ref(path):
+    return path.endswith(REF_SUFFIX)
+
+
+def _objects_dir(output_dir):
+    return os.path.join(output_dir, OBJECTS_DIR)
+
+
+def _output_dir_of(ref_path):
+    # output/dengue_<date>/<name>.ref -> output/
+    return os.path.dirname(os.path.dirname(os.path.abspath(ref_path)))
+
+
+def _codec(codec):
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {', '.join(CODECS)}")
+    if codec == "zstd" and zstandard is None:
+        print("[WARN] zstandard is not installed, storing objects with gzip instead.")
+        return "gzip"
+    return codec
+
+
+def object_path(digest, codec="none", output_dir="output"):
+    return os.path.join(_objects_dir(output_dir), digest[:2], digest + CODECS[codec])
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _open_object(path, codec, mode):
+    if codec == "gzip":
+        # mtime 0: the same content always compresses to the same bytes
+        return gzip.GzipFile(path, mode, mtime=0) if "w" in mode else gzip.open(path, mode)
+    if codec == "zstd":
+        f = open(path, mode)
+        ctx = zstandard.ZstdCompressor(level=10) if "w" in mode else zstandard.ZstdDecompressor()
+        return ctx.stream_writer(f, closefd=True) if "w" in mode else ctx.stream_reader(f, closefd=True)
+    return open(path, mode)
+
+
+# --- Objects and references ---
+def find_object(digest, output_dir="output"):
+    """Codec the object `digest` is stored with, None if the store doesn't have it."""
+    return next((c for c in CODECS if os.path.exists(object_path(digest, c, output_dir))), None)
+
+
+def put_object(path, codec=DEFAULT_CODEC, output_dir="output"):
+    """
+    Stores the content of `path` in the object store (once: an existing object is reused).
+
+    :return: (sha256 of the content, codec actually used)
+    """
+    codec = _codec(codec)
+    digest = file_digest(path)
+    existing = find_object(digest, output_dir)
+    if existing is not None:
+        return digest, existing
+
+    target = object_path(digest, codec, output_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(path, "rb") as src, _open_object(tmp_path, codec, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return digest, codec
+
+
+def read_ref(ref_path):
+    with open(ref_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def store_file(path, codec=DEFAULT_CODEC, output_dir="output"):
+    """
+    Moves an artifact into the object store, leaving `<path>.ref` in its place.
+
+    :return: Path of the reference file
+    """
+    digest, codec = put_object(path, codec, output_dir)
+    ref_path = path + REF_SUFFIX
+    with open(ref_path, "w", encoding="utf-8") as f:
+        json.dump({"object": digest, "codec": codec, "size": os.path.getsize(path)}, f)
+    os.remove(path)
+    return ref_path
+
+
+def resolve(path):
+    """
+    Readable file for an artifact path: the path itself, or for a reference the object's
+    content under output/_objects/views/<sha256>/<artifact name>, so loaders, patterns and
+    dates in file names work unchanged.
+
+    Views of uncompressed objects are hard links (no extra space); compressed ones are
+    decompressed once. They are caches: `gc` deletes them and they are recreated on demand.
+    Never write to a view, write a new artifact instead.
+
+    :raises FileNotFoundError: If the referenced object is missing
+    """
+    if not is_ref(path):
+        return path
+    ref = read_ref(path)
+    name = os.path.basename(path)[:-len(REF_SUFFIX)]
+    try:
+        return object_view(ref["object"], ref["codec"], name, _output_dir_of(path))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Object {ref['object']} referenced by {path} is missing from the store") from None
+
+
+def object_view(digest, codec, name, output_dir="output"):
+    """
+    Readable file with the content of object `digest`, named `name`
+    (output/_objects/views/<sha256>/<name>, see resolve()).
+
+    :raises FileNotFoundError: If the object is missing
+    """
+    view = os.path.join(_objects_dir(output_dir), VIEWS_DIR, digest, name)
+    if os.path.exists(view):
+        return view
+
+    source = object_path(digest, codec, output_dir)
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Object {digest} is missing from the store")
+    os.makedirs(os.path.dirname(view), exist_ok=True)
+    tmp_path = f"{view}.{os.getpid()}.tmp"
+    try:
+        if codec == "none":
+            try:
+                os.link(source, tmp_path)
+            except OSError:  # filesystem without hard links
+                shutil.copyfile(source, tmp_path)
+        else:
+            with _open_object(source, codec, "rb") as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.replace(tmp_path, view)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return view
+
+
+# --- Tree maintenance ---
+def _snapshot_files(output_dir):
+    for folder in sorted(os.listdir(output_dir)) if os.path.isdir(output_dir) else []:
+        folder_path = os.path.join(output_dir, folder)
+        if folder.startswith("dengue_") and os.path.isdir(folder_path):
+            for name in sorted(os.listdir(folder_path)):
+                path = os.path.join(folder_path, name)
+                if os.path.isfile(path):
+                    yield path
+
+
+def enabled(output_dir="output"):
+    """Runs store their snapshot once the tree has been migrated (output/_objects/ exists)."""
+    return os.path.isdir(_objects_dir(output_dir))
+
+
+def store_snapshot(folder, codec=DEFAULT_CODEC, output_dir="output"):
+    """
+    Moves every artifact of one output/dengue_<date>/ folder into the object store
+    (after a successful run, when nothing will rewrite them anymore).
+
+    :return: Number of artifacts stored
+    """
+    from modules.manifest import register_folder, is_delta
+
+    stored = 0
+    for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and not is_ref(path) and not is_delta(path):
+            store_file(path, codec, output_dir)
+            stored += 1
+    if stored:
+        register_folder(folder, output_dir)
+    return stored
+
+
+def migrate(output_dir="output", codec=DEFAULT_CODEC):
+    """
+    Converts every output/dengue_*/ folder: artifacts go to the object store, references stay.
+
+    :return: (bytes before, bytes after) of the artifacts, objects included
+    """
+    from modules.manifest import rebuild_manifest, is_delta
+
+    before = after_refs = 0
+    for path in _snapshot_files(output_dir):
+        if not is_ref(path) and not is_delta(path):
+            before += os.path.getsize(path)
+            after_refs += os.path.getsize(store_file(path, codec, output_dir))
+    rebuild_manifest(output_dir)
+
+    objects = sum(size for _, size in _objects(output_dir).values())
+    after = after_refs + objects
+    print(f"[SUCCESS] Migrated {before / 1024:.0f} KiB of artifacts to {after / 1024:.0f} KiB "
+          f"({objects / 1024:.0f} KiB of objects) in {_objects_dir(output_dir)}")
+    return before, after
+
+
+def _objects(output_dir):
+    """{sha256: (path, bytes)} of every object in the store (views excluded)."""
+    objects = {}
+    root = _objects_dir(output_dir)
+    for prefix in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        if prefix == VIEWS_DIR or not os.path.isdir(os.path.join(root, prefix)):
+            continue
+        for name in os.listdir(os.path.join(root, prefix)):
+            path = os.path.join(root, prefix, name)
+            digest = name.split(".", 1)[0]
+            if len(digest) == 64:
+                objects[digest] = (path, os.path.getsize(path))
+    return objects
+
+
+def _referenced(output_dir):
+    """Objects pointed to by a reference, or kept as the raw bytes of a compacted artifact."""
+    from modules.manifest import is_delta
+
+    referenced = set()
+    for path in _snapshot_files(output_dir):
+        if is_ref(path):
+            referenced.add(read_ref(path)["object"])
+        elif is_delta(path):
+            raw = read_ref(path).get("raw")
+            if raw:
+                referenced.add(raw["object"])
+    return referenced
+
+
+def gc(output_dir="output"):
+    """
+    Deletes the views and every object no reference points to (the raw bytes of compacted
+    artifacts, see modules.deltas.compact, count as referenced). Returns bytes freed.
+    """
+    freed = 0
+    views = os.path.join(_objects_dir(output_dir), VIEWS_DIR)
+    if os.path.isdir(views):
+        shutil.rmtree(views)
+    referenced = _referenced(output_dir)
+    for digest, (path, size) in _objects(output_dir).items():
+        if digest not in referenced:
+            os.remove(path)
+            freed += size
+    print(f"[INFO] Removed views and {freed / 1024:.0f} KiB of unreferenced objects")
+    return freed
+
+
+def verify(output_dir="output"):
+    """
+    Checks that every reference points to an object whose content matches its hash.
+
+    :return: list of problems (empty when the store is consistent)
+    """
+    problems = []
+    objects = _objects(output_dir)
+    for ref_path in (p for p in _snapshot_files(output_dir) if is_ref(p)):
+        ref = read_ref(ref_path)
+        if ref["object"] not in objects:
+            problems.append(f"{ref_path}: object {ref['object']} is missing")
+            continue
+        digest = hashlib.sha256()
+        with _open_object(objects[ref["object"]][0], ref["codec"], "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != ref["object"]:
+            problems.append(f"{ref_path}: object {ref['object']} is corrupted")
+    return problems
+
+
+if __name__ == "__main__":
+    # python -m modules.object_store migrate [--codec gzip] -> move output/dengue_*/ artifacts into the store
+    # python -m modules.object_store verify                 -> check every reference against its object
+    # python -m modules.object_store gc                     -> drop views and unreferenced objects
+    parser = argparse.ArgumentParser(description="Content-addressed storage of the output/dengue_*/ artifacts.")
+    parser.add_argument("command", choices=["migrate", "verify", "gc"])
+    parser.add_argument("--codec", default=DEFAULT_CODEC, choices=list(CODECS),
+                        help=f"Compression of new objects (default: {DEFAULT_CODEC})")
+    parser.add_argument("--output-dir", default="output")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate(args.output_dir, args.codec)
+    elif args.command == "gc":
+        gc(args.output_dir)
+    else:
+        problems = verify(args.output_dir)
+        for problem in problems:
+            print(f"[ERROR] {problem}")
+        print("[SUCCESS] Every reference is intact." if not problems else f"[FAILED] {len(problems)} problem(s).")
+        sys.exit(1 if problems else 0)
@@ -0,0 +1,337 @@
+import os
+import sys
+import csv
+import json
+import base64
+from urllib.parse import urlsplit, parse_qs
+
+import yaml
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import current_date, OUTPUT_DIR
+from modules.tabnet_client import ConnectionPool, HTTP_TIMEOUT
+
+
+# Public report of the Painel de Arboviroses (same URL the Playwright fetchers open)
+REPORT_URL = ("https://app.powerbi.com/view?r=eyJrIjoiYzQyOTI4M2ItZTQwMC00ODg4LWJiNTQtODc5MzljNWIzYzg3IiwidCI6Ij"
+              "lhNTU0YWQzLWI1MmItNDg2Mi1hMzZmLTg0ZDg5MWU1YzcwNSJ9&pageName=ReportSectionbd7616200acb303571fc")
+ROUTING_URL = "https://api.powerbi.com/public/routing/cluster/{tenant}"
+
+# Names in the report's model, as sent by the report's own querydata requests.
+# If the report is republished with other names, only these need updating.
+DENGUE_ENTITY = "Dengue"
+UF_COLUMN = "UF"                 # 'UF' slicer (bigNumbersUF.js)
+WEEK_COLUMN = "SEM_PRI_SE"       # 'SEM_PRI_SE' slicer (SEFetcher.js)
+YEAR_WEEK_COLUMN = "Ano/Semana"  # columns of the weeks x UF matrix (semanaEpidemiologica.js)
+CASES = "Casos prováveis de Dengue"
+INCIDENCE = "Coeficiente de incidência"
+DEATHS_INVESTIGATION = "Óbitos em investigação"
+DEATHS = "Óbitos por Dengue"
+LETHALITY_SEVERE = "Letalidade (óbito) em casos graves"
+LETHALITY_PROBABLE = "Letalidade (óbito) em casos prováveis"
+
+# Decimals shown by the report's cards; counts are written with thousands separators
+RATE_DECIMALS = {INCIDENCE: 1, LETHALITY_SEVERE: 2, LETHALITY_PROBABLE: 2}
+
+QUERY_WINDOW = 30000   # rows per query; weeks x UF is ~2,100 for a year and a half
+AGGREGATE_MAX = 4      # QueryAggregateFunction.Max
+
+
+class PowerBIError(RuntimeError):
+    pass
+
+
+# --- Report discovery ---
+def report_key(report_url=REPORT_URL):
+    """
+    Resource key and tenant of a public report, from the base64 JSON in its `r` parameter.
+
+    :return: (resource key, tenant id)
+    """
+    token = parse_qs(urlsplit(report_url).query)["r"][0]
+    payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    return payload["k"], payload["t"]
+
+
+def _get_json(pool, url, headers=None):
+    status, body = pool.request("GET", url, headers=headers)
+    if status != 200:
+        raise PowerBIError(f"Power BI returned HTTP {status} for {urlsplit(url).path}")
+    return json.loads(body)
+
+
+def cluster_api_url(tenant, routing_url=ROUTING_URL, timeout=HTTP_TIMEOUT):
+    """API base URL of the cluster hosting the tenant's reports, e.g. https://wabi-...-api.analysis.windows.net"""
+    url = routing_url.format(tenant=tenant)
+    pool = ConnectionPool(url, size=1, timeout=timeout)
+    try:
+        cluster = _get_json(pool, url)["FixedClusterUri"]
+    finally:
+        pool.close()
+    parts = urlsplit(cluster)
+    host = parts.netloc.replace("-redirect.", "-api.").replace("global-", "")
+    return f"{parts.scheme}://{host}"
+
+
+def load_model(pool, api_url, key):
+    """
+    Ids the querydata endpoint needs, from the report's modelsAndExploration.
+
+    :return: {'model_id', 'dataset_id', 'report_id'}
+    """
+    data = _get_json(pool, f"{api_url}/public/reports/{key}/modelsAndExploration?preferReadOnlySession=true",
+                     headers={"X-PowerBI-ResourceKey": key})
+    model = data["models"][0]
+    return {"model_id": model["id"], "dataset_id": model["dbName"],
+            "report_id": data["exploration"]["report"]["objectId"]}
+
+
+# --- Semantic queries ---
+def _column(name):
+    return {"Column": {"Expression": {"SourceRef": {"Source": "d"}}, "Property": name},
+            "Name": f"{DENGUE_ENTITY}.{name}"}
+
+
+def _measure(name):
+    return {"Measure": {"Expression": {"SourceRef": {"Source": "d"}}, "Property": name},
+            "Name": f"{DENGUE_ENTITY}.{name}"}
+
+
+def _max(name):
+    column = _column(name)
+    return {"Aggregation": {"Expression": {"Column": column["Column"]}, "Function": AGGREGATE_MAX},
+            "Name": f"Max({column['Name']})"}
+
+
+def _property(item):
+    """Model property a select item reads, e.g. 'Óbitos por Dengue' or 'SEM_PRI_SE' for Max(SEM_PRI_SE)."""
+    source = item.get("Column") or item.get("Measure") or item["Aggregation"]["Expression"]["Column"]
+    return source["Property"]
+
+
+def semantic_query(select, order_by=None):
+    """
+    SemanticQueryDataShapeCommand returning `select` (columns, measures, aggregations)
+    as one flat table: every projection in a single primary grouping, no pivot.
+    """
+    query = {"Version": 2, "From": [{"Name": "d", "Entity": DENGUE_ENTITY, "Type": 0}], "Select": select}
+    if order_by:
+        query["OrderBy"] = [{"Direction": 1, "Expression": {"Column": _column(name)["Column"]}}
+                            for name in order_by]
+    return {"SemanticQueryDataShapeCommand": {
+        "Query": query,
+        "Binding": {
+            "Primary": {"Groupings": [{"Projections": list(range(len(select)))}]},
+            "DataReduction": {"DataVolume": 4, "Primary": {"Window": {"Count": QUERY_WINDOW}}},
+            "Version": 1,
+        },
+        "ExecutionMetricsKind": 1,
+    }}
+
+
+# One query per visual the Playwright fetchers scraped
+VISUALS = {
+    # weeks x UF matrix ('Show as a table' + 'Copy selection' of every column)
+    "semana_epidemiologica": semantic_query(
+        [_column(UF_COLUMN), _column(YEAR_WEEK_COLUMN), _measure(CASES)], order_by=[YEAR_WEEK_COLUMN]),
+    # big number cards for each UF (one slicer click per UF)
+    "big_numbers_uf": semantic_query(
+        [_column(UF_COLUMN), _measure(CASES), _measure(DEATHS_INVESTIGATION), _measure(DEATHS), _measure(INCIDENCE)]),
+    # big number cards with every week selected, plus the last week of the slicer
+    "se_cards": semantic_query(
+        [_max(WEEK_COLUMN), _measure(CASES), _measure(INCIDENCE), _measure(LETHALITY_SEVERE),
+         _measure(LETHALITY_PROBABLE), _measure(DEATHS_INVESTIGATION), _measure(DEATHS)]),
+}
+
+
+def decode_dsr(data):
+    """
+    Rows of a querydata result in the compressed DSR format, as {select name: value}.
+
+    Each row of DM0 lists only the values that changed: bit i of 'R' repeats column i of
+    the previous row, bit i of 'Ø' makes it null, and columns with a 'DN' hold indexes
+    into that ValueDict. The first row's 'S' gives the columns.
+    """
+    names = {item["Value"]: item["Name"] for item in data["descriptor"]["Select"]}
+    dataset = data["dsr"]["DS"][0]
+    if "odata.error" in dataset:
+        raise PowerBIError(dataset["odata.error"].get("message", {}).get("value", "query error"))
+    if dataset.get("RT"):
+        raise PowerBIError(f"Result truncated at {QUERY_WINDOW} rows")
+
+    value_dicts = dataset.get("ValueDicts", {})
+    rows, schema, previous = [], None, []
+    for row in dataset["PH"][0].get("DM0", []):
+        if "S" in row:
+            schema, previous = row["S"], [None] * len(row["S"])
+        if schema is None:
+            # Queries without groupings (cards) come back as one plain {M0: value} row
+            rows.append({names[k]: v for k, v in row.items() if k in names})
+            continue
+        repeat, nulls = row.get("R", 0), row.get("Ø", 0)
+        values = iter(row.get("C", []))
+        current = []
+        for i, column in enumerate(schema):
+            if repeat >> i & 1:
+                value = previous[i]
+            elif nulls >> i & 1:
+                value = None
+            else:
+                value = next(values)
+                if "DN" in column and isinstance(value, int):
+                    value = value_dicts[column["DN"]][value]
+            current.append(value)
+        previous = current
+        rows.append({names.get(column["N"], column["N"]): value for column, value in zip(schema, current)})
+    return rows
+
+
+def query_visuals(pool, api_url, key, model, visuals):
+    """
+    Runs the queries of `visuals` in a single batched querydata request.
+
+    :return: {visual: rows as {property name: value}}
+    """
+    body = {
+        "version": "1.0.0",
+        "queries": [{
+            "Query": {"Commands": [VISUALS[visual]]},
+            "QueryId": "",
+            "ApplicationContext": {"DatasetId": model["dataset_id"],
+                                   "Sources": [{"ReportId": model["report_id"], "VisualId": visual}]},
+        } for visual in visuals],
+        "cancelQueries": [],
+        "modelId": model["model_id"],
+    }
+    status, response = pool.request("POST", f"{api_url}/public/reports/querydata?synchronous=true",
+                                    body=json.dumps(body).encode("utf-8"),
+                                    headers={"Content-Type": "application/json", "X-PowerBI-ResourceKey": key})
+    if status != 200:
+        raise PowerBIError(f"querydata returned HTTP {status}")
+
+    results = json.loads(response).get("results", [])
+    if len(results) != len(visuals):
+        raise PowerBIError(f"querydata returned {len(results)} result(s) for {len(visuals)} queries")
+    rows = {}
+    for visual, result in zip(visuals, results):
+        result = result.get("result", {})
+        if "error" in result or "data" not in result:
+            raise PowerBIError(f"Query of {visual} failed: {result.get('error', result)}")
+        # Keyed by model property ('Dengue.UF' -> 'UF', 'Max(Dengue.SEM_PRI_SE)' -> 'SEM_PRI_SE')
+        properties = {item["Name"]: _property(item)
+                      for item in VISUALS[visual]["SemanticQueryDataShapeCommand"]["Query"]["Select"]}
+        rows[visual] = [{properties.get(name, name): value for name, value in row.items()}
+                        for row in decode_dsr(result["data"])]
+    return rows
+
+
+# --- Artifacts (same content as the Playwright fetchers wrote) ---
+def format_value(name, value):
+    """Value as the report's cards show it: '1,516,819', '1029.4', '4.55'."""
+    if value is None:
+        return None
+    if name in RATE_DECIMALS:
+        return f"{float(value):.{RATE_DECIMALS[name]}f}"
+    return f"{int(float(value)):,}"
+
+
+def _cards(row, measures):
+    return {name: format_value(name, row.get(name)) for name in measures}
+
+
+def semana_epidemiologica_rows(rows):
+    """semana_epidemiologica_*.yaml (a CSV despite the name): one line per UF and week."""
+    lines = [["UF", "Ano/Semana", CASES]]
+    for row in rows:
+        if row.get(CASES) is not None:
+            lines.append([row[UF_COLUMN], row[YEAR_WEEK_COLUMN], int(float(row[CASES]))])
+    return lines
+
+
+def big_numbers_uf_data(rows):
+    """big_numbers_uf_*.yaml: {UF: {card label: value}}"""
+    measures = (CASES, DEATHS_INVESTIGATION, DEATHS, INCIDENCE)
+    return {row[UF_COLUMN]: _cards(row, measures) for row in rows if row.get(UF_COLUMN)}
+
+
+def se_cards_data(rows):
+    """SE-Y-<week>_*.yaml: last epidemiological week and the national cards."""
+    if not rows or rows[0].get(WEEK_COLUMN) is None:
+        raise PowerBIError("No epidemiological week in the cards query")
+    row = rows[0]
+    measures = (CASES, INCIDENCE, LETHALITY_SEVERE, LETHALITY_PROBABLE, DEATHS_INVESTIGATION, DEATHS)
+    return {"Last_Epidemiological_Week": str(int(float(row[WEEK_COLUMN]))), "All_Semanas_Data": _cards(row, measures)}
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def write_artifact(visual, rows, folder, date):
+    """Writes the artifact of one visual into output/dengue_<date>/ and returns its path."""
+    if visual == "semana_epidemiologica":
+        path = os.path.join(folder, f"semana_epidemiologica_{date}.yaml")
+        _write_atomic(path, lambda f: csv.writer(f, lineterminator="\n").writerows(semana_epidemiologica_rows(rows)))
+        return path
+    if visual == "big_numbers_uf":
+        data = big_numbers_uf_data(rows)
+        path = os.path.join(folder, f"big_numbers_uf_{date}.yaml")
+    else:
+        data = se_cards_data(rows)
+        path = os.path.join(folder, f"SE-Y-{data['Last_Epidemiological_Week']}_{date}.yaml")
+    _write_atomic(path, lambda f: yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False, width=float("inf")))
+    return path
+
+
+def fetch_visuals(visuals=None, date=None, output_dir=OUTPUT_DIR, report_url=REPORT_URL,
+                  routing_url=ROUTING_URL, timeout=HTTP_TIMEOUT):
+    """
+    Fetches the dashboard's weekly data from the report's query endpoint, without a browser.
+
+    All queries go in one querydata request over one keep-alive connection, and nothing is
+    written unless every query succeeded.
+
+    :param visuals: Names from VISUALS (default: all of them)
+    :param date: Run date 'YYYY_MM_DD' (default: DENGUE_RUN_DATE or today)
+    :param output_dir: Root of the output/dengue_<date>/ folders
+    :param report_url: Public report URL (its `r` parameter holds the resource key)
+    :param routing_url: Cluster routing URL, '{tenant}' is replaced by the tenant id
+    :return: {visual: path of the saved artifact}
+    """
+    date = date or os.environ.get("DENGUE_RUN_DATE") or current_date
+    visuals = list(visuals or VISUALS)
+    unknown = [v for v in visuals if v not in VISUALS]
+    if unknown:
+        raise ValueError(f"Unknown visual(s) {', '.join(unknown)}, expected {', '.join(VISUALS)}")
+
+    key, tenant = report_key(report_url)
+    api_url = cluster_api_url(tenant, routing_url, timeout)
+    pool = ConnectionPool(api_url, size=1, timeout=timeout)
+    try:
+        model = load_model(pool, api_url, key)
+        rows = query_visuals(pool, api_url, key, model, visuals)
+    finally:
+        pool.close()
+
+    folder = os.path.join(output_dir, f"dengue_{date}")
+    os.makedirs(folder, exist_ok=True)
+    paths = {}
+    for visual in visuals:
+        paths[visual] = write_artifact(visual, rows[visual], folder, date)
+        print(f"[SUCCESS] {visual} ({len(rows[visual])} rows) saved to: {paths[visual]}")
+    return paths
+
+
+if __name__ == "__main__":
+    # python -m modules.powerbi_client [semana_epidemiologica] [big_numbers_uf] [se_cards]
+    try:
+        fetch_visuals(sys.argv[1:] or None)
+    except Exception as e:
+        print(f"[ERROR] Power BI fetch failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+import cProfile
+from datetime import datetime
+from contextlib import contextmanager
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+
+PROFILE_DIR = os.path.join("output", "_profile")
+
+
+def _io_counters():
+    """(bytes read, bytes written) by this process so far, from /proc/self/io (Linux)."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _children_cpu():
+    """CPU seconds used by finished child processes (the Node/Python fetchers)."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_bytes(usage):
+    # ru_maxrss is in KiB on Linux, in bytes on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def max_rss():
+    """Peak resident memory of this process so far, in bytes (None without `resource`)."""
+    return _rss_bytes(resource.getrusage(resource.RUSAGE_SELF)) if resource else None
+
+
+def children_max_rss():
+    """Peak resident memory of the largest finished child process (e.g. a fetcher), in bytes."""
+    return _rss_bytes(resource.getrusage(resource.RUSAGE_CHILDREN)) if resource else None
+
+
+def _delta(end, start):
+    if end is None or start is None:
+        return None
+    if isinstance(end, tuple):
+        return tuple(e - s for e, s in zip(end, start))
+    return end - start
+
+
+class StepRecord(dict):
+    """One profiled step. Set `record.rows` inside the step to report how many rows it handled."""
+
+    @property
+    def rows(self):
+        return self.get("rows")
+
+    @rows.setter
+    def rows(self, value):
+        self["rows"] = value
+
+
+class Profiler:
+    """
+    Records wall/CPU time, peak memory (Python heap and process RSS), bytes read/written and
+    row counts per pipeline step.
+
+    Steps can nest (a transform inside the 'transform' step) and can run on worker threads
+    (validation checks); memory is only tracked on the main thread, where tracemalloc's
+    peak is meaningful.
+
+    :param memory: Track peak Python memory per step with tracemalloc (slows the run down)
+    :param cprofile_dir: If given, dump a cProfile .prof file per top-level step there
+    """
+
+    def __init__(self, memory=False, cprofile_dir=None):
+        self.memory = memory
+        self.cprofile_dir = cprofile_dir
+        self.records = []
+        self.started_at = datetime.now()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cprofile_active = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _offset(self):
+        return time.perf_counter() - self._origin
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def step(self, name, category="step", **extra):
+        """
+        Profiles the block as one step.
+
+        :param name: Step name, e.g. 'se_completa'
+        :param category: Group shown in the trace: fetch, prepare, transform, save, validation...
+        :param extra: Additional fields stored with the record
+        """
+        main_thread = threading.current_thread() is threading.main_thread()
+        stack = self._stack()
+        record = StepRecord(name=name, category=category, thread=threading.get_ident(),
+                            depth=len(stack), **extra)
+
+        track_memory = self.memory and main_thread and tracemalloc.is_tracing()
+        if track_memory:
+            if stack:
+                # Keep the parent's peak so far before resetting it for this step
+                stack[-1]["_peak"] = max(stack[-1].get("_peak", 0), tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            mem_start = tracemalloc.get_traced_memory()[0]
+
+        profile = None
+        if self.cprofile_dir and main_thread and not self._cprofile_active:
+            profile, self._cprofile_active = cProfile.Profile(), True
+
+        cpu_clock = time.process_time if main_thread else time.thread_time
+        io_start, children_start = _io_counters(), _children_cpu()
+        cpu_start, start = cpu_clock(), self._offset()
+        stack.append(record)
+        if profile:
+            profile.enable()
+        try:
+            yield record
+            record["status"] = record.get("status", "ok")
+        except BaseException as e:
+            record["status"] = f"error: {type(e).__name__}"
+            raise
+        finally:
+            if profile:
+                profile.disable()
+                self._cprofile_active = False
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                record["cprofile"] = os.path.join(self.cprofile_dir, f"{category}.{name}.prof")
+                profile.dump_stats(record["cprofile"])
+            stack.pop()
+
+            record["start"] = start
+            record["wall"] = self._offset() - start
+            record["cpu"] = cpu_clock() - cpu_start
+            record["children_cpu"] = _delta(_children_cpu(), children_start)
+            io = _delta(_io_counters(), io_start) if main_thread else None
+            record["bytes_read"], record["bytes_written"] = io if io else (None, None)
+            # High-water mark of the process at the end of the step: the step that raised it shows it
+            record["max_rss"] = max_rss() if main_thread else None
+
+            if track_memory:
+                peak = max(record.pop("_peak", 0), tracemalloc.get_traced_memory()[1])
+                record["peak_memory"] = peak - mem_start
+                if stack:
+                    stack[-1]["_peak"] = max(stack[-1].get("_peak", 0), peak)
+
+            with self._lock:
+                self.records.append(record)
+
+    def add_record(self, name, category, start, wall, **extra):
+        """
+        Adds a step measured elsewhere (e.g. a fetcher subprocess).
+
+        :param start: perf_counter() value when it started
+        :param wall: Duration in seconds
+        """
+        record = StepRecord(name=name, category=category, thread=f"{category}:{name}", depth=1,
+                            start=start - self._origin, wall=wall, **extra)
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    # --- Output ---
+    def summary(self):
+        """Prints one line per step, in start order."""
+        for r in sorted(self.records, key=lambda r: r["start"]):
+            parts = [f"{r['wall']:.2f}s wall"]
+            if r.get("cpu") is not None:
+                parts.append(f"{r['cpu']:.2f}s cpu")
+            if r.get("children_cpu"):
+                parts.append(f"{r['children_cpu']:.2f}s child cpu")
+            if r.get("peak_memory") is not None:
+                parts.append(f"{r['peak_memory'] / 2**20:.1f} MiB peak")
+            if r.get("bytes_read") is not None:
+                parts.append(f"{r['bytes_read'] / 2**20:.1f}/{r['bytes_written'] / 2**20:.1f} MiB r/w")
+            if r.get("rows") is not None:
+                parts.append(f"{r['rows']} rows")
+            print(f"[PROFILE] {'  ' * r['depth']}{r['category']}/{r['name']}: {', '.join(parts)}")
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_seconds": self._offset(),
+            "memory_tracked": self.memory,
+            "steps": sorted(self.records, key=lambda r: r["start"]),
+        }
+
+    def write_json(self, path):
+        """Machine-readable trace: one object per step."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+    def write_chrome_trace(self, path):
+        """Same steps in Chrome trace format (chrome://tracing, Perfetto, speedscope)."""
+        threads = {}
+        events = []
+        for r in sorted(self.records, key=lambda r: r["start"]):
+            tid = threads.setdefault(r["thread"], len(threads) + 1)
+            args = {k: v for k, v in r.items()
+                    if k not in ("name", "category", "thread", "start", "wall", "depth")}
+            events.append({
+                "name": r["name"], "cat": r["category"], "ph": "X",
+                "ts": round(r["start"] * 1e6), "dur": round(r["wall"] * 1e6),
+                "pid": os.getpid(), "tid": tid, "args": args,
+            })
+        for thread, tid in threads.items():
+            if isinstance(thread, str):
+                label = thread
+            else:
+                label = "main" if thread == threading.main_thread().ident else f"worker-{tid}"
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                           "args": {"name": label}})
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        return path
+
+    def write(self, profile_dir=PROFILE_DIR, chrome=False):
+        """Writes the JSON trace (and optionally the Chrome trace) named after the run start."""
+        stamp = self.started_at.strftime("%Y_%m_%d_%H%M%S")
+        paths = [self.write_json(os.path.join(profile_dir, f"trace_{stamp}.json"))]
+        if chrome:
+            paths.append(self.write_chrome_trace(os.path.join(profile_dir, f"trace_{stamp}.chrome.json")))
+        return paths
+
+
+class _NullProfiler:
+    """Stand-in used when no profiler is passed: steps run unmeasured."""
+
+    @contextmanager
+    def step(self, name, category="step", **extra):
+        yield StepRecord(name=name, category=category)
+
+    def add_record(self, name, category, start, wall, **extra):
+        return StepRecord(name=name, category=category)
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def profiler_from_env():
+    """
+    Profiler configured from the environment:
+      DENGUE_PROFILE=1        peak memory per step (tracemalloc) + Chrome trace
+      DENGUE_PROFILE_CPROFILE=1   cProfile dump per top-level step in output/_profile/cprofile_<run>/
+    """
+    detailed = os.environ.get("DENGUE_PROFILE") == "1"
+    cprofile_dir = None
+    if os.environ.get("DENGUE_PROFILE_CPROFILE") == "1":
+        cprofile_dir = os.path.join(PROFILE_DIR, f"cprofile_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}")
+    return Profiler(memory=detailed, cprofile_dir=cprofile_dir)
@@ -0,0 +1,131 @@
+import os
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.utils import find_snapshot_file, OUTPUT_DIR
+from modules.manifest import artifact_kind
+from modules.profiler import NULL_PROFILER
+from modules.loaders import load_big_numbers_uf, load_city_cases, load_se_summary, load_semana_epidemiologica
+
+
+# Artifact kind -> loader; preparing a stage parses its inputs into the artifact cache
+INPUT_LOADERS = {
+    "city_cases": load_city_cases,
+    "big_numbers_uf": load_big_numbers_uf,
+    "semana_epidemiologica": load_semana_epidemiologica,
+    "SE-Y": load_se_summary,
+}
+
+
+class CyclicDependencyError(ValueError):
+    """The stages' `after` dependencies form a cycle."""
+
+
+@dataclass
+class StageOutcome:
+    """What happened to one stage of a scheduled run."""
+    name: str
+    status: str = "pending"  # ok, failed or skipped
+    rows: object = None
+    error: str = None
+    prepare_error: str = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+
+def write_order(stages):
+    """
+    Stages sorted so that every stage comes after the ones in its `after`, otherwise in
+    the given order (dependencies on stages that aren't part of the run are ignored).
+
+    :raises CyclicDependencyError: If the dependencies form a cycle
+    """
+    names = {stage.name for stage in stages}
+    done, order, pending = set(), [], list(stages)
+    while pending:
+        ready = next((s for s in pending if all(d in done or d not in names for d in s.after)), None)
+        if ready is None:
+            raise CyclicDependencyError("Cyclic stage dependencies: " + ", ".join(s.name for s in pending))
+        pending.remove(ready)
+        order.append(ready)
+        done.add(ready.name)
+    return order
+
+
+def prepare_stage(stage, snapshot_date=None, output_dir=OUTPUT_DIR):
+    """
+    Parses the input artifacts of a stage into the artifact cache (modules.loaders), so the
+    stage itself only computes and writes. Runs on a worker thread.
+    """
+    for pattern in stage.inputs:
+        loader = INPUT_LOADERS.get(artifact_kind(pattern))
+        if loader:
+            loader(find_snapshot_file(pattern, snapshot_date, output_dir))
+
+
+def _prepare(stage, snapshot_date, output_dir, profiler):
+    with profiler.step(stage.name, "prepare_inputs"):
+        prepare_stage(stage, snapshot_date, output_dir)
+
+
+def run_stages(stages, open_session, run_date=None, output_dir=OUTPUT_DIR, max_workers=None,
+               profiler=NULL_PROFILER):
+    """
+    Runs the stages as a small DAG: their inputs are parsed concurrently on a thread pool
+    while `open_session()` loads the workbook on this thread, then each stage writes into
+    the workbook, one at a time, in dependency order.
+
+    A failing stage doesn't stop the others: its error is recorded, the stages that depend
+    on it are skipped and the rest still run. A failed preparation is only recorded, the
+    stage still runs and reports the problem itself (e.g. a missing artifact).
+
+    :param open_session: Callable returning the WorkbookSession to write into
+    :param run_date: Snapshot the inputs come from, like WorkbookSession(run_date=...)
+    :return: (session, {stage name: StageOutcome}) in write order
+    :raises CyclicDependencyError: If the stages' dependencies form a cycle
+    """
+    order = write_order(stages)
+    snapshot_date = run_date.strftime("%Y_%m_%d") if run_date else None
+    outcomes = {stage.name: StageOutcome(stage.name) for stage in order}
+
+    workers = max_workers or min(len(order), os.cpu_count() or 1, 4) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prepare") as executor:
+        prepared = {stage.name: executor.submit(_prepare, stage, snapshot_date, output_dir, profiler)
+                    for stage in order}
+
+        # The workbook load overlaps the input parsing; nothing can run without it
+        with profiler.step("load_workbook", "transform"):
+            session = open_session()
+
+        for stage in order:
+            outcome = outcomes[stage.name]
+            failed = [d for d in stage.after if d in outcomes and not outcomes[d].ok]
+            if failed:
+                outcome.status, outcome.error = "skipped", f"depends on {', '.join(failed)}, which did not run"
+                print(f"[SKIP] {stage.name}: {outcome.error}")
+                continue
+
+            error = prepared[stage.name].exception()
+            if error is not None:
+                outcome.prepare_error = f"{type(error).__name__}: {error}"
+                print(f"[WARN] {stage.name}: preparing the inputs failed ({outcome.prepare_error})")
+
+            start = time.perf_counter()
+            try:
+                with profiler.step(stage.name, "transform") as record:
+                    outcome.rows = record.rows = stage.run(session)
+                outcome.status = "ok"
+            except Exception as e:
+                outcome.status, outcome.error = "failed", f"{type(e).__name__}: {e}"
+                print(f"[ERROR] {stage.name} failed: {outcome.error}")
+            outcome.seconds = time.perf_counter() - start
+
+    return session, outcomes
+
+
+def failed_stages(outcomes):
+    return [name for name, outcome in outcomes.items() if not outcome.ok]
@@ -0,0 +1,191 @@
+import os
+import re
+import sys
+import queue
+import http.client
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlencode, urljoin
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import current_date, OUTPUT_DIR
+
+
+TABNET_URL = "http://tabnet.datasus.gov.br/cgi/tabcgi.exe?sinannet/cnv/denguebbr.def"
+TABNET_ENCODING = "latin1"  # Tabnet forms and responses are ISO-8859-1
+
+# Same selection cityCases.js made in the browser: rows by municipality, probable cases
+TABNET_FORM = (
+    ("Linha", "Município_de_residência"),
+    ("Coluna", "--Não-Ativa--"),
+    ("Incremento", "Casos_Prováveis"),
+    ("formato", "table"),
+    ("mostre", "Mostra"),
+)
+
+HTTP_TIMEOUT = 60      # seconds per request
+POOL_SIZE = 4          # keep-alive connections (and parallel periods) per host
+
+_CSV_LINK_RE = re.compile(r'href\s*=\s*"?([^"\s>]+\.csv)', re.IGNORECASE)
+_PERIOD_RE = re.compile(r'dengbr(\d{2})\.dbf', re.IGNORECASE)
+
+
+class TabnetError(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Small pool of keep-alive HTTP connections to one host.
+
+    Connections are reused across requests (form POST, CSV download, other periods),
+    so a whole batch costs a single TCP handshake per worker.
+    """
+
+    def __init__(self, url, size=POOL_SIZE, timeout=HTTP_TIMEOUT):
+        parts = urlsplit(url)
+        self.scheme, self.host = parts.scheme, parts.netloc
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except Exception:
+            conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        """Sends a request and returns (status, body bytes). Retries once on a dropped keep-alive."""
+        target = urlsplit(url)
+        path = target.path + (f"?{target.query}" if target.query else "")
+        headers = {"Connection": "keep-alive", **(headers or {})}
+
+        for attempt in range(2):
+            with self.connection() as conn:
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    return response.status, response.read()
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # Server closed an idle keep-alive connection: reconnect once
+                    conn.close()
+                    if attempt:
+                        raise
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def period_file(year):
+    """Tabnet data file of one year, e.g. 2025 -> 'dengbr25.dbf'."""
+    return f"dengbr{int(year) % 100:02d}.dbf"
+
+
+def available_periods(pool, url=TABNET_URL):
+    """Years offered by the Tabnet form, most recent first."""
+    status, body = pool.request("GET", url)
+    if status != 200:
+        raise TabnetError(f"Tabnet form returned HTTP {status}")
+    years = {2000 + int(yy) for yy in _PERIOD_RE.findall(body.decode(TABNET_ENCODING))}
+    return sorted(years, reverse=True)
+
+
+def fetch_period(pool, year, url=TABNET_URL):
+    """
+    Submits the Tabnet form for one year and downloads the resulting CSV.
+
+    :param pool: ConnectionPool for the Tabnet host
+    :param year: Year of the data file (dengbrYY.dbf)
+    :return: Raw CSV bytes, same content as "Copia como .CSV" in the browser
+    """
+    form = TABNET_FORM + (("Arquivos", period_file(year)),)
+    body = urlencode(form, encoding=TABNET_ENCODING)
+    status, page = pool.request("POST", url, body=body, headers={
+        "Content-Type": "application/x-www-form-urlencoded",
+    })
+    if status != 200:
+        raise TabnetError(f"Tabnet returned HTTP {status} for {year}")
+
+    match = _CSV_LINK_RE.search(page.decode(TABNET_ENCODING))
+    if not match:
+        raise TabnetError(f"No CSV link in the Tabnet response for {year}")
+
+    status, csv_bytes = pool.request("GET", urljoin(url, match.group(1)))
+    if status != 200:
+        raise TabnetError(f"Tabnet CSV download returned HTTP {status} for {year}")
+    return csv_bytes
+
+
+def city_cases_paths(date, years, output_dir=OUTPUT_DIR):
+    """
+    Output file of each year: the first one is the city_cases_<date>.csv consumed by
+    city_cases_formatter, extra years go next to it as tabnet_city_cases_<year>_<date>.csv.
+    """
+    folder = os.path.join(output_dir, f"dengue_{date}")
+    paths = {years[0]: os.path.join(folder, f"city_cases_{date}.csv")}
+    for year in years[1:]:
+        paths[year] = os.path.join(folder, f"tabnet_city_cases_{year}_{date}.csv")
+    return paths
+
+
+def fetch_city_cases(date=None, years=None, output_dir=OUTPUT_DIR, url=TABNET_URL,
+                     pool_size=POOL_SIZE, timeout=HTTP_TIMEOUT):
+    """
+    Downloads city-level probable cases from Tabnet without a browser.
+
+    :param date: Run date 'YYYY_MM_DD' (default: DENGUE_RUN_DATE or today)
+    :param years: Years to fetch, first one is the main artifact (default: year of `date`)
+    :param output_dir: Root of the output/dengue_<date>/ folders
+    :param url: Tabnet form URL
+    :return: {year: path of the saved CSV}
+    """
+    date = date or os.environ.get("DENGUE_RUN_DATE") or current_date
+    years = [int(y) for y in (years or [date[:4]])]
+    paths = city_cases_paths(date, years, output_dir)
+    os.makedirs(os.path.dirname(paths[years[0]]), exist_ok=True)
+
+    pool = ConnectionPool(url, size=pool_size, timeout=timeout)
+    try:
+        # Periods are independent requests: fetch them in parallel over the pooled connections
+        with ThreadPoolExecutor(max_workers=min(pool_size, len(years))) as executor:
+            contents = dict(zip(years, executor.map(lambda y: fetch_period(pool, y, url), years)))
+    finally:
+        pool.close()
+
+    for year, path in paths.items():
+        # Atomic write: a half-written file would be picked up as a fetched artifact
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(contents[year])
+        os.replace(tmp_path, path)
+        print(f"[SUCCESS] Tabnet {year} saved to: {path}")
+    return paths
+
+
+if __name__ == "__main__":
+    try:
+        fetch_city_cases(years=sys.argv[1:] or None)
+    except Exception as e:
+        print(f"[ERROR] Tabnet fetch failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,115 @@
+import os
+import re
+import csv
+
+import numpy as np
+import pandas as pd
+
+
+TABNET_ENCODING = "latin1"
+CHUNK_ROWS = 50_000
+
+CITY_CASES_COLUMNS = ['Cod Mun', 'Nome Mun', 'Casos Provaveis']
+
+# '110001 ALTA FLORESTA D'OESTE' -> code, name
+_MUNICIPALITY_RE = re.compile(r"(\d{6}) (.*)", re.DOTALL)
+
+
+class TabnetFormatError(ValueError):
+    """The file doesn't look like a Tabnet CSV export."""
+
+
+def _count(value):
+    # Tabnet writes '-' for zero; counts have no decimals but may carry '.' thousands separators
+    value = value.strip()
+    if value in ("", "-"):
+        return 0
+    return int(value.replace(".", ""))
+
+
+def _chunk(codes, names, cases):
+    return pd.DataFrame({
+        'Cod Mun': np.array(codes, dtype=np.int32),
+        'Nome Mun': pd.Categorical(names),
+        'Casos Provaveis': np.array(cases, dtype=np.int32),
+    })
+
+
+def iter_city_cases(path, chunk_rows=CHUNK_ROWS):
+    """
+    Streams a raw Tabnet export of cases per municipality ('Município de residência'),
+    one chunk of at most `chunk_rows` municipalities at a time.
+
+    The title/notes lines before the column header and everything from the 'Total' row on
+    (source and notes footer) are skipped; rows that aren't a municipality ('000000
+    Município ignorado', 'Ignorado/exterior'...) are dropped while parsing. With extra
+    columns (e.g. one per year), the last one ('Total') is used.
+
+    :param path: CSV as downloaded from Tabnet (latin1, ';'-separated)
+    :return: iterator of DataFrames ['Cod Mun' (int32), 'Nome Mun' (category), 'Casos Provaveis' (int32)]
+    :raises TabnetFormatError: If no column header is found
+    """
+    with open(path, "r", encoding=TABNET_ENCODING, newline="") as f:
+        reader = csv.reader(f, delimiter=";", quotechar='"')
+
+        # === [1] Skip the title/notes until the column header ('"Município de residência";"Casos_Prováveis"') ===
+        if not any(len(row) >= 2 for row in reader):
+            raise TabnetFormatError(f"No column header found in {path}")
+
+        # === [2] Municipality rows, until the footer ===
+        codes, names, cases = [], [], []
+        for row in reader:
+            if not row:
+                continue
+            if row[0].strip() == "Total":
+                break
+            match = _MUNICIPALITY_RE.fullmatch(row[0])
+            if len(row) < 2 or not match or match.group(1) == "000000":
+                continue
+            codes.append(int(match.group(1)))
+            names.append(match.group(2).strip())
+            cases.append(_count(row[-1]))
+            if len(codes) >= chunk_rows:
+                yield _chunk(codes, names, cases)
+                codes, names, cases = [], [], []
+
+        if codes:
+            yield _chunk(codes, names, cases)
+
+
+def read_city_cases(path, chunk_rows=CHUNK_ROWS):
+    """All of iter_city_cases(path) in one DataFrame (same compact dtypes)."""
+    chunks = list(iter_city_cases(path, chunk_rows))
+    if not chunks:
+        return _chunk([], [], [])
+    df = pd.concat(chunks, ignore_index=True)
+    df['Nome Mun'] = df['Nome Mun'].astype("category")
+    return df
+
+
+def write_city_cases(path, output_path, chunk_rows=CHUNK_ROWS, chunks=None):
+    """
+    Parses a raw Tabnet export and writes the clean 'Cod Mun,Nome Mun,Casos Provaveis'
+    CSV (UTF-8 with BOM) chunk by chunk. `output_path` may be `path` itself: the clean file
+    is written next to it and renamed over it at the end.
+
+    :param chunks: Optional list the parsed chunks are appended to, to keep what was
+                   written in memory without reading the file back
+    :return: Number of municipalities written
+    """
+    tmp_path = f"{output_path}.tmp"
+    rows = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8-sig", newline="") as out:
+            for chunk in iter_city_cases(path, chunk_rows):
+                chunk.to_csv(out, header=rows == 0, index=False)
+                rows += len(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+            if rows == 0:
+                out.write(",".join(CITY_CASES_COLUMNS) + "\n")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
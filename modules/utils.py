@@ -1,9 +1,11 @@
 import os
 import shutil
 import glob
+import fnmatch
 import re
 from datetime import datetime
 
+from modules.manifest import find_artifact, artifact_kind, artifact_for_date, artifact_name
 
 current_date = datetime.now().strftime("%Y_%m_%d")
 
@@ -17,12 +19,21 @@ def ensure_directories_exist(*folders):
     for folder in folders:
         os.makedirs(folder, exist_ok=True)
 
+def _extract_date(filename):
+    match = re.search(r'(\d{4}_\d{2}_\d{2})', filename)
+    if match:
+        return datetime.strptime(match.group(1), "%Y_%m_%d")
+    return datetime.min
+
 def get_latest_epidemiology_file(source_folder):
     pattern = os.path.join(source_folder, "Epidemiology_Dengue_*.xlsx")
     files = glob.glob(pattern)
     if not files:
         raise FileNotFoundError("No Epidemiology_Dengue_*.xlsx files found.")
-    latest_file = max(files, key=os.path.getmtime)
+    # Newest by the date in the name; mtime only breaks ties, so only those get stat'ed
+    newest = max(_extract_date(f) for f in files)
+    candidates = [f for f in files if _extract_date(f) == newest]
+    latest_file = max(candidates, key=os.path.getmtime)
     return latest_file
 
 def copy_latest_file_to_temp():
@@ -38,32 +49,51 @@ def find_latest_file_in_subfolders(pattern, output_dir='output'):
     """
     Finds the most recent file matching the given pattern in the specified directory and its subdirectories,
     prioritizing folders named 'dengue_*' if present.
-    
+
+    Pipeline artifacts (big_numbers_uf, semana_epidemiologica, city_cases, SE-Y) are looked up in the
+    output manifest (see modules.manifest); other patterns fall back to scanning the folders.
+
     :param pattern: The file name pattern to search for (e.g., 'SE-Y-*.yaml')
     :param output_dir: The directory to search in (default is 'output')
     :return: The path to the most recent file
     :raises FileNotFoundError: If no files are found matching the pattern
     """
+    if artifact_kind(pattern):
+        latest_file = find_artifact(pattern, output_dir)
+        if latest_file:
+            return latest_file
+
     # First, find all dengue_* folders in the output directory
     dengue_folders = glob.glob(os.path.join(output_dir, 'dengue_*'), recursive=False)
     files = []
-    
+
     # Search for files matching the pattern in dengue_* folders
     for folder in dengue_folders:
         files.extend(glob.glob(os.path.join(folder, pattern)))
-    
+
     # If no files found in dengue_* folders, search in output_dir and other subdirectories
     if not files:
         files = glob.glob(os.path.join(output_dir, '**', pattern), recursive=True)
-    
+
     if not files:
         raise FileNotFoundError(f"No files found matching {pattern} in {output_dir}")
-    
-    def extract_date(filename):
-        match = re.search(r'(\d{4}_\d{2}_\d{2})', filename)
-        if match:
-            return datetime.strptime(match.group(1), "%Y_%m_%d")
-        return datetime.min
-    
-    latest_file = max(files, key=extract_date)
-    return latest_file
\ No newline at end of file
+
+    latest_file = max(files, key=_extract_date)
+    return latest_file
+
+def find_snapshot_file(pattern, snapshot_date=None, output_dir='output'):
+    """
+    Artifact matching `pattern` for one run: the latest one (like find_latest_file_in_subfolders),
+    or, when `snapshot_date` is given, the one of output/dengue_<snapshot_date>/ only.
+
+    :param pattern: Artifact file name pattern (e.g., 'SE-Y-*.yaml')
+    :param snapshot_date: 'YYYY_MM_DD' to pin the lookup to one snapshot (backfills)
+    :raises FileNotFoundError: If there is no matching artifact
+    """
+    if snapshot_date is None:
+        return find_latest_file_in_subfolders(pattern, output_dir=output_dir)
+    kind = artifact_kind(pattern)
+    path = artifact_for_date(kind, snapshot_date, output_dir) if kind else None
+    if not path or not fnmatch.fnmatch(artifact_name(path), pattern):
+        raise FileNotFoundError(f"No files found matching {pattern} in snapshot {snapshot_date} of {output_dir}")
+    return path
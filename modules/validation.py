@@ -0,0 +1,408 @@
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+from datetime import datetime
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from openpyxl import load_workbook
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import find_snapshot_file, OUTPUT_DIR, SOURCE_DIR, TEMP_DIR
+from modules.loaders import (
+    load_big_numbers_uf,
+    load_city_cases,
+    load_se_summary,
+    load_semana_epidemiologica,
+)
+from modules.sheet_writer import row_key
+from modules.profiler import NULL_PROFILER
+from modules.export import publish_export
+from data_transformation_pipeline.informe_semana_epidemiologica import incidence_display
+
+
+MAX_FAILURES = 20  # mismatches kept per check, the rest are only counted
+
+MONTH_ROWS = {
+    'january': 2, 'february': 3, 'march': 4, 'april': 5, 'may': 6, 'june': 7,
+    'july': 8, 'august': 9, 'september': 10, 'october': 11, 'november': 12, 'december': 13,
+}
+
+
+class SheetRows:
+    """Values of one worksheet read in streaming mode, addressed like ws.cell (1-based)."""
+
+    def __init__(self, title, rows):
+        self.title = title
+        self.rows = rows
+        self.max_row = len(rows)
+        self.max_column = max((len(r) for r in rows), default=0)
+
+    def cell(self, row, column):
+        if 1 <= row <= self.max_row and 1 <= column <= len(self.rows[row - 1]):
+            return self.rows[row - 1][column - 1]
+        return None
+
+    def column(self, column, min_row=1, max_row=None):
+        return [self.cell(r, column) for r in range(min_row, (max_row or self.max_row) + 1)]
+
+
+@dataclass
+class CheckResult:
+    name: str
+    sheet: str
+    failures: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def passed(self):
+        return not self.failures
+
+
+@dataclass
+class ValidationReport:
+    workbook_path: str
+    results: dict = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def passed(self):
+        return all(r.passed for r in self.results.values())
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def print_summary(self):
+        for result in self.results.values():
+            status = "PASS" if result.passed else "FAIL"
+            print(f"[{status}] {result.name} ({result.sheet}, {result.seconds:.2f}s)")
+            for failure in result.failures:
+                print(f"    - {failure}")
+        total = len(self.results)
+        failed = sum(not r.passed for r in self.results.values())
+        print(f"[INFO] Validation: {total - failed}/{total} checks passed in {self.seconds:.2f}s")
+
+    def to_dict(self):
+        return {
+            "workbook": self.workbook_path,
+            "passed": self.passed,
+            "seconds": round(self.seconds, 3),
+            "checks": {
+                name: {"sheet": r.sheet, "passed": r.passed, "failures": r.failures,
+                       "seconds": round(r.seconds, 3)}
+                for name, r in self.results.items()
+            },
+        }
+
+
+def normalize_key(key: str) -> str:
+    return re.sub(r"\s+", " ", key.strip().lower())
+
+
+class _Failures(list):
+    """Keeps the first MAX_FAILURES messages and counts the rest."""
+
+    def __init__(self):
+        super().__init__()
+        self.dropped = 0
+
+    def add(self, message):
+        if len(self) < MAX_FAILURES:
+            self.append(message)
+        else:
+            self.dropped += 1
+
+    def close(self):
+        if self.dropped:
+            self.append(f"... and {self.dropped} more mismatch(es)")
+        return list(self)
+
+
+# --- Checks (one per sheet): (sheet rows, sources) -> list of failure messages ---
+def check_city_cases(ws, sources):
+    df = sources["city_cases"].copy()
+    excel_df = pd.DataFrame(
+        [row[:3] for row in ws.rows[1:]],
+        columns=['Cod Mun', 'Nome Mun', 'Casos Provaveis'],
+    ).dropna()
+
+    if len(excel_df) != len(df):
+        return [f"{len(excel_df)} rows in the sheet, {len(df)} in the CSV"]
+
+    for frame in (excel_df, df):
+        # Normaliza os tipos: casos como int, código e nome como texto
+        frame['Casos Provaveis'] = pd.to_numeric(frame['Casos Provaveis'], errors='coerce').fillna(0).astype(int)
+        frame['Cod Mun'] = frame['Cod Mun'].astype(str)
+        frame['Nome Mun'] = frame['Nome Mun'].astype(str)
+
+    excel_df = excel_df.reset_index(drop=True)
+    df = df.reset_index(drop=True)
+
+    failures = _Failures()
+    for column in df.columns:
+        for i in (excel_df[column] != df[column]).to_numpy().nonzero()[0]:
+            failures.add(f"Row {i + 2} '{column}': sheet {excel_df[column][i]} vs CSV {df[column][i]}")
+    return failures.close()
+
+
+def check_big_numbers_uf(ws, sources):
+    uf_data = sources["big_numbers_uf"].copy()
+    uf_data.index = uf_data.index.map(normalize_key)
+    col_map = {'casos_provaveis': 7, 'incidencia': 11, 'obitos_investigacao': 16, 'obitos': 17}  # G, K, P, Q
+
+    failures = _Failures()
+    for row_idx in range(2, ws.max_row + 1):
+        estado = normalize_key(ws.cell(row_idx, 2) or '')
+        if estado not in uf_data.index:
+            continue
+        for key, col in col_map.items():
+            if key not in uf_data or pd.isna(uf_data.at[estado, key]):
+                continue
+            expected = uf_data.at[estado, key]
+            actual = ws.cell(row_idx, col)
+            if actual != expected:
+                failures.add(f"Mismatch {estado} {key}: {expected} vs {actual}")
+    return failures.close()
+
+
+def check_se_completa(ws, sources):
+    df_yaml = sources["semana_epidemiologica"]
+
+    header_row = next((r for r in range(1, min(10, ws.max_row) + 1)
+                       if "Ano/Semana" in ws.rows[r - 1]), None)
+    if header_row is None:
+        return ["Column 'Ano/Semana' not found in the first 10 rows"]
+    header = ws.rows[header_row - 1]
+    col_map = {value: col for col, value in enumerate(header, start=1) if value in df_yaml.columns}
+    if "UF" not in col_map:
+        return ["Column 'UF' not found in the header"]
+
+    # Keyed by (UF, Ano/Semana): row order in the sheet doesn't matter
+    key_cols = (col_map["UF"], col_map["Ano/Semana"])
+    rows = {}
+    for r in range(header_row + 1, ws.max_row + 1):
+        rows.setdefault(row_key(ws.cell(r, c) for c in key_cols), r)
+
+    failures = _Failures()
+    expected = {name: df_yaml[name].astype(object).where(df_yaml[name].notna(), None).tolist()
+                for name in col_map}
+    for i, key in enumerate(zip(expected["UF"], expected["Ano/Semana"])):
+        row = rows.get(row_key(key))
+        if row is None:
+            failures.add(f"{key[0]} {key[1]} missing from the sheet")
+            continue
+        for col_name, col in col_map.items():
+            if ws.cell(row, col) != expected[col_name][i]:
+                failures.add(f"Row {row} '{col_name}' ({key[0]} {key[1]}): "
+                             f"expected {expected[col_name][i]!r}, found {ws.cell(row, col)!r}")
+    return failures.close()
+
+
+def check_informe_semana_epidemiologica(ws, sources):
+    summary = sources["se_summary"]
+    rows_with_se = [r for r in range(2, ws.max_row + 1) if str(ws.cell(r, 1)).startswith("SE ")]
+    if not rows_with_se:
+        return ["Nenhuma linha com 'SE ' encontrada na planilha."]
+
+    row = rows_with_se[-1]  # pega a última linha
+    expected = {
+        1: f"SE {summary['se']}",
+        3: incidence_display(summary['incidencia']),
+        4: summary['casos_provaveis'],
+        7: summary['obitos_investigacao'],
+        8: summary['obitos'],
+    }
+    return [
+        f"Row {row}, column {col}: expected {value!r}, found {ws.cell(row, col)!r}"
+        for col, value in expected.items() if ws.cell(row, col) != value
+    ]
+
+
+def check_dengue_cases_year(ws, sources):
+    total = int(sources["big_numbers_uf"]['casos_provaveis'].sum())
+    now = sources.get("run_date") or datetime.now()
+    row = MONTH_ROWS[now.strftime("%B").lower()]
+    col = next((c for c in range(2, ws.max_column + 1) if str(ws.cell(1, c)) == str(now.year)), None)
+    if col is None:
+        return [f"Year column {now.year} not found in the header"]
+    actual = ws.cell(row, col)
+    return [] if actual == total else [f"{now.strftime('%B')} {now.year}: expected {total}, found {actual}"]
+
+
+# name -> (sheet, check, sources it needs)
+CHECKS = {
+    "update_city_cases": ("City Cases", check_city_cases, ("city_cases",)),
+    "big_numbers_uf": ("Big Numbers UF", check_big_numbers_uf, ("big_numbers_uf",)),
+    "se_completa": ("SE Completa", check_se_completa, ("semana_epidemiologica",)),
+    "informe_semana_epidemiologica": ("Informe Semana Epidemiologica", check_informe_semana_epidemiologica,
+                                      ("se_summary",)),
+    "dengue_cases_year": ("Dengue Cases Year", check_dengue_cases_year, ("big_numbers_uf",)),
+}
+
+
+# --- Engine ---
+def load_sources(output_dir=OUTPUT_DIR, run_date=None):
+    """
+    Parses every source artifact once (memoized by modules.loaders, so a run that just
+    transformed them pays nothing here). Missing artifacts map to the exception raised.
+
+    :param run_date: Date of the run being validated (default: now). When given, the sources
+                     are the artifacts of that day's snapshot, like WorkbookSession(run_date=...)
+    """
+    snapshot = run_date.strftime("%Y_%m_%d") if run_date else None
+    timestamp = (run_date or datetime.now()).strftime("%Y_%m_%d")
+
+    def find(pattern):
+        return find_snapshot_file(pattern, snapshot, output_dir)
+
+    loaders = {
+        "city_cases": lambda: load_city_cases(find(f"city_cases_{timestamp}.csv")),
+        "big_numbers_uf": lambda: load_big_numbers_uf(find('big_numbers_uf_*.yaml')),
+        "semana_epidemiologica": lambda: load_semana_epidemiologica(find('semana_epidemiologica_*.yaml')),
+        "se_summary": lambda: load_se_summary(find('SE-Y-*.yaml')),
+    }
+    sources = {"run_date": run_date}
+    for name, load in loaders.items():
+        try:
+            sources[name] = load()
+        except Exception as e:
+            sources[name] = e
+    return sources
+
+
+def read_sheets(workbook_path, sheet_names):
+    """
+    Opens the workbook once in read-only (streaming) mode and reads the values of the
+    requested sheets only. Missing sheets are left out of the result.
+    """
+    wb = load_workbook(workbook_path, read_only=True)
+    try:
+        return {
+            name: SheetRows(name, list(wb[name].iter_rows(values_only=True)))
+            for name in sheet_names if name in wb.sheetnames
+        }
+    finally:
+        wb.close()
+
+
+def _run_check(name, sheets, sources, profiler=NULL_PROFILER):
+    with profiler.step(name, "validation") as record:
+        result = _check(name, sheets, sources)
+        record.rows = sheets[result.sheet].max_row if result.sheet in sheets else 0
+        record["passed"] = result.passed
+    return result
+
+
+def _check(name, sheets, sources):
+    start = time.perf_counter()
+    sheet, check, needs = CHECKS[name]
+    result = CheckResult(name, sheet)
+
+    missing = [s for s in needs if isinstance(sources.get(s), Exception)]
+    if sheet not in sheets:
+        result.failures.append(f"Sheet '{sheet}' not found in workbook")
+    elif missing:
+        result.failures.extend(f"Source '{s}' unavailable: {sources[s]}" for s in missing)
+    else:
+        try:
+            result.failures.extend(check(sheets[sheet], sources))
+        except Exception as e:
+            result.failures.append(f"{type(e).__name__}: {e}")
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def validate_workbook(workbook_path, checks=None, sources=None, max_workers=None, profiler=NULL_PROFILER,
+                      run_date=None, output_dir=OUTPUT_DIR):
+    """
+    Validates a transformed workbook against its source artifacts.
+
+    :param workbook_path: Epidemiology_Dengue_*.xlsx to validate (never modified)
+    :param checks: Check names (default: all of CHECKS)
+    :param sources: Pre-parsed sources (default: `load_sources()`)
+    :param max_workers: Threads running the per-sheet checks
+    :param profiler: Optional modules.profiler.Profiler (one step per check)
+    :param run_date: Date the workbook was built for (default: now), see load_sources
+    :param output_dir: Where the source artifacts are (when `sources` isn't given)
+    :return: ValidationReport
+    """
+    start = time.perf_counter()
+    checks = list(checks or CHECKS)
+    if sources is None:
+        with profiler.step("load_sources", "validation"):
+            sources = load_sources(output_dir, run_date=run_date)
+    with profiler.step("read_sheets", "validation") as record:
+        sheets = read_sheets(workbook_path, {CHECKS[name][0] for name in checks})
+        record.rows = sum(s.max_row for s in sheets.values())
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(checks)) as executor:
+        results = executor.map(lambda name: _run_check(name, sheets, sources, profiler), checks)
+        report = ValidationReport(workbook_path, {r.name: r for r in results})
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def latest_temp_workbook(temp_dir=TEMP_DIR):
+    files = sorted(glob.glob(os.path.join(temp_dir, "Epidemiology_Dengue_*.xlsx")),
+                   key=os.path.getmtime, reverse=True)
+    return files[0] if files else None
+
+
+def publish_workbook(workbook_path, results_dir=SOURCE_DIR, temp_dir=TEMP_DIR):
+    """Moves a validated workbook (and its export, see modules.export) to _results/ and empties TEMP. Returns the final path."""
+    os.makedirs(results_dir, exist_ok=True)
+    final_path = os.path.join(results_dir, os.path.basename(workbook_path))
+    shutil.move(workbook_path, final_path)
+    for path in publish_export(temp_dir, results_dir):
+        print(f"[SUCCESS] Export published to {path}")
+
+    for filename in os.listdir(temp_dir):
+        file_path = os.path.join(temp_dir, filename)
+        if os.path.isfile(file_path) or os.path.islink(file_path):
+            os.unlink(file_path)
+        elif os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+    print(f"[SUCCESS] Workbook published to {final_path}")
+    return final_path
+
+
+def publish_run(workbook_path, stages, date, output_dir=OUTPUT_DIR, run_date=None, profiler=NULL_PROFILER):
+    """
+    Publishes a validated workbook: moves it to _results/ (publish_workbook), records the
+    stages' fingerprints next to it (modules.incremental) and, once the tree uses the object
+    store, moves the snapshot of `date` into it. Shared by main.py and modules.watch.
+
+    :param run_date: Date the workbook was built for (None: the latest artifacts)
+    :return: Path of the published workbook
+    """
+    from modules.incremental import record_run
+    from modules import object_store
+
+    with profiler.step("publish", "publish"):
+        final_path = publish_workbook(workbook_path)
+        record_run(stages, final_path, output_dir, run_date)
+    # Deduplicated storage: the snapshot's artifacts move to output/_objects/, references stay
+    if object_store.enabled(output_dir):
+        with profiler.step("store_snapshot", "publish") as record:
+            record.rows = object_store.store_snapshot(os.path.join(output_dir, f"dengue_{date}"),
+                                                      output_dir=output_dir)
+    return final_path
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else latest_temp_workbook()
+    if not path:
+        print(f"[ERROR] No Excel file found in {TEMP_DIR}")
+        sys.exit(1)
+    report = validate_workbook(path)
+    report.print_summary()
+    sys.exit(0 if report.passed else 1)
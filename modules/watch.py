@@ -0,0 +1,275 @@
+import os
+import sys
+import shutil
+import time
+import fnmatch
+import itertools
+import argparse
+import threading
+import traceback
+from datetime import datetime
+
+try:
+    # inotify (Linux), FSEvents (macOS), ReadDirectoryChangesW (Windows); polling without it
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.utils import OUTPUT_DIR, SOURCE_DIR, TEMP_DIR, ensure_directories_exist, get_latest_epidemiology_file
+from modules.manifest import register_folder
+from modules.object_store import REF_SUFFIX, is_ref
+
+
+DEBOUNCE = 0.5   # seconds without new changes before a burst is handled as one update
+INTERVAL = 0.25  # seconds between scans when polling (or between wake-up checks with watchdog)
+
+
+def artifact_name(path):
+    name = os.path.basename(path)
+    return name[:-len(REF_SUFFIX)] if is_ref(name) else name
+
+
+def affected_stages(paths, stages):
+    """Stages reading at least one of the changed artifacts, in pipeline order."""
+    names = {artifact_name(p) for p in paths}
+    return [s for s in stages if any(fnmatch.fnmatch(n, pattern) for n in names for pattern in s.inputs)]
+
+
+# --- Change detection ---
+class _Wakeup(FileSystemEventHandler):
+    def __init__(self, event):
+        self.event = event
+
+    def on_any_event(self, event):
+        self.event.set()
+
+
+class SnapshotWatcher:
+    """
+    Detects new or rewritten files in output/dengue_*/ by comparing (mtime, size) with what
+    was last seen. With watchdog installed, filesystem events wake it up; without it, the
+    folders are scanned every `interval` seconds.
+
+    :param use_watchdog: Set to False to force polling (network shares, containers...)
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, interval=INTERVAL, use_watchdog=True):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.seen = self.scan()
+        self._event = threading.Event()
+        self._observer = None
+        if use_watchdog and Observer is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            self._observer = Observer()
+            self._observer.schedule(_Wakeup(self._event), output_dir, recursive=True)
+            self._observer.start()
+
+    @property
+    def backend(self):
+        return "watchdog" if self._observer else "polling"
+
+    def scan(self):
+        """{path: (mtime_ns, size)} of every file in the output/dengue_* folders."""
+        files = {}
+        with os.scandir(self.output_dir) as folders:
+            for folder in folders:
+                if not (folder.is_dir() and folder.name.startswith("dengue_")):
+                    continue
+                with os.scandir(folder.path) as entries:
+                    for entry in entries:
+                        if entry.is_file() and not entry.name.endswith(".tmp"):
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def changes(self):
+        current = self.scan()
+        return {path for path, state in current.items() if self.seen.get(path) != state}
+
+    def mark_seen(self):
+        """Accepts the current state, e.g. after an update that rewrote artifacts itself."""
+        self.seen = self.scan()
+
+    def _sleep(self, seconds):
+        if self._observer:
+            self._event.wait(seconds)
+            self._event.clear()
+        else:
+            time.sleep(seconds)
+
+    def wait(self, debounce=DEBOUNCE):
+        """
+        Blocks until something changed, then until nothing changed for `debounce` seconds,
+        so a burst of fetcher writes comes back as one batch.
+
+        :return: Set of changed paths
+        """
+        changed = set()
+        while not changed:
+            self._sleep(1.0 if self._observer else self.interval)
+            changed = self.changes()
+        state, quiet_since = self.scan(), time.monotonic()
+        while time.monotonic() - quiet_since < debounce:
+            self._sleep(min(self.interval, debounce))
+            current = self.scan()
+            if current != state:
+                state, quiet_since = current, time.monotonic()
+        return {path for path, s in state.items() if self.seen.get(path) != s}
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+
+
+# --- Warm pipeline ---
+class WarmPipeline:
+    """
+    The transform/validate/publish part of main.py for one batch of changed artifacts,
+    kept warm between batches: modules imported once, parsed artifacts in the loaders'
+    cache and the published workbook kept open in one WorkbookSession.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR):
+        # Imported here so `import modules.watch` stays light; each one is paid once per process
+        from modules.cityCasesFormatter import city_cases_formatter
+        from modules.workbook_session import WorkbookSession
+        from modules.incremental import plan_stages
+        from modules.history_store import ingest_snapshot
+        from modules.deltas import compute_delta
+        from modules.validation import validate_workbook, publish_run
+        from modules.scheduler import run_stages, failed_stages
+        from modules.export import export_tables
+        from data_transformation_pipeline.stages import STAGES
+
+        self.output_dir = output_dir
+        self.city_cases_formatter = city_cases_formatter
+        self.WorkbookSession = WorkbookSession
+        self.plan_stages = plan_stages
+        self.ingest_snapshot, self.compute_delta = ingest_snapshot, compute_delta
+        self.validate_workbook, self.publish_run = validate_workbook, publish_run
+        self.run_stages, self.failed_stages = run_stages, failed_stages
+        self.export_tables = export_tables
+        self.stages = STAGES
+        for stage in STAGES:
+            stage.load()
+        self.session = None
+        self.published = None  # (path, mtime_ns) the warm session holds
+
+    def _session(self, source_workbook):
+        """
+        The warm session if it holds `source_workbook` as published, else a fresh load.
+        Like main.py, the session works on a copy in TEMP_DIR, never on the published file.
+        """
+        state = (source_workbook, os.stat(source_workbook).st_mtime_ns)
+        working_copy = os.path.join(TEMP_DIR, os.path.basename(source_workbook))
+        shutil.copy2(source_workbook, working_copy)
+        if self.session is not None and self.published == state:
+            return self.session.rebase(working_copy)
+        print(f"[INFO] Loading {working_copy}...")
+        self.session = self.WorkbookSession(working_copy, patch=True, output_dir=self.output_dir)
+        return self.session
+
+    def update(self, paths=None):
+        """
+        Runs the stages reading the changed artifacts (all of them when `paths` is None),
+        validates their sheets and publishes the workbook.
+
+        :return: True if a new workbook was published
+        """
+        date = datetime.now().strftime("%Y_%m_%d")
+        for folder in sorted({os.path.dirname(p) for p in paths or ()}):
+            register_folder(folder, self.output_dir)
+        if paths is None or any(fnmatch.fnmatch(artifact_name(p), "city_cases_*.csv") for p in paths):
+            self.city_cases_formatter(output_root=self.output_dir)
+
+        # === [1] Stages depending on the changes, minus those whose inputs are unchanged ===
+        ensure_directories_exist(SOURCE_DIR, TEMP_DIR)
+        candidates = self.stages if paths is None else affected_stages(paths, self.stages)
+        source_workbook = get_latest_epidemiology_file(SOURCE_DIR)
+        to_run, skipped = self.plan_stages(candidates, source_workbook, self.output_dir)
+        for stage in skipped:
+            print(f"[SKIP] {stage.name}: inputs and '{stage.sheet}' unchanged")
+        if not to_run:
+            print("[INFO] Nothing to update.")
+            return False
+
+        # === [2] Transform in the warm session, save, validate only the sheets written ===
+        try:
+            session, outcomes = self.run_stages(to_run, lambda: self._session(source_workbook),
+                                                output_dir=self.output_dir)
+            failed = self.failed_stages(outcomes)
+            if failed:
+                raise RuntimeError(f"stage(s) failed: {', '.join(failed)}")
+            session.save()
+            if session.tables:
+                self.export_tables(session.tables, session.run_date)
+            report = self.validate_workbook(session.output_path, checks=[s.name for s in to_run])
+        except Exception:
+            self.session = None  # the in-memory workbook may be half-updated
+            raise
+        report.print_summary()
+        if not report.passed:
+            self.session = None
+            print("[ERROR] Some checks failed. The workbook stays in TEMP, waiting for the next change.")
+            return False
+
+        # === [3] Publish like main.py; the session now holds exactly the published workbook ===
+        final_path = self.publish_run(session.output_path, self.stages, date, self.output_dir)
+        self.published = (final_path, os.stat(final_path).st_mtime_ns)
+
+        # History and deltas after publishing, off the critical path
+        for step in (self.ingest_snapshot, self.compute_delta):
+            try:
+                step(date, output_dir=self.output_dir)
+            except Exception as e:
+                print(f"[WARN] {step.__name__} failed for snapshot {date}: {e}")
+        return True
+
+
+def watch(output_dir=OUTPUT_DIR, debounce=DEBOUNCE, interval=INTERVAL, use_watchdog=True):
+    """
+    Long-running mode: one catch-up update, then one update per debounced batch of new
+    or rewritten artifacts in output/dengue_*/, until interrupted (Ctrl+C).
+    """
+    print(f"[START] Watch mode started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    pipeline = WarmPipeline(output_dir)
+    watcher = SnapshotWatcher(output_dir, interval, use_watchdog)
+    try:
+        # None first: the catch-up update of everything that changed while nobody was watching
+        for paths in itertools.chain([None], iter(lambda: watcher.wait(debounce), None)):
+            if paths:
+                print(f"[INFO] {len(paths)} artifact(s) changed: "
+                      + ", ".join(sorted(artifact_name(p) for p in paths)))
+            start = time.perf_counter()
+            try:
+                if pipeline.update(paths):
+                    print(f"[SUCCESS] Workbook updated in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                traceback.print_exc()
+                print(f"[ERROR] Update failed: {e}. Waiting for the next change.")
+            # Our own rewrites (formatter, stored artifacts) aren't changes to react to
+            watcher.mark_seen()
+            print(f"[INFO] Watching {output_dir} ({watcher.backend}, debounce {debounce}s)...")
+    except KeyboardInterrupt:
+        print("[END] Watch mode stopped.")
+    finally:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    # python -m modules.watch [--debounce 0.5] [--poll]   (same as: python main.py watch)
+    parser = argparse.ArgumentParser(description="Updates the workbook whenever a fetcher writes an artifact.")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE,
+                        help=f"Seconds of quiet before a burst of changes is handled (default: {DEBOUNCE})")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help=f"Polling interval (default: {INTERVAL})")
+    parser.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed")
+    args = parser.parse_args()
+    watch(debounce=args.debounce, interval=args.interval, use_watchdog=not args.poll)
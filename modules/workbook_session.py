@@ -0,0 +1,140 @@
+import os
+from datetime import datetime
+from openpyxl import load_workbook
+
+from modules.utils import get_latest_epidemiology_file, find_snapshot_file, TEMP_DIR, OUTPUT_DIR
+from modules.xlsx_patch import save_patched, PatchNotPossible
+from modules.sheet_writer import RowIndex
+
+
+def _in_temp(path):
+    temp_dir = os.path.abspath(TEMP_DIR)
+    return os.path.commonpath([os.path.abspath(path), temp_dir]) == temp_dir
+
+
+class WorkbookSession:
+    """
+    Keeps a single Epidemiology_Dengue_*.xlsx workbook open for a whole run.
+
+    The workbook is loaded once from TEMP_DIR, every transform writes into the same
+    in-memory `Workbook` and it is saved once, to the dated file in TEMP_DIR.
+
+    :param source_path: Workbook to load (default: latest file in TEMP_DIR)
+    :param output_path: Where to save (default: TEMP_DIR/Epidemiology_Dengue_<today>.xlsx)
+    :param patch: Save by rewriting only the modified sheet parts of the source file
+                  (see modules.xlsx_patch) instead of a full openpyxl save
+    :param run_date: Date the run stands for (default: now). When given, the transforms read
+                     the artifacts of that day's snapshot instead of the latest ones (backfills)
+    :param output_dir: Where the output/dengue_* snapshots are
+    """
+
+    def __init__(self, source_path=None, output_path=None, patch=False, run_date=None, output_dir=OUTPUT_DIR):
+        self.run_date = run_date or datetime.now()
+        self.snapshot_date = run_date.strftime("%Y_%m_%d") if run_date else None
+        self.output_dir = output_dir
+        self.source_path = source_path or get_latest_epidemiology_file(TEMP_DIR)
+        if output_path is None:
+            today_str = self.run_date.strftime("%Y_%m_%d")
+            output_path = os.path.join(TEMP_DIR, f"Epidemiology_Dengue_{today_str}.xlsx")
+        self.output_path = output_path
+        self.patch = patch
+        self.wb = load_workbook(self.source_path)
+        self.touched = set()
+        self.indexes = {}
+        self.tables = {}
+
+    def sheet(self, name):
+        """Returns the worksheet `name` and marks it as modified. Raises KeyError if missing."""
+        ws = self.wb[name]
+        self.touched.add(name)
+        return ws
+
+    def artifact(self, pattern):
+        """
+        Input artifact of this run: the latest one matching `pattern`, or the one of the
+        `run_date` snapshot when the session was opened for a given date.
+
+        :raises FileNotFoundError: If there is no matching artifact
+        """
+        return find_snapshot_file(pattern, self.snapshot_date, self.output_dir)
+
+    @property
+    def date_str(self):
+        """Run date as in the artifact names, e.g. '2025_06_29'."""
+        return self.run_date.strftime("%Y_%m_%d")
+
+    def add_table(self, name, frame):
+        """
+        Keeps what a stage wrote into the workbook (a DataFrame, a list of rows or one row
+        as a dict) for the columnar export (modules.export).
+        """
+        self.tables[name] = frame
+        return frame
+
+    def row_index(self, name, key_columns, first_row):
+        """
+        RowIndex of a sheet's key columns, built once per session and kept up to date by
+        `upsert_rows`, so later stages reuse it instead of scanning the sheet again.
+        """
+        cache_key = (name, tuple(key_columns), first_row)
+        if cache_key not in self.indexes:
+            self.indexes[cache_key] = RowIndex(self.sheet(name), key_columns, first_row)
+        return self.indexes[cache_key]
+
+    def save(self):
+        """
+        Saves the workbook once and drops the stale source copy left in TEMP_DIR. A source
+        anywhere else (e.g. the published workbook in SOURCE_DIR) is never deleted.
+        """
+        if self.patch:
+            try:
+                save_patched(self.wb, self.source_path, self.output_path, sorted(self.touched))
+            except PatchNotPossible as e:
+                print(f"[INFO] Patch save not possible ({e}), doing a full save.")
+                self.wb.save(self.output_path)
+        else:
+            self.wb.save(self.output_path)
+        if os.path.abspath(self.source_path) != os.path.abspath(self.output_path) \
+                and _in_temp(self.source_path) and os.path.exists(self.source_path):
+            os.remove(self.source_path)
+        print(f"✅ Workbook saved to {self.output_path} (sheets: {', '.join(sorted(self.touched))})")
+        return self.output_path
+
+    def rebase(self, source_path, output_path=None):
+        """
+        Continues from the workbook saved at `source_path` (e.g. once published) without
+        loading it again: the in-memory workbook already holds that content. Used by the
+        watch mode to keep one session warm across updates; the run date moves to now.
+        """
+        if self.snapshot_date is None:
+            self.run_date = datetime.now()
+        if output_path is None:
+            output_path = os.path.join(TEMP_DIR, f"Epidemiology_Dengue_{self.date_str}.xlsx")
+        self.source_path = source_path
+        self.output_path = output_path
+        self.touched = set()
+        self.tables = {}
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self.touched:
+            self.save()
+        return False
+
+
+def run_in_session(stage):
+    """
+    Runs a single transform standalone: opens its own session, runs `stage(session)`
+    and saves. Used by the transforms when they are called without a session.
+    """
+    try:
+        session = WorkbookSession()
+    except FileNotFoundError:
+        print(f"[ERROR] Excel file not found in: {TEMP_DIR}")
+        return None
+
+    with session:
+        return stage(session)
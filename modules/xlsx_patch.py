@@ -0,0 +1,131 @@
+import os
+import struct
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from copy import copy
+from io import BytesIO
+
+from openpyxl.styles.stylesheet import write_stylesheet
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.xml.functions import tostring
+
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+STYLES_PART = "xl/styles.xml"
+
+# Sheets the transformation pipeline writes to
+PIPELINE_SHEETS = (
+    "City Cases",
+    "Big Numbers UF",
+    "SE Completa",
+    "Informe Semana Epidemiologica",
+    "Dengue Cases Year",
+)
+
+
+class PatchNotPossible(Exception):
+    """Raised when the workbook can't be patched in place and needs a full openpyxl save."""
+
+
+def sheet_parts(zin):
+    """
+    Maps sheet name -> worksheet part name (e.g. 'xl/worksheets/sheet1.xml') in order,
+    reading xl/workbook.xml and its relationships.
+    """
+    workbook = ET.fromstring(zin.read("xl/workbook.xml"))
+    rels = ET.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+
+    targets = {}
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = target
+
+    parts = {}
+    for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet"):
+        parts[sheet.get("name")] = targets[sheet.get(f"{{{NS_REL}}}id")]
+    return parts
+
+
+def _render_sheet(ws):
+    """Serializes one worksheet exactly as openpyxl's own writer would."""
+    if ws._charts or ws._images or ws._tables or ws._pivots or ws.legacy_drawing is not None:
+        raise PatchNotPossible(f"sheet '{ws.title}' has drawings, tables or pivots")
+
+    writer = WorksheetWriter(ws, out=BytesIO())
+    writer.write()
+    if len(writer._rels) or ws._comments:
+        raise PatchNotPossible(f"sheet '{ws.title}' needs its own relationships")
+    return writer.read()
+
+
+def _copy_raw(zin, zout, info):
+    """Copies one zip member to `zout` without decompressing it."""
+    src = zin.fp
+    src.seek(info.header_offset)
+    header = src.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    src.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+    data = src.read(info.compress_size)
+
+    new_info = copy(info)
+    new_info.flag_bits &= ~0x08  # sizes and CRC go in the local header, no data descriptor
+    new_info.header_offset = zout.fp.tell()
+    zout.fp.write(new_info.FileHeader())
+    zout.fp.write(data)
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def save_patched(wb, source_path, output_path, sheet_names=PIPELINE_SHEETS):
+    """
+    Saves `wb` by rewriting only the worksheet parts of `sheet_names` in `source_path`.
+
+    Every other part (other sheets, pivot caches, charts, theme, docProps...) is copied
+    byte-for-byte without being decompressed. xl/styles.xml is copied too, unless the
+    transforms added styles, in which case it is regenerated like openpyxl would.
+
+    :param wb: Workbook loaded from `source_path` and modified in memory
+    :param source_path: The original .xlsx
+    :param output_path: Where to write (may be the same as `source_path`)
+    :param sheet_names: Sheets that were modified
+    :raises PatchNotPossible: If the workbook layout doesn't allow an in-place patch
+    """
+    with zipfile.ZipFile(source_path) as zin:
+        parts = sheet_parts(zin)
+        if list(parts) != wb.sheetnames or wb.chartsheets:
+            raise PatchNotPossible("sheet list changed since the workbook was loaded")
+
+        regenerated = {}
+        for name in sheet_names:
+            regenerated[parts[name]] = _render_sheet(wb[name])
+
+        styles = tostring(write_stylesheet(wb))
+        if styles != zin.read(STYLES_PART):
+            regenerated[STYLES_PART] = styles
+
+        tmp_path = output_path + ".tmp"
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename in regenerated:
+                        new_info = zipfile.ZipInfo(info.filename, info.date_time)
+                        new_info.compress_type = zipfile.ZIP_DEFLATED
+                        zout.writestr(new_info, regenerated[info.filename])
+                    else:
+                        _copy_raw(zin, zout, info)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    os.replace(tmp_path, output_path)
+    return sorted(regenerated)
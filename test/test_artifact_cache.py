@@ -0,0 +1,70 @@
+import pytest, os, sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.artifact_cache import ArtifactCache, sizeof
+
+
+VALUE = "x" * 1000
+SIZE = sizeof(VALUE)
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name in ("a", "b", "c", "d"):
+        path = tmp_path / f"{name}.yaml"
+        path.write_text(name, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def loader(calls):
+    def load(path):
+        calls.append(os.path.basename(path))
+        return VALUE + path
+    return load
+
+
+# --- Tests ---
+def test_lru_eviction_under_the_byte_cap(files):
+    a, b, c, d = files
+    cache, calls = ArtifactCache(max_bytes=3 * SIZE + 3 * len(a)), []
+    load = loader(calls)
+    for path in (a, b, c):
+        cache.get_or_load("load", path, load)
+    assert len(cache) == 3 and cache.bytes <= cache.max_bytes
+
+    cache.get_or_load("load", a, load)   # hit: 'a' becomes the most recently used
+    cache.get_or_load("load", d, load)   # over the cap: 'b', the least recently used, goes
+    assert cache.stats()["evictions"] == 1
+    assert cache.bytes <= cache.max_bytes
+
+    calls.clear()
+    for path in (a, c, d):
+        cache.get_or_load("load", path, load)
+    assert calls == []
+    cache.get_or_load("load", b, load)
+    assert calls == ["b.yaml"]
+
+
+def test_values_bigger_than_the_cap_are_never_cached(files):
+    cache, calls = ArtifactCache(max_bytes=SIZE // 2), []
+    for _ in range(2):
+        cache.get_or_load("load", files[0], loader(calls))
+    assert calls == ["a.yaml", "a.yaml"]
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_rewritten_file_is_never_served_stale(files):
+    cache, calls = ArtifactCache(), []
+    path = files[0]
+    cache.get_or_load("load", path, loader(calls))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("rewritten, with another size")
+    cache.get_or_load("load", path, loader(calls))
+    assert calls == ["a.yaml", "a.yaml"]
+    # The previous version was dropped, not kept until evicted
+    assert len(cache) == 1
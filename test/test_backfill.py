@@ -0,0 +1,34 @@
+import pytest, os, sys, shutil
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.backfill import backfill
+from modules.loaders import clear_cache
+
+
+RUN_DATE = "2025_06_29"
+WORKBOOK = f"Epidemiology_Dengue_{RUN_DATE}.xlsx"
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # The snapshot lives in archive/, not in the default output/ (which doesn't exist here)
+    shutil.copytree(os.path.join(BASE_DIR, "output", f"dengue_{RUN_DATE}"), tmp_path / "archive" / f"dengue_{RUN_DATE}")
+    (tmp_path / "_results").mkdir()
+    shutil.copy2(os.path.join(BASE_DIR, "_results", WORKBOOK), tmp_path / "_results" / WORKBOOK)
+    monkeypatch.chdir(tmp_path)
+    clear_cache()
+    yield tmp_path
+    clear_cache()
+
+
+# --- Tests ---
+def test_backfill_builds_and_validates_from_its_output_dir(workspace):
+    results = backfill(workers=1, backfill_dir=str(workspace / "backfill"), output_dir=str(workspace / "archive"),
+                       results_dir=str(workspace / "_results"))
+
+    assert [(r["date"], r["status"]) for r in results] == [(RUN_DATE, "ok")], results[0]["failures"]
+    assert os.path.exists(workspace / "backfill" / WORKBOOK)
+    assert not os.path.exists(workspace / "output")
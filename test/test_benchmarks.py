@@ -0,0 +1,54 @@
+import pytest, os, sys, json
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from benchmarks import run
+from benchmarks.run import compare, main, summarize
+from modules.profiler import Profiler
+
+
+def results(**steps):
+    return {"scales": {"real": {"steps": {step: {"wall_median": wall} for step, wall in steps.items()}}}}
+
+
+# --- Tests ---
+def test_summarize_takes_medians_per_step():
+    runs = []
+    for wall in (0.3, 0.1, 0.2):
+        profiler = Profiler()
+        profiler.add_record("se_completa", "transform", 0.0, wall, rows=2079)
+        runs.append(profiler)
+
+    summary = summarize(runs)
+    assert list(summary) == ["transform/se_completa"]
+    step = summary["transform/se_completa"]
+    assert (step["wall_median"], step["wall_min"], step["wall_max"], step["rows"]) == (0.2, 0.1, 0.3, 2079)
+
+
+def test_compare_needs_both_ratio_and_delta():
+    baseline = results(slower=1.0, noise=0.01, within=1.0, faster=1.0)
+    current = results(slower=1.3, noise=0.03, within=1.2, faster=0.5, new=9.0)
+
+    regressions = compare(current, baseline)
+    # 'noise' tripled but only by 20 ms; 'within' is slower by less than the ratio; 'new' has no baseline
+    assert regressions == [("real", "slower", 1.0, 1.3)]
+    steps = current["scales"]["real"]["steps"]
+    assert steps["faster"]["ratio"] == 0.5 and "ratio" not in steps["new"]
+    assert compare(current, {"scales": {}}) == []
+
+
+def test_main_writes_results_and_flags_regressions(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(run, "RESULTS_DIR", str(tmp_path / "results"))
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(results(**{"transform/load_workbook": 1e-6, "validation/validate": 1e3})))
+
+    assert main(["--scales", "real", "--repeat", "1", "--baseline", str(baseline), "--fail-on-regression"]) == 1
+
+    [written] = os.listdir(tmp_path / "results")
+    with open(tmp_path / "results" / written, encoding="utf-8") as f:
+        scale = json.load(f)["scales"]["real"]
+    assert scale["validation_passed"] and scale["params"]["municipalities"] == 5570
+    assert scale["steps"]["transform/load_workbook"]["baseline_wall_median"] == 1e-6
+    assert "[REGRESSION] real transform/load_workbook" in capsys.readouterr().out
@@ -0,0 +1,128 @@
+import pytest, os, sys, shutil
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.deltas import DELTA_KINDS, apply_delta, backfill, compact, diff_frames, storage_report
+from modules.manifest import artifact_for_date, is_delta
+from modules.object_store import gc
+from modules.loaders import clear_cache, load_big_numbers_uf, load_city_cases, load_semana_epidemiologica
+
+
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'output', 'dengue_2025_06_29')
+DATES = ("2025_06_26", "2025_06_27", "2025_06_28", "2025_06_29")
+LOADERS = {"city_cases": load_city_cases, "big_numbers_uf": load_big_numbers_uf,
+           "semana_epidemiologica": load_semana_epidemiologica}
+
+
+def write_snapshot(output_dir, date, step):
+    """The 2025_06_29 artifacts, with `step` more cases in a few municipalities and weeks."""
+    folder = output_dir / f"dengue_{date}"
+    folder.mkdir(parents=True)
+    for name in ("big_numbers_uf", "SE-Y-25"):
+        shutil.copy2(os.path.join(SNAPSHOT_DIR, f"{name}_2025_06_29.yaml"), folder / f"{name}_{date}.yaml")
+
+    city = pd.read_csv(os.path.join(SNAPSHOT_DIR, "city_cases_2025_06_29.csv"), encoding="utf-8-sig", dtype=str)
+    city.loc[:step * 10, "Casos Provaveis"] = (city.loc[:step * 10, "Casos Provaveis"].astype(float) + step).astype(str)
+    city = city.drop(index=step)  # one municipality missing from each snapshot, a different one each time
+    city.to_csv(folder / f"city_cases_{date}.csv", index=False, encoding="utf-8-sig")
+
+    weeks = pd.read_csv(os.path.join(SNAPSHOT_DIR, "semana_epidemiologica_2025_06_29.yaml"), dtype=str)
+    weeks.iloc[:step, 2] = str(step * 1000)
+    if step % 2:
+        weeks = weeks.iloc[::-1]  # published in another order
+    weeks.to_csv(folder / f"semana_epidemiologica_{date}.yaml", index=False)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    output_dir = tmp_path / "output"
+    for step, date in enumerate(DATES):
+        write_snapshot(output_dir, date, step)
+    clear_cache()
+    yield str(output_dir), str(output_dir / "_deltas")
+    clear_cache()
+
+
+def load(kind, date, output_dir):
+    return LOADERS[kind](artifact_for_date(kind, date, output_dir))
+
+
+# --- Tests ---
+def test_apply_delta_rebuilds_the_new_version_exactly():
+    old = load_city_cases(os.path.join(SNAPSHOT_DIR, "city_cases_2025_06_29.csv"))
+    new = old.sample(frac=1, random_state=0).iloc[:-2].reset_index(drop=True)   # reordered, 2 removed
+    new.loc[0, "Casos Provaveis"] = 123456                                        # changed
+    new.loc[len(new)] = [999999, "NOVO MUNICIPIO", pd.NA]                         # added
+    new["Casos Provaveis"] = new["Casos Provaveis"].astype("Int64")
+
+    delta = diff_frames(old, new, ("Cod Mun",))
+    assert set(delta["op"]) == {"add", "del", "chg", "ord"}
+    pd.testing.assert_frame_equal(apply_delta(old, delta, ("Cod Mun",)), new, check_exact=True)
+
+
+def test_compact_keeps_only_verified_base_plus_delta(workspace):
+    output_dir, deltas_dir = workspace
+    backfill(output_dir, deltas_dir)
+    expected = {(kind, date): load(kind, date, output_dir) for kind in DELTA_KINDS for date in DATES}
+    full, stored = storage_report(output_dir, deltas_dir)
+
+    compacted, freed = compact(output_dir, deltas_dir, keep=1)
+
+    # The first snapshot (no delta into it) and the newest one stay full, SE-Y is never compacted
+    assert compacted == 2 * len(DELTA_KINDS) and freed > 0
+    for kind in DELTA_KINDS:
+        assert [is_delta(artifact_for_date(kind, date, output_dir)) for date in DATES] == [False, True, True, False]
+    assert not is_delta(artifact_for_date("SE-Y", DATES[1], output_dir))
+    assert sorted(os.listdir(os.path.join(output_dir, f"dengue_{DATES[1]}"))) == [
+        f"SE-Y-25_{DATES[1]}.yaml", f"big_numbers_uf_{DATES[1]}.yaml.delta",
+        f"city_cases_{DATES[1]}.csv.delta", f"semana_epidemiologica_{DATES[1]}.yaml.delta"]
+    assert storage_report(output_dir, deltas_dir) == (full, stored - freed)
+
+    # Loaders rebuild compacted artifacts (2025_06_28 through the compacted 2025_06_27)
+    clear_cache()
+    for (kind, date), frame in expected.items():
+        pd.testing.assert_frame_equal(load(kind, date, output_dir), frame, check_exact=True)
+
+    # Nothing left to compact
+    assert compact(output_dir, deltas_dir, keep=1) == (0, 0)
+
+
+def test_compacted_artifact_refuses_a_changed_base(workspace):
+    output_dir, deltas_dir = workspace
+    backfill(output_dir, deltas_dir)
+    compact(output_dir, deltas_dir, keep=1, keep_raw=False)
+
+    base = os.path.join(output_dir, f"dengue_{DATES[0]}", f"big_numbers_uf_{DATES[0]}.yaml")
+    with open(base, "a", encoding="utf-8") as f:
+        f.write("Zz:\n  Óbitos por Dengue: '1'\n")
+    clear_cache()
+    with pytest.raises(ValueError):
+        load("big_numbers_uf", DATES[1], output_dir)
+
+
+def test_compact_keeps_the_raw_bytes_in_the_object_store(workspace):
+    output_dir, deltas_dir = workspace
+    backfill(output_dir, deltas_dir)
+    expected = load("big_numbers_uf", DATES[1], output_dir)
+    compact(output_dir, deltas_dir, keep=1)
+    gc(output_dir)
+
+    # The base changed, but the compacted artifact is read from its own bytes (which gc kept)
+    base = os.path.join(output_dir, f"dengue_{DATES[0]}", f"big_numbers_uf_{DATES[0]}.yaml")
+    with open(base, "a", encoding="utf-8") as f:
+        f.write("Zz:\n  Óbitos por Dengue: '1'\n")
+    clear_cache()
+    pd.testing.assert_frame_equal(load("big_numbers_uf", DATES[1], output_dir), expected, check_exact=True)
+
+
+def test_compact_bounds_the_rebuild_chain(workspace):
+    output_dir, deltas_dir = workspace
+    backfill(output_dir, deltas_dir)
+    compact(output_dir, deltas_dir, keep=1, max_chain=1, keep_raw=False)
+
+    # 2025_06_28 would be a second compacted snapshot in a row: kept in full
+    for kind in DELTA_KINDS:
+        assert [is_delta(artifact_for_date(kind, date, output_dir)) for date in DATES] == [False, True, False, False]
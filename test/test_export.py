@@ -0,0 +1,98 @@
+import pytest, os, sys, json, shutil
+from datetime import datetime
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.export import SCHEMAS, SUMMARY_FILE, conform, export_tables
+from modules.workbook_session import WorkbookSession
+from modules.loaders import clear_cache
+from data_transformation_pipeline.informe_semana_epidemiologica import informe_semana_epidemiologica
+
+
+RUN_DATE = datetime(2025, 6, 29, 18, 0)
+WORKBOOK = os.path.join(BASE_DIR, "_results", "Epidemiology_Dengue_2025_06_29.xlsx")
+
+
+@pytest.fixture
+def tables():
+    return {
+        "informe_semana_epidemiologica": [
+            {"se": 24, "data": datetime(2025, 6, 18), "casos_provaveis": 1502308, "incidencia": 706.7,
+             "municipios": 5011, "obitos_investigacao": 694, "obitos": 1225},
+            {"se": "25", "data": RUN_DATE, "casos_provaveis": 1516819.0, "incidencia": 713,
+             "municipios": None, "obitos_investigacao": 615, "obitos": 1330},
+        ],
+        "big_numbers_uf": pd.DataFrame({"UF": ["Acre", "Bahia"], "casos_provaveis": [10, None],
+                                        "incidencia": [1.5, 2], "obitos": ["3", None]}),
+        "not_exported": pd.DataFrame({"x": [1]}),
+    }
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(BASE_DIR, "output", "dengue_2025_06_29"), tmp_path / "output" / "dengue_2025_06_29")
+    monkeypatch.chdir(tmp_path)
+    clear_cache()
+    yield tmp_path
+    clear_cache()
+
+
+def schema_dtypes(name):
+    return {column: dtype for column, dtype in SCHEMAS[name].values()}
+
+
+# --- Tests ---
+@pytest.mark.parametrize("name", ["informe_semana_epidemiologica", "big_numbers_uf"])
+def test_conform_gives_the_schema_columns_and_dtypes(tables, name):
+    frame = conform(name, tables[name])
+    assert {column: str(dtype) for column, dtype in frame.dtypes.items()} == schema_dtypes(name)
+
+
+def test_conform_values(tables):
+    informe = conform("informe_semana_epidemiologica", tables["informe_semana_epidemiologica"])
+    assert informe["se"].tolist() == [24, 25]
+    assert informe["municipios"].isna().tolist() == [False, True]
+
+    ufs = conform("big_numbers_uf", tables["big_numbers_uf"])
+    assert ufs["obitos"].tolist()[0] == 3 and ufs["casos_provaveis"].isna().tolist() == [False, True]
+    # Columns the table doesn't have are all NA, with the schema's type
+    assert ufs["obitos_investigacao"].isna().all()
+
+    # One row as a dict is a one-row table
+    assert len(conform("informe_semana_epidemiologica", tables["informe_semana_epidemiologica"][0])) == 1
+
+
+def test_export_tables_roundtrip(tables, tmp_path):
+    pytest.importorskip("pyarrow")
+    target = export_tables(tables, RUN_DATE, root=str(tmp_path / "temp"), results_dir=str(tmp_path / "_results"))
+
+    assert sorted(os.listdir(target)) == sorted(
+        [f"{name}.{fmt}" for name in ("informe_semana_epidemiologica", "big_numbers_uf")
+         for fmt in ("parquet", "feather")] + [SUMMARY_FILE, "schema.json"])
+    for name in ("informe_semana_epidemiologica", "big_numbers_uf"):
+        expected = conform(name, tables[name])
+        pd.testing.assert_frame_equal(pd.read_parquet(os.path.join(target, f"{name}.parquet")), expected)
+        pd.testing.assert_frame_equal(pd.read_feather(os.path.join(target, f"{name}.feather")), expected)
+
+    with open(os.path.join(target, SUMMARY_FILE), encoding="utf-8") as f:
+        summary = json.load(f)
+    # The headline numbers are the last week's
+    assert summary["brasil"]["se"] == 25 and summary["brasil"]["data"] == "2025-06-29"
+    assert summary["ufs"]["total_casos_provaveis"] == 10
+
+
+def test_informe_table_is_the_whole_weekly_history(workspace):
+    session = WorkbookSession(WORKBOOK, str(workspace / "out.xlsx"), run_date=RUN_DATE)
+    informe_semana_epidemiologica(session)
+
+    weeks = [row for row in session.sheet("Informe Semana Epidemiologica").iter_rows(min_row=2, values_only=True)
+             if str(row[0] or "").startswith("SE ")]
+    table = conform("informe_semana_epidemiologica", session.tables["informe_semana_epidemiologica"])
+    assert len(table) == len(weeks) > 100
+    assert table["data"].is_monotonic_increasing
+    # pt-BR text, plain numbers and '=6533585-7' style cells are all read as numbers
+    assert table["casos_provaveis"].notna().all() and table["incidencia"].notna().all()
+    assert table.iloc[-1][["se", "casos_provaveis", "municipios"]].tolist() == [25, 1516819, 5033]
@@ -0,0 +1,70 @@
+import pytest, os, sys, shutil
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.history_store import SNAPSHOT_TABLES, backfill, connect, ingest_snapshot, city_cases_history
+
+
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'output', 'dengue_2025_06_29')
+RUN_DATE = "2025_06_29"
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    folder = tmp_path / "output" / f"dengue_{RUN_DATE}"
+    folder.mkdir(parents=True)
+    for name in (f"big_numbers_uf_{RUN_DATE}.yaml", f"SE-Y-25_{RUN_DATE}.yaml"):
+        shutil.copy2(os.path.join(SNAPSHOT_DIR, name), folder / name)
+    return str(tmp_path / "output"), str(tmp_path / "history.sqlite3")
+
+
+def table_counts(db_path):
+    conn = connect(db_path)
+    try:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in SNAPSHOT_TABLES}
+    finally:
+        conn.close()
+
+
+# --- Tests ---
+def test_ingest_is_idempotent(workspace):
+    output_dir, db_path = workspace
+    first = ingest_snapshot(RUN_DATE, output_dir=output_dir, db_path=db_path)
+    counts = table_counts(db_path)
+    assert first["uf_metrics"] > 0 and first["national_metrics"] > 0
+    assert counts == {**first, "snapshots": 1}
+
+    assert ingest_snapshot(RUN_DATE, output_dir=output_dir, db_path=db_path) == first
+    assert table_counts(db_path) == counts
+
+
+def test_reingesting_a_completed_snapshot_replaces_it(workspace):
+    output_dir, db_path = workspace
+    partial = ingest_snapshot(RUN_DATE, output_dir=output_dir, db_path=db_path)
+    assert partial["city_cases"] == 0
+
+    # The city cases arrive later: the snapshot is replaced as a whole, nothing is duplicated
+    name = f"city_cases_{RUN_DATE}.csv"
+    shutil.copy2(os.path.join(SNAPSHOT_DIR, name), os.path.join(output_dir, f"dengue_{RUN_DATE}", name))
+    complete = ingest_snapshot(RUN_DATE, output_dir=output_dir, db_path=db_path)
+    assert complete["city_cases"] > 0
+    assert {k: v for k, v in complete.items() if k != "city_cases"} == \
+        {k: v for k, v in partial.items() if k != "city_cases"}
+    assert table_counts(db_path) == {**complete, "snapshots": 1}
+
+    history = city_cases_history("110001", db_path=db_path)
+    assert history["snapshot_date"].tolist() == [RUN_DATE]
+
+
+def test_database_follows_the_output_dir(workspace, tmp_path, monkeypatch):
+    output_dir, _ = workspace
+    (tmp_path / "cwd").mkdir()
+    monkeypatch.chdir(tmp_path / "cwd")
+    ingest_snapshot(RUN_DATE, output_dir=output_dir)
+    assert backfill(output_dir) == [RUN_DATE]
+
+    assert table_counts(os.path.join(output_dir, "_index", "history.sqlite3"))["snapshots"] == 1
+    # Nothing under the default output/ of the working directory
+    assert not os.path.exists(tmp_path / "cwd" / "output")
@@ -0,0 +1,86 @@
+import pytest, os, sys
+from datetime import datetime
+from openpyxl import Workbook
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.incremental import plan_stages, record_run
+from data_transformation_pipeline.stages import Stage, _current_month
+
+
+STAGES = (
+    Stage("big_numbers_uf", "Big Numbers UF", inputs=("big_numbers_uf_*.yaml",)),
+    Stage("se_completa", "SE Completa", inputs=("semana_epidemiologica_*.yaml",)),
+    Stage("dengue_cases_year", "Dengue Cases Year", inputs=("big_numbers_uf_*.yaml",), params=_current_month),
+)
+
+
+def write_artifact(output_dir, date, name, content):
+    folder = output_dir / f"dengue_{date}"
+    folder.mkdir(exist_ok=True)
+    (folder / f"{name}_{date}.yaml").write_text(content, encoding="utf-8")
+
+
+def names(stages):
+    return [stage.name for stage in stages]
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    output = tmp_path / "output"
+    output.mkdir()
+    for date in ("2025_05_30", "2025_06_29"):
+        write_artifact(output, date, "big_numbers_uf", f"uf: {date}\n")
+        write_artifact(output, date, "semana_epidemiologica", f"se: {date}\n")
+    wb = Workbook()
+    for stage in STAGES:
+        wb.create_sheet(stage.sheet)
+    workbook = str(tmp_path / "Epidemiology_Dengue_2025_06_29.xlsx")
+    wb.save(workbook)
+    return output, workbook
+
+
+# --- Tests ---
+def test_unchanged_rerun_skips_every_stage(workspace):
+    output, workbook = workspace
+    record_run(STAGES, workbook, str(output))
+    to_run, skipped = plan_stages(STAGES, workbook, str(output))
+    assert to_run == [] and names(skipped) == names(STAGES)
+
+
+def test_changed_input_replans_only_the_stage_reading_it(workspace):
+    output, workbook = workspace
+    record_run(STAGES, workbook, str(output))
+    write_artifact(output, "2025_06_29", "semana_epidemiologica", "se: new\n")
+    to_run, skipped = plan_stages(STAGES, workbook, str(output))
+    assert names(to_run) == ["se_completa"]
+    assert names(skipped) == ["big_numbers_uf", "dengue_cases_year"]
+
+
+def test_pinned_run_fingerprints_its_own_snapshot(workspace):
+    output, workbook = workspace
+    run_date = datetime(2025, 5, 30)
+    record_run(STAGES, workbook, str(output), run_date=run_date)
+    assert plan_stages(STAGES, workbook, str(output), run_date=run_date)[0] == []
+
+    # The latest snapshot changing is none of a run pinned to 2025_05_30...
+    write_artifact(output, "2025_06_29", "big_numbers_uf", "uf: new\n")
+    assert plan_stages(STAGES, workbook, str(output), run_date=run_date)[0] == []
+    # ...but an unpinned run compares the latest artifacts with those of 2025_05_30
+    assert names(plan_stages(STAGES, workbook, str(output))[0]) == names(STAGES)
+
+    write_artifact(output, "2025_05_30", "big_numbers_uf", "uf: new\n")
+    assert names(plan_stages(STAGES, workbook, str(output), run_date=run_date)[0]) == ["big_numbers_uf", "dengue_cases_year"]
+
+
+def test_month_param_follows_the_run_date(workspace):
+    output, workbook = workspace
+    record_run(STAGES, workbook, str(output), run_date=datetime(2025, 6, 29))
+    # Same artifacts, next month: only the stage writing the month's cell runs again
+    to_run, _ = plan_stages(STAGES, workbook, str(output), run_date=datetime(2025, 6, 29))
+    assert to_run == []
+    write_artifact(output, "2025_07_01", "big_numbers_uf", "uf: 2025_06_29\n")
+    write_artifact(output, "2025_07_01", "semana_epidemiologica", "se: 2025_06_29\n")
+    assert names(plan_stages(STAGES, workbook, str(output), run_date=datetime(2025, 7, 1))[0]) == ["dengue_cases_year"]
@@ -0,0 +1,49 @@
+import pytest, os, sys, shutil
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.artifact_cache import CACHE
+from modules.loaders import clear_cache, load_big_numbers_uf
+
+
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'output', 'dengue_2025_06_29')
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "big_numbers_uf_2025_06_29.yaml"
+    shutil.copy2(os.path.join(SNAPSHOT_DIR, "big_numbers_uf_2025_06_29.yaml"), path)
+    clear_cache()
+    yield path
+    clear_cache()
+
+
+def rewrite(path, old, new):
+    stat = os.stat(path)
+    path.write_text(path.read_text(encoding="utf-8").replace(old, new, 1), encoding="utf-8")
+    # A rewrite within the filesystem's timestamp resolution must still be seen
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+
+# --- Tests ---
+def test_unchanged_file_is_parsed_once(artifact):
+    load_big_numbers_uf(str(artifact))
+    hits = CACHE.stats()["hits"]
+    first = load_big_numbers_uf(str(artifact))
+    assert CACHE.stats()["hits"] == hits + 1
+
+    # Callers get a copy: changing it doesn't change what the next caller gets
+    first.loc["Acre", "casos_provaveis"] = -1
+    assert load_big_numbers_uf(str(artifact)).loc["Acre", "casos_provaveis"] == 9065
+
+
+def test_changed_file_is_parsed_again(artifact):
+    assert load_big_numbers_uf(str(artifact)).loc["Acre", "casos_provaveis"] == 9065
+
+    rewrite(artifact, "9,065", "9,066")
+    assert load_big_numbers_uf(str(artifact)).loc["Acre", "casos_provaveis"] == 9066
+    # Same size, new mtime: only the new version stays cached
+    assert CACHE.stats()["entries"] == 1
+
@@ -0,0 +1,52 @@
+import pytest, os, sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.manifest import artifact_for_date, latest_artifact, load_manifest
+
+
+def write_artifact(output_dir, date, name):
+    folder = output_dir / f"dengue_{date}"
+    folder.mkdir(exist_ok=True)
+    path = folder / f"{name}_{date}.yaml"
+    path.write_text("x: 1\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    output = tmp_path / "output"
+    output.mkdir()
+    write_artifact(output, "2025_06_27", "big_numbers_uf")
+    write_artifact(output, "2025_06_29", "big_numbers_uf")
+    return output
+
+
+# --- Tests ---
+def test_manifest_indexes_every_snapshot(output_dir):
+    assert latest_artifact("big_numbers_uf", str(output_dir)).endswith("big_numbers_uf_2025_06_29.yaml")
+    assert artifact_for_date("big_numbers_uf", "2025_06_27", str(output_dir)).endswith("big_numbers_uf_2025_06_27.yaml")
+    assert latest_artifact("semana_epidemiologica", str(output_dir)) is None
+
+
+def test_manifest_sees_a_file_added_to_an_existing_folder(output_dir):
+    load_manifest(str(output_dir))
+    mtime = os.stat(output_dir).st_mtime_ns
+
+    # A late fetcher writes into the folder that is already indexed: output/ itself doesn't change
+    path = write_artifact(output_dir, "2025_06_27", "semana_epidemiologica")
+    assert os.stat(output_dir).st_mtime_ns == mtime
+
+    assert artifact_for_date("semana_epidemiologica", "2025_06_27", str(output_dir)) == path
+    assert latest_artifact("semana_epidemiologica", str(output_dir)) == path
+
+
+def test_manifest_drops_a_file_removed_from_an_existing_folder(output_dir):
+    path = write_artifact(output_dir, "2025_06_29", "semana_epidemiologica")
+    assert latest_artifact("semana_epidemiologica", str(output_dir)) == path
+
+    os.remove(path)
+    assert "2025_06_29" not in load_manifest(str(output_dir))["artifacts"]["semana_epidemiologica"]
+    assert latest_artifact("semana_epidemiologica", str(output_dir)) is None
@@ -0,0 +1,104 @@
+import pytest, os, sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.metrics_history import build_record, compare_latest, prometheus_text
+from modules.profiler import Profiler
+
+
+def run(seconds=1.0, rows=100, artifact_rows=5033):
+    """A history record with one step and one artifact."""
+    return {"steps": {"transform/se_completa": {"seconds": seconds, "rows": rows}},
+            "artifacts": {"city_cases": artifact_rows}}
+
+
+def flagged(findings):
+    return {(f.metric, f.kind) for f in findings}
+
+
+@pytest.fixture
+def record():
+    return {
+        "run_at": "2025-06-29T09:30:00", "date": "2025_06_29", "status": "passed", "seconds": 12.5,
+        "peak_rss": 200 * 2**20, "children_peak_rss": None,
+        "steps": {"transform/se_completa": {"seconds": 1.25, "rows": 2079},
+                  'fetch/say "hi"': {"seconds": 0.5, "rows": None}},
+        "artifacts": {"city_cases": 5033, "SE-Y": None},
+        "workbook": None,
+    }
+
+
+# --- Tests ---
+def test_compare_latest_uses_the_median_of_the_window():
+    # Slow runs long ago, then 3 normal ones (one outlier among them doesn't move the median)
+    history = [run(seconds=100.0)] * 5 + [run(seconds=1.0), run(seconds=50.0), run(seconds=1.0)]
+    assert compare_latest(history + [run(seconds=1.2)], window=3) == []
+
+    findings = compare_latest(history + [run(seconds=3.0)], window=3)
+    assert flagged(findings) == {("transform/se_completa", "seconds")}
+    assert findings[0].median == 1.0 and findings[0].change == pytest.approx(2.0)
+
+    # A wider window reaches the slow runs: the median moves to 100s
+    assert [f.median for f in compare_latest(history + [run(seconds=1.2)], window=8)] == [100.0]
+
+    # Nothing to compare with
+    assert compare_latest([run()]) == []
+
+
+def test_compare_latest_ignores_short_duration_changes():
+    history = [run(seconds=0.01)] * 4
+    # +900%, but 0.09s: below min_seconds
+    assert compare_latest(history + [run(seconds=0.1)], min_seconds=0.5) == []
+    assert flagged(compare_latest(history + [run(seconds=0.1)], min_seconds=0.05)) == \
+        {("transform/se_completa", "seconds")}
+
+
+def test_compare_latest_row_counts():
+    history = [run(rows=100)] * 4
+    assert compare_latest(history + [run(rows=105)]) == []
+    assert flagged(compare_latest(history + [run(rows=120, artifact_rows=4000)])) == \
+        {("transform/se_completa", "rows"), ("artifact/city_cases", "rows")}
+
+
+def test_zero_median_rows():
+    history = [run(rows=0)] * 4
+    assert compare_latest(history + [run(rows=0)]) == []
+
+    findings = compare_latest(history + [run(rows=7, artifact_rows=4000)])
+    # From a median of 0: flagged, listed first, no relative change (not inf)
+    assert [(f.metric, f.change) for f in findings][0] == ("transform/se_completa", None)
+    assert str(findings[0]) == "transform/se_completa rows: 7 rows vs median 0 rows (was 0)"
+    assert "inf" not in "".join(str(f) for f in findings)
+
+
+def test_prometheus_text(record):
+    lines = prometheus_text(record).splitlines()
+    assert "# TYPE dengue_pipeline_duration_seconds gauge" in lines
+    assert "dengue_pipeline_last_run_success 1" in lines
+    assert 'dengue_pipeline_step_duration_seconds{step="transform/se_completa"} 1.25' in lines
+    assert 'dengue_pipeline_step_duration_seconds{step="fetch/say \\"hi\\""} 0.5' in lines
+    assert 'dengue_pipeline_peak_rss_bytes{process="pipeline"} 209715200' in lines
+    # Missing values are left out, and so are metrics without any value
+    assert not any('process="children"' in line or 'artifact="SE-Y"' in line for line in lines)
+    assert not any(line.startswith("dengue_pipeline_step_rows") and "say" in line for line in lines)
+    assert not any("workbook_bytes" in line for line in lines)
+
+
+def test_build_record_sums_repeated_steps(tmp_path):
+    profiler = Profiler()
+    for rows in (10, 5):
+        with profiler.step("ingest_snapshot", "prepare") as step:
+            step.rows = rows
+    with profiler.step("ingest_snapshot", "transform"):
+        pass
+    workbook = tmp_path / "Epidemiology_Dengue_2025_06_29.xlsx"
+    workbook.write_bytes(b"x" * 10)
+
+    record = build_record(profiler, "2025_06_29", "passed", str(tmp_path / "output"), str(workbook))
+    prepare = record["steps"]["prepare/ingest_snapshot"]
+    assert prepare["calls"] == 2 and prepare["rows"] == 15
+    assert record["steps"]["transform/ingest_snapshot"]["calls"] == 1
+    assert record["workbook"] == {"path": str(workbook), "bytes": 10}
+    assert build_record(profiler, "2025_06_29", "failed", str(tmp_path / "output"))["workbook"] is None
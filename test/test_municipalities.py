@@ -0,0 +1,135 @@
+import pytest, os, sys
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.municipalities import (NO_HEALTH_REGION, REFERENCE_CSV, REGIONS, UFS, MunicipalityIndex, build_reference,
+                                    group_sums, read_reference, reference, region_positions, rollup_health_region,
+                                    rollup_region, rollup_uf, uf_positions)
+from modules.loaders import load_city_cases
+
+
+CITY_CASES = os.path.join(BASE_DIR, 'output', 'dengue_2025_06_29', 'city_cases_2025_06_29.csv')
+
+
+@pytest.fixture
+def city_cases():
+    # Unsorted, one municipality without a count, one code whose prefix isn't a UF
+    return pd.DataFrame({
+        "Cod Mun": [355030, 110001, 530010, 120040, 990001, 330455, 110002],
+        "Nome Mun": ["SAO PAULO", "ALTA FLORESTA D'OESTE", "BRASILIA", "RIO BRANCO", "?", "RIO DE JANEIRO",
+                     "ARIQUEMES"],
+        "Casos Provaveis": pd.array([100, 1, 50, 7, 1000, 20, pd.NA], dtype="Int64"),
+    })
+
+
+@pytest.fixture
+def index():
+    # The snapshot's municipalities, two health regions (Rio Branco alone, Sao Paulo with Rio de Janeiro)
+    # and one municipality without a health region
+    codes = [110001, 110002, 120040, 330455, 355030, 530010]
+    return MunicipalityIndex(codes, [11001, NO_HEALTH_REGION, 12001, 35016, 35016, 53001])
+
+
+def by(table, column):
+    return table.set_index(column)[["Municipios", "Casos Provaveis"]].apply(tuple, axis=1).to_dict()
+
+
+# --- Tests ---
+def test_uf_and_region_follow_from_the_code():
+    codes = [110001, 292740, 355030, 431490, 530010, 990001, 0]
+    assert [UFS[p][1] if p >= 0 else None for p in uf_positions(codes)] == ["RO", "BA", "SP", "RS", "DF", None, None]
+    assert [REGIONS[p] if p >= 0 else None for p in region_positions(codes)] == \
+        ["Norte", "Nordeste", "Sudeste", "Sul", "Centro-Oeste", None, None]
+
+
+def test_reference_is_the_whole_ibge_list(tmp_path):
+    table = read_reference()
+    assert len(table) == 5571 and table["cod_mun"].is_unique
+    assert (table["cod_ibge"].str[:6] == table["cod_mun"]).all()
+    assert table["uf"].tolist() == [UFS[p][1] for p in uf_positions(table["cod_mun"].astype(int))]
+
+    # The bundled arrays are the compiled CSV
+    index = reference()
+    assert index.codes.tolist() == sorted(table["cod_mun"].astype(int))
+    assert (index.uf == uf_positions(index.codes)).all()
+    built = build_reference(csv_path=REFERENCE_CSV, path=str(tmp_path / "municipalities.npz"))
+    for name in ("codes", "uf", "region", "health_region"):
+        assert np.array_equal(getattr(built, name), getattr(index, name))
+
+
+def test_reference_knows_every_municipality_of_the_snapshot():
+    index = reference()
+    codes = load_city_cases(CITY_CASES)["Cod Mun"].to_numpy()
+    positions = index.positions(codes)
+    assert (positions >= 0).all() and (index.codes[positions] == codes).all()
+    assert index.positions([990001, 1, 9_999_999]).tolist() == [-1, -1, -1]
+
+
+def test_index_save_load_and_lookup(index, tmp_path):
+    loaded = MunicipalityIndex.load(index.save(str(tmp_path / "municipalities.npz")))
+    assert loaded.codes.tolist() == [110001, 110002, 120040, 330455, 355030, 530010]
+    assert loaded.health_regions().tolist() == [11001, 12001, 35016, 53001]
+
+    # Unknown codes: UF and region from the prefix, no health region
+    uf, region, health = loaded.lookup([355030, 110002, 292740, 990001])
+    assert [UFS[p][1] for p in uf[:3]] == ["SP", "RO", "BA"] and uf[3] == -1
+    assert region.tolist() == [2, 0, 1, -1]
+    assert health.tolist() == [2, -1, -1, -1]
+
+
+def test_health_region_rollup_from_a_datasus_table(tmp_path):
+    csv_path = tmp_path / "municipalities.csv"
+    read_reference().to_csv(csv_path, index=False)
+    # DATASUS column names, 7-digit codes, semicolons
+    (tmp_path / "regioes.csv").write_text("CO_MUNICIP;CO_REGSAUD\n3550308;35016\n3304557;33005\n3509502;35016\n")
+
+    index = build_reference(str(tmp_path / "regioes.csv"), csv_path=str(csv_path), path=str(tmp_path / "m.npz"))
+    assert read_reference(str(csv_path)).set_index("cod_mun").loc[["355030", "330455", "110001"], "cod_regiao_saude"] \
+        .tolist() == ["35016", "33005", ""]
+
+    city_cases = pd.DataFrame({"Cod Mun": [355030, 330455, 350950, 110001], "Casos Provaveis": [100, 20, 3, 9]})
+    assert by(rollup_health_region(city_cases, index), "Regiao de Saude") == {33005: (1, 20), 35016: (2, 103)}
+    # The bundled reference ships without health regions
+    assert rollup_health_region(city_cases).empty
+
+
+def test_group_sums():
+    sums, counts = group_sums([2, 0, -1, 2, 2], [1.0, 2.0, 100.0, 3.0, 0.4], 4)
+    assert sums.tolist() == [2, 0, 4, 0] and counts.tolist() == [1, 0, 3, 0]
+    assert sums.dtype == np.int64
+
+
+def test_rollup_uf_sums(city_cases):
+    table = rollup_uf(city_cases)
+    assert table["Sigla"].tolist() == [sigla for _, sigla, _, _ in UFS]
+    sums = by(table, "Sigla")
+    assert sums["RO"] == (2, 1)           # the municipality without a count counts as 0 cases
+    assert sums["AC"] == (1, 7) and sums["SP"] == (1, 100) and sums["RJ"] == (1, 20) and sums["DF"] == (1, 50)
+    assert sums["BA"] == (0, 0)
+    # The code outside every UF is left out
+    assert table["Casos Provaveis"].sum() == 178 and table["Municipios"].sum() == 6
+
+
+def test_rollup_region_sums(city_cases):
+    assert by(rollup_region(city_cases), "Região") == {
+        "Norte": (3, 8), "Nordeste": (0, 0), "Sudeste": (2, 120), "Sul": (0, 0), "Centro-Oeste": (1, 50)}
+
+
+def test_rollups_with_an_index(city_cases, index):
+    assert by(rollup_uf(city_cases, index), "Sigla")["RO"] == (2, 1)
+    assert by(rollup_health_region(city_cases, index), "Regiao de Saude") == {
+        11001: (1, 1), 12001: (1, 7), 35016: (2, 120), 53001: (1, 50)}
+
+
+def test_rollups_match_a_group_by_of_the_real_snapshot():
+    city_cases = load_city_cases(CITY_CASES)
+    cases = city_cases["Casos Provaveis"].fillna(0)
+    expected = cases.groupby(city_cases["Cod Mun"] // 10_000).sum()
+    table = rollup_uf(city_cases)
+    for (code, _, _, _), total in zip(UFS, table["Casos Provaveis"]):
+        assert total == expected.get(code, 0)
+    assert rollup_region(city_cases)["Casos Provaveis"].sum() == cases.sum()
@@ -0,0 +1,79 @@
+import pytest, os, sys, shutil
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.object_store import REF_SUFFIX, gc, migrate, put_object, read_ref, resolve, verify, _objects
+from modules.manifest import artifact_for_date
+
+
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'output', 'dengue_2025_06_29')
+DATES = ("2025_06_27", "2025_06_29")
+NAMES = ("big_numbers_uf_{}.yaml", "SE-Y-25_{}.yaml")
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    # Two snapshots with identical content: each object is stored once
+    for date in DATES:
+        folder = tmp_path / "output" / f"dengue_{date}"
+        folder.mkdir(parents=True)
+        for name in NAMES:
+            shutil.copy2(os.path.join(SNAPSHOT_DIR, name.format("2025_06_29")), folder / name.format(date))
+    return str(tmp_path / "output")
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# --- Tests ---
+@pytest.mark.parametrize("codec", ["none", "gzip"])
+def test_migrate_verify_gc_keeps_referenced_objects(output_dir, codec):
+    originals = {(date, name): read(os.path.join(output_dir, f"dengue_{date}", name.format(date)))
+                 for date in DATES for name in NAMES}
+    migrate(output_dir, codec)
+
+    # Only references left in the snapshot folders, one object per distinct content
+    for date in DATES:
+        assert sorted(os.listdir(os.path.join(output_dir, f"dengue_{date}"))) == \
+            sorted(name.format(date) + REF_SUFFIX for name in NAMES)
+    assert len(_objects(output_dir)) == len(NAMES)
+    assert verify(output_dir) == []
+
+    # An object nobody references anymore, plus the views of the references
+    orphan = os.path.join(output_dir, "orphan.yaml")
+    with open(orphan, "w", encoding="utf-8") as f:
+        f.write("orphan: 1\n")
+    orphan_digest, orphan_codec = put_object(orphan, codec, output_dir)
+    for date in DATES:
+        resolve(os.path.join(output_dir, f"dengue_{date}", NAMES[0].format(date) + REF_SUFFIX))
+
+    assert gc(output_dir) > 0
+    assert orphan_digest not in _objects(output_dir)
+    assert not os.path.exists(os.path.join(output_dir, "_objects", "views"))
+    assert verify(output_dir) == []
+
+    # Every artifact still reads back byte for byte, through the manifest like the pipeline does
+    for (date, name), content in originals.items():
+        kind = "SE-Y" if name.startswith("SE-Y") else "big_numbers_uf"
+        path = artifact_for_date(kind, date, output_dir)
+        assert os.path.basename(path) == name.format(date)
+        assert read(path) == content
+
+
+def test_verify_reports_missing_and_corrupted_objects(output_dir):
+    migrate(output_dir, "none")
+    ref_path = os.path.join(output_dir, f"dengue_{DATES[0]}", NAMES[0].format(DATES[0]) + REF_SUFFIX)
+    big_numbers = _objects(output_dir)[read_ref(ref_path)["object"]][0]
+    se_y = next(path for digest, (path, _) in _objects(output_dir).items() if path != big_numbers)
+
+    with open(big_numbers, "ab") as f:
+        f.write(b"tampered")
+    os.remove(se_y)
+    problems = verify(output_dir)
+    assert len(problems) == 2 * len(DATES)
+    assert sum(p.endswith("is corrupted") for p in problems) == len(DATES)
+    assert sum(p.endswith("is missing") for p in problems) == len(DATES)
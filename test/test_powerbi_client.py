@@ -0,0 +1,181 @@
+import pytest, os, sys, json, re, threading
+import yaml
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.powerbi_client import (VISUALS, PowerBIError, decode_dsr, fetch_visuals, query_visuals, report_key,
+                                    write_artifact)
+from modules.loaders import load_big_numbers_uf, load_se_summary, load_semana_epidemiologica
+
+
+FIXTURES_DIR = os.path.join(BASE_DIR, 'test', 'fixtures', 'powerbi')
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'output', 'dengue_2025_06_29')
+RUN_DATE = "2025_06_29"
+RESOURCE_KEY, TENANT = report_key()
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+# --- Stand-in Power BI public API (recorded responses) ---
+class PowerBIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, None))
+        if self.path == f"/public/routing/cluster/{TENANT}":
+            return self._send(200, json.dumps({"FixedClusterUri": f"{self.server.base}/"}).encode())
+        if re.fullmatch(rf"/public/reports/{RESOURCE_KEY}/modelsAndExploration\?preferReadOnlySession=true", self.path) \
+                and self.headers["X-PowerBI-ResourceKey"] == RESOURCE_KEY:
+            return self._send(200, read_fixture("models_and_exploration.json"))
+        self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(("POST", self.path, body))
+        if self.path != "/public/reports/querydata?synchronous=true":
+            return self._send(404, b'{"error": "not found"}')
+        results = []
+        for query in body["queries"]:
+            visual = query["ApplicationContext"]["Sources"][0]["VisualId"]
+            if self.server.broken == visual:
+                results.append({"jobId": "0", "result": {"error": {"code": "QueryExecutionError"}}})
+            else:
+                results.append(json.loads(read_fixture(f"querydata_{visual}.json")))
+        self._send(200, json.dumps({"jobIds": [], "results": results}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordedPool:
+    """ConnectionPool stand-in answering querydata with the recorded responses."""
+
+    def request(self, method, url, body=None, headers=None):
+        visuals = [q["ApplicationContext"]["Sources"][0]["VisualId"] for q in json.loads(body)["queries"]]
+        results = [json.loads(read_fixture(f"querydata_{visual}.json")) for visual in visuals]
+        return 200, json.dumps({"results": results}).encode()
+
+
+def read_snapshot_text(name):
+    with open(os.path.join(SNAPSHOT_DIR, name), encoding='utf-8-sig') as f:
+        return f.read()
+
+
+@pytest.fixture
+def powerbi_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PowerBIHandler)
+    server.requests, server.connections, server.broken = [], 0, None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base = f"http://127.0.0.1:{server.server_address[1]}"
+    server.routing_url = server.base + "/public/routing/cluster/{tenant}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# --- Tests ---
+def test_fetch_visuals_writes_fetcher_artifacts(powerbi_server, tmp_path):
+    paths = fetch_visuals(date=RUN_DATE, output_dir=str(tmp_path), routing_url=powerbi_server.routing_url)
+
+    folder = tmp_path / f"dengue_{RUN_DATE}"
+    assert paths == {
+        "semana_epidemiologica": str(folder / f"semana_epidemiologica_{RUN_DATE}.yaml"),
+        "big_numbers_uf": str(folder / f"big_numbers_uf_{RUN_DATE}.yaml"),
+        "se_cards": str(folder / f"SE-Y-25_{RUN_DATE}.yaml"),
+    }
+
+    # Loaded exactly like the artifacts the Playwright fetchers wrote
+    expected = load_big_numbers_uf(os.path.join(SNAPSHOT_DIR, f"big_numbers_uf_{RUN_DATE}.yaml"))
+    pd.testing.assert_frame_equal(load_big_numbers_uf(paths["big_numbers_uf"]), expected)
+
+    expected = load_se_summary(os.path.join(SNAPSHOT_DIR, f"SE-Y-25_{RUN_DATE}.yaml"))
+    assert load_se_summary(paths["se_cards"]) == expected
+
+    expected = load_semana_epidemiologica(os.path.join(SNAPSHOT_DIR, f"semana_epidemiologica_{RUN_DATE}.yaml"))
+    expected = expected[expected['Ano/Semana'] >= '2025/24'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(load_semana_epidemiologica(paths["semana_epidemiologica"]), expected)
+
+
+def test_fetch_visuals_batches_queries_in_one_request(powerbi_server, tmp_path):
+    fetch_visuals(date=RUN_DATE, output_dir=str(tmp_path), routing_url=powerbi_server.routing_url)
+
+    # Routing, model ids, then every visual in a single querydata POST
+    methods = [method for method, _, _ in powerbi_server.requests]
+    assert methods == ["GET", "GET", "POST"]
+    body = powerbi_server.requests[-1][2]
+    assert body["modelId"] == 4815162
+    assert [q["ApplicationContext"]["Sources"][0]["VisualId"] for q in body["queries"]] == \
+        ["semana_epidemiologica", "big_numbers_uf", "se_cards"]
+    assert all(q["ApplicationContext"]["DatasetId"] == "b2f0c7d1-3e4a-4f58-9c6b-8d1e2a3f4c5d" for q in body["queries"])
+    # One connection for the routing lookup, one keep-alive connection for the cluster
+    assert powerbi_server.connections == 2
+
+
+def test_fetch_visuals_writes_nothing_when_a_query_fails(powerbi_server, tmp_path):
+    powerbi_server.broken = "se_cards"
+    with pytest.raises(PowerBIError):
+        fetch_visuals(date=RUN_DATE, output_dir=str(tmp_path), routing_url=powerbi_server.routing_url)
+    assert not list(tmp_path.glob("dengue_*/*"))
+
+
+def test_artifacts_have_the_layout_of_the_scraped_ones(tmp_path):
+    model = {"dataset_id": "d", "report_id": "r", "model_id": 1}
+    rows = query_visuals(RecordedPool(), "http://cluster", RESOURCE_KEY, model, list(VISUALS))
+    paths = {visual: write_artifact(visual, rows[visual], str(tmp_path), RUN_DATE) for visual in VISUALS}
+    assert sorted(os.path.basename(p) for p in paths.values()) == sorted(
+        [f"semana_epidemiologica_{RUN_DATE}.yaml", f"big_numbers_uf_{RUN_DATE}.yaml", f"SE-Y-25_{RUN_DATE}.yaml"])
+
+    def text(visual):
+        with open(paths[visual], encoding='utf-8') as f:
+            return f.read()
+
+    # Same bytes as the scraper wrote
+    assert text("big_numbers_uf") == read_snapshot_text(f"big_numbers_uf_{RUN_DATE}.yaml")
+
+    # Same keys; the cards' values differ only in the decimal separator the browser copied
+    cards = yaml.safe_load(text("se_cards"))
+    scraped = yaml.safe_load(read_snapshot_text(f"SE-Y-25_{RUN_DATE}.yaml"))
+    assert set(cards) == set(scraped) and list(cards["All_Semanas_Data"]) == list(scraped["All_Semanas_Data"])
+
+    # Same header and lines (the scraper's weeks carry a trailing no-break space), for the weeks queried
+    lines = text("semana_epidemiologica").splitlines()
+    scraped = read_snapshot_text(f"semana_epidemiologica_{RUN_DATE}.yaml").replace("\xa0", "").splitlines()
+    assert lines[0] == scraped[0] and len(lines) > 1
+    assert set(lines) <= set(scraped)
+
+
+def test_decode_dsr_repeats_nulls_and_value_dicts():
+    data = {
+        "descriptor": {"Select": [{"Kind": 1, "Value": "G0", "Name": "Dengue.UF"},
+                                  {"Kind": 2, "Value": "M0", "Name": "Dengue.Casos"},
+                                  {"Kind": 2, "Value": "M1", "Name": "Dengue.Obitos"}]},
+        "dsr": {"DS": [{"PH": [{"DM0": [
+            {"S": [{"N": "G0", "T": 1, "DN": "D0"}, {"N": "M0", "T": 4}, {"N": "M1", "T": 4}], "C": [0, 10, 1]},
+            {"R": 4, "C": [1, 20]},         # Obitos repeated
+            {"Ø": 2, "C": [2, 3]},          # Casos null
+        ]}], "ValueDicts": {"D0": ["Acre", "Bahia", "Ceara"]}}]},
+    }
+    assert decode_dsr(data) == [
+        {"Dengue.UF": "Acre", "Dengue.Casos": 10, "Dengue.Obitos": 1},
+        {"Dengue.UF": "Bahia", "Dengue.Casos": 20, "Dengue.Obitos": 1},
+        {"Dengue.UF": "Ceara", "Dengue.Casos": None, "Dengue.Obitos": 3},
+    ]
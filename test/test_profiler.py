@@ -0,0 +1,94 @@
+import pytest, os, sys, json, time, threading, tracemalloc
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.profiler import Profiler
+
+
+MiB = 2**20
+
+
+@pytest.fixture
+def memory_profiler():
+    tracing = tracemalloc.is_tracing()
+    yield Profiler(memory=True)
+    if not tracing:
+        tracemalloc.stop()
+
+
+def by_name(profiler):
+    return {r["name"]: r for r in profiler.records}
+
+
+# --- Tests ---
+def test_nested_steps_rows_and_errors():
+    profiler = Profiler()
+    with profiler.step("transform", "transform"):
+        with profiler.step("se_completa", "transform") as step:
+            step.rows = 2079
+        with pytest.raises(KeyError):
+            with profiler.step("broken", "transform"):
+                raise KeyError("UF")
+
+    records = by_name(profiler)
+    assert [r["name"] for r in profiler.records] == ["se_completa", "broken", "transform"]  # in finish order
+    assert (records["transform"]["depth"], records["se_completa"]["depth"]) == (0, 1)
+    assert records["se_completa"]["rows"] == 2079 and records["se_completa"]["status"] == "ok"
+    assert records["broken"]["status"] == "error: KeyError"
+    # The parent's wall time covers its children's
+    assert records["transform"]["wall"] >= records["se_completa"]["wall"] + records["broken"]["wall"]
+
+
+def test_peak_memory_reaches_the_parent(memory_profiler):
+    with memory_profiler.step("outer"):
+        with memory_profiler.step("inner"):
+            block = bytearray(8 * MiB)
+            del block
+        with memory_profiler.step("small"):
+            block = bytearray(MiB // 4)
+
+    records = by_name(memory_profiler)
+    assert records["inner"]["peak_memory"] >= 8 * MiB
+    assert records["small"]["peak_memory"] < 8 * MiB
+    # The child's peak was freed before 'small' reset it, but the parent keeps it
+    assert records["outer"]["peak_memory"] >= 8 * MiB
+
+
+def test_worker_thread_steps_skip_memory(memory_profiler):
+    def check():
+        with memory_profiler.step("check", "validation"):
+            bytearray(MiB)
+
+    worker = threading.Thread(target=check)
+    worker.start()
+    worker.join()
+    record = by_name(memory_profiler)["check"]
+    assert record["thread"] == worker.ident
+    assert "peak_memory" not in record and record["max_rss"] is None and record["bytes_read"] is None
+
+
+def test_traces(tmp_path):
+    profiler = Profiler(cprofile_dir=str(tmp_path / "cprofile"))
+    fetch_start = time.perf_counter()
+    with profiler.step("transform", "transform"):
+        with profiler.step("se_completa", "transform"):
+            sum(range(1000))
+    profiler.add_record("cityCases", "fetch", fetch_start, 1.5, status="fetched")
+
+    # One cProfile dump per top-level step
+    assert os.listdir(tmp_path / "cprofile") == ["transform.transform.prof"]
+
+    json_path, chrome_path = profiler.write(str(tmp_path / "profile"), chrome=True)
+    with open(json_path, encoding="utf-8") as f:
+        steps = json.load(f)["steps"]
+    assert [s["name"] for s in steps] == ["cityCases", "transform", "se_completa"]  # in start order
+
+    with open(chrome_path, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert spans["cityCases"]["dur"] == 1_500_000 and spans["transform"]["args"]["status"] == "ok"
+    # The fetcher's record comes first, the main thread is still named 'main'
+    threads = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert threads == {"fetch:cityCases", "main"}
@@ -0,0 +1,65 @@
+import pytest, os, sys
+from dataclasses import dataclass
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.scheduler import CyclicDependencyError, failed_stages, run_stages, write_order
+from data_transformation_pipeline.stages import Stage
+
+
+@dataclass(frozen=True)
+class FakeStage(Stage):
+    """A stage that records its run in the session (a list) instead of importing a transform."""
+    fails: bool = False
+
+    def run(self, session):
+        session.append(self.name)
+        if self.fails:
+            raise ValueError(f"{self.name} broke")
+        return len(session)
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    # No snapshot at all: preparing a stage with inputs fails
+    (tmp_path / "output").mkdir()
+    return str(tmp_path / "output")
+
+
+# --- Tests ---
+def test_failed_prepare_is_recorded_and_the_stage_still_runs(output_dir):
+    stages = [FakeStage("a", "A"), FakeStage("b", "B", inputs=("city_cases_*.csv",)), FakeStage("c", "C")]
+    session, outcomes = run_stages(stages, list, output_dir=output_dir)
+
+    assert session == ["a", "b", "c"]
+    assert failed_stages(outcomes) == []
+    assert outcomes["b"].prepare_error.startswith("FileNotFoundError")
+    assert outcomes["a"].prepare_error is None and outcomes["c"].prepare_error is None
+
+
+def test_failed_stage_skips_its_dependents_only(output_dir):
+    stages = [
+        FakeStage("d", "D", after=("b",)),
+        FakeStage("a", "A", fails=True),
+        FakeStage("b", "B", after=("a",)),
+        FakeStage("c", "C"),
+    ]
+    session, outcomes = run_stages(stages, list, output_dir=output_dir)
+
+    # 'b' depends on the failed 'a' and 'd' on 'b': neither runs, 'c' does
+    assert session == ["a", "c"]
+    assert {name: o.status for name, o in outcomes.items()} == \
+        {"a": "failed", "b": "skipped", "d": "skipped", "c": "ok"}
+    assert outcomes["a"].error == "ValueError: a broke"
+    assert "depends on a" in outcomes["b"].error
+    assert failed_stages(outcomes) == ["a", "b", "d"]
+
+
+def test_write_order_follows_dependencies():
+    stages = [FakeStage("d", "D", after=("b",)), FakeStage("b", "B", after=("a", "missing")), FakeStage("a", "A")]
+    assert [s.name for s in write_order(stages)] == ["a", "b", "d"]
+
+    with pytest.raises(CyclicDependencyError):
+        write_order([FakeStage("a", "A", after=("b",)), FakeStage("b", "B", after=("a",))])
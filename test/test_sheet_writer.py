@@ -0,0 +1,112 @@
+import pytest, os, sys
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Alignment
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.sheet_writer import RowIndex, clear_rows, register_column_style, upsert_rows, write_columns
+
+
+KEY_FIELDS = ("UF", "Ano/Semana")
+COL_MAP = {"UF": 1, "Ano/Semana": 2, "Casos": 3}
+
+
+@pytest.fixture
+def ws():
+    ws = Workbook().active
+    ws.append(["UF", "Ano/Semana", "Casos"])
+    for row in (("Acre", "2025/01", 1), ("Bahia", "2025/01", 2), ("Acre", "2025/02", 3),
+                ("Bahia", "2025/02", 4), ("Acre", "2025/01", 99)):  # the last one repeats row 2's key
+        ws.append(row)
+    return ws
+
+
+def sheet_rows(ws):
+    return [tuple(row) for row in ws.iter_rows(min_row=2, values_only=True)]
+
+
+# --- Tests ---
+def test_upsert_matches_rows_by_key_not_position(ws):
+    index = RowIndex(ws, (1, 2), 2)
+    # Reordered, 'Bahia 2025/01' missing, a new week
+    data = pd.DataFrame({"UF": ["Bahia", "Acre", "Acre"], "Ano/Semana": ["2025/02", "2025/01", "2025/03"],
+                         "Casos": [40, 10, 5]})
+    updated, appended = upsert_rows(ws, data, index, KEY_FIELDS, COL_MAP)
+
+    assert sheet_rows(ws) == [
+        ("Acre", "2025/01", 10),    # first row of a duplicated key is the one updated
+        ("Bahia", "2025/01", 2),    # missing from the data: untouched
+        ("Acre", "2025/02", 3),
+        ("Bahia", "2025/02", 40),
+        ("Acre", "2025/01", 99),    # later copy of the duplicated key: untouched
+        ("Acre", "2025/03", 5),     # new week appended after the last row
+    ]
+    # Only the cells whose value changed are written
+    assert (updated, appended) == (2, 1)
+
+
+def test_row_index_reports_duplicate_keys(ws):
+    index = RowIndex(ws, (1, 2), 2)
+    assert index.duplicates == 1
+    assert index.duplicate_keys == [("acre", "2025/01")]
+    assert index.get(("ACRE", "2025/01")) == 2
+    assert index.last_row == 6
+
+
+def test_upsert_appends_to_the_index(ws):
+    index = RowIndex(ws, (1, 2), 2)
+    data = pd.DataFrame({"UF": ["Acre"], "Ano/Semana": ["2025/03"], "Casos": [5]})
+    upsert_rows(ws, data, index, KEY_FIELDS, COL_MAP)
+
+    # Same index, next run: the appended week is now updated in place
+    data["Casos"] = [6]
+    assert upsert_rows(ws, data, index, KEY_FIELDS, COL_MAP) == (1, 0)
+    assert sheet_rows(ws)[-1] == ("Acre", "2025/03", 6)
+
+
+def test_upsert_rejects_duplicate_keys_in_the_data(ws):
+    index = RowIndex(ws, (1, 2), 2)
+    data = pd.DataFrame({"UF": ["Acre", "acre"], "Ano/Semana": ["2025/03", "2025/03"], "Casos": [5, 6]})
+    with pytest.raises(ValueError):
+        upsert_rows(ws, data, index, KEY_FIELDS, COL_MAP)
+    assert len(sheet_rows(ws)) == 5
+
+
+def test_bulk_writes_round_trip_like_the_public_api(tmp_path):
+    data = pd.DataFrame({"Cod Mun": [110001, 110002, 120040], "Nome": ["A", None, "C"],
+                         "Casos": pd.array([1500, pd.NA, 7], dtype="Int64")})
+    col_map = {"Cod Mun": 1, "Nome": 2, "Casos": 3}
+
+    def workbook(bulk):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Cod Mun", "Nome", "Casos"])
+        for row in range(2, 8):  # an older, longer block, cut back below
+            ws.append([row, "old", row])
+        style = register_column_style(wb, "casos", Alignment(horizontal="center"), "#,##0")
+        if bulk:
+            clear_rows(ws, 5)
+            write_columns(ws, data, 2, col_map, styles={"Casos": style}, skip_na=True)
+        else:
+            ws.delete_rows(5, ws.max_row)
+            for i, row in enumerate(data.itertuples(index=False), start=2):
+                for name, value in zip(col_map, row):
+                    if not pd.isna(value):  # skip_na: the cell is left untouched, style included
+                        ws.cell(row=i, column=col_map[name], value=value)
+                        if name == "Casos":
+                            ws.cell(row=i, column=3).style = style
+        path = tmp_path / f"{'bulk' if bulk else 'public'}.xlsx"
+        wb.save(path)
+        return load_workbook(path).active
+
+    bulk, public = workbook(True), workbook(False)
+    assert bulk.max_row == public.max_row == 4
+    assert list(bulk.iter_rows(values_only=True)) == list(public.iter_rows(values_only=True))
+    assert [c.value for c in bulk["B"]] == ["Nome", "A", "old", "C"]  # skip_na left the old cell
+    assert [c.style for c in bulk["C"]] == ["Normal", "casos", "Normal", "casos"]
+    for a, b in zip(bulk["C"], public["C"]):
+        assert (a.style, a.number_format, a.alignment.horizontal, a.font.name) == \
+            (b.style, b.number_format, b.alignment.horizontal, b.font.name)
@@ -0,0 +1,157 @@
+import pytest, os, sys, re, threading
+import pandas as pd
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.tabnet_client import (
+    ConnectionPool,
+    TabnetError,
+    available_periods,
+    fetch_city_cases,
+)
+from modules.tabnet_parser import iter_city_cases, read_city_cases, write_city_cases
+
+
+FIXTURES_DIR = os.path.join(BASE_DIR, 'test', 'fixtures', 'tabnet')
+FORM_PATH = "/cgi/tabcgi.exe?sinannet/cnv/denguebbr.def"
+RUN_DATE = "2025_06_29"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+# --- Stand-in Tabnet server (recorded responses) ---
+class TabnetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like tabnet.datasus.gov.br
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send(self, status, body, content_type="text/html; charset=ISO-8859-1"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, None))
+        if self.path == FORM_PATH:
+            return self._send(200, read_fixture("form.html"))
+        match = re.fullmatch(r"/csv/(dengbr\d{2})\.csv", self.path)
+        if match and os.path.exists(os.path.join(FIXTURES_DIR, f"{match.group(1)}.csv")):
+            return self._send(200, read_fixture(f"{match.group(1)}.csv"), "text/csv")
+        self._send(404, b"not found")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        form = parse_qs(body.decode("latin1"), encoding="latin1")
+        self.server.requests.append(("POST", self.path, form))
+        if self.path != FORM_PATH or self.server.broken:
+            return self._send(200, b"<HTML><BODY>Erro na tabulacao</BODY></HTML>")
+        period = form["Arquivos"][0].replace(".dbf", "")
+        page = read_fixture("result.html").replace(b"{csv}", f"{period}.csv".encode())
+        self._send(200, page)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tabnet_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TabnetHandler)
+    server.requests, server.connections, server.broken = [], 0, False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}{FORM_PATH}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# --- Tests ---
+def test_fetch_city_cases_writes_formatter_input(tabnet_server, tmp_path):
+    paths = fetch_city_cases(date=RUN_DATE, output_dir=str(tmp_path), url=tabnet_server.url)
+
+    expected = tmp_path / f"dengue_{RUN_DATE}" / f"city_cases_{RUN_DATE}.csv"
+    assert paths == {2025: str(expected)}
+    assert expected.read_bytes() == read_fixture("dengbr25.csv")
+
+    # Same form selection the browser made
+    posts = [form for method, _, form in tabnet_server.requests if method == "POST"]
+    assert len(posts) == 1
+    assert posts[0]["Linha"] == ["Município_de_residência"]
+    assert posts[0]["Incremento"] == ["Casos_Prováveis"]
+    assert posts[0]["Arquivos"] == ["dengbr25.dbf"]
+
+    # Parsed exactly like city_cases_formatter does
+    df = pd.read_csv(expected, skiprows=3, sep=';', encoding='latin1', quotechar='"')
+    assert list(df.columns) == ['Município de residência', 'Casos_Prováveis']
+    assert df['Município de residência'].str.match(r'^\d{6} ').sum() >= 10
+
+
+def test_fetch_city_cases_batches_periods_over_pooled_connections(tabnet_server, tmp_path):
+    paths = fetch_city_cases(date=RUN_DATE, years=[2025, 2024], output_dir=str(tmp_path),
+                             url=tabnet_server.url, pool_size=1)
+
+    folder = tmp_path / f"dengue_{RUN_DATE}"
+    assert paths == {
+        2025: str(folder / f"city_cases_{RUN_DATE}.csv"),
+        2024: str(folder / f"tabnet_city_cases_2024_{RUN_DATE}.csv"),
+    }
+    assert (folder / f"tabnet_city_cases_2024_{RUN_DATE}.csv").read_bytes() == read_fixture("dengbr24.csv")
+
+    # 2 periods x (form POST + CSV GET) over a single keep-alive connection
+    assert len(tabnet_server.requests) == 4
+    assert tabnet_server.connections == 1
+
+
+def test_fetch_city_cases_fails_without_csv_link(tabnet_server, tmp_path):
+    tabnet_server.broken = True
+    with pytest.raises(TabnetError):
+        fetch_city_cases(date=RUN_DATE, output_dir=str(tmp_path), url=tabnet_server.url)
+    assert not (tmp_path / f"dengue_{RUN_DATE}" / f"city_cases_{RUN_DATE}.csv").exists()
+
+
+def test_available_periods(tabnet_server):
+    pool = ConnectionPool(tabnet_server.url)
+    try:
+        assert available_periods(pool, tabnet_server.url) == [2025, 2024, 2023]
+    finally:
+        pool.close()
+
+
+# --- Parser ---
+def test_read_city_cases_compact_dtypes():
+    df = read_city_cases(os.path.join(FIXTURES_DIR, "dengbr25.csv"))
+
+    assert str(df['Cod Mun'].dtype) == 'int32'
+    assert str(df['Nome Mun'].dtype) == 'category'
+    assert str(df['Casos Provaveis'].dtype) == 'int32'
+    # Title, '000000 Município ignorado', 'Total' and the notes footer are dropped
+    assert (df['Cod Mun'] >= 110000).all()
+    assert df.iloc[0].tolist() == [110001, "ALTA FLORESTA D'OESTE", 201]
+
+    chunks = list(iter_city_cases(os.path.join(FIXTURES_DIR, "dengbr25.csv"), chunk_rows=4))
+    assert max(len(c) for c in chunks) == 4
+    assert sum(len(c) for c in chunks) == len(df)
+
+
+def test_write_city_cases_in_place(tmp_path):
+    path = tmp_path / f"city_cases_{RUN_DATE}.csv"
+    path.write_bytes(read_fixture("dengbr25.csv"))
+
+    rows = write_city_cases(str(path), str(path))
+
+    lines = path.read_text(encoding="utf-8-sig").splitlines()
+    assert lines[0] == "Cod Mun,Nome Mun,Casos Provaveis"
+    assert lines[1] == "110001,ALTA FLORESTA D'OESTE,201"  # integers, no '201.0'
+    assert len(lines) == rows + 1
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,75 @@
+import pytest, os, sys
+import pandas as pd
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.tabnet_parser import CITY_CASES_COLUMNS, TabnetFormatError, iter_city_cases, read_city_cases
+
+
+# A Tabnet export with one column per year and the usual title, 'Total' row and notes footer
+EXPORT = """\
+Casos Prováveis por Município de residência e Ano 1º Sintoma(s)
+Período:2024-2025
+"Município de residência";"2024";"2025";"Total"
+"110001 ALTA FLORESTA D'OESTE";"150";"51";"201"
+"000000 Município ignorado";"3";"4";"7"
+"110002 ARIQUEMES";"-";"-";"-"
+"Ignorado/exterior";"1";"1";"2"
+"355030 SÃO PAULO";"1.000";"234";"1.234"
+"530010 BRASÍLIA";"12";"-";"12"
+"Total";"1.166";"290";"1.456"
+"Fonte: Ministério da Saúde/SVS - Sistema de Informação de Agravos de Notificação - Sinan Net"
+"999999 NOT A MUNICIPALITY";"1";"1";"1"
+"""
+
+EXPECTED = [
+    [110001, "ALTA FLORESTA D'OESTE", 201],
+    [110002, "ARIQUEMES", 0],
+    [355030, "SÃO PAULO", 1234],
+    [530010, "BRASÍLIA", 12],
+]
+
+
+def write_export(path, text=EXPORT):
+    path.write_bytes(text.encode("latin1"))
+    return str(path)
+
+
+# --- Tests ---
+def test_only_municipality_rows_are_kept(tmp_path):
+    df = read_city_cases(write_export(tmp_path / "export.csv"))
+
+    # The '000000'/'Ignorado' rows, the 'Total' row and anything after it are skipped;
+    # the last column is used, '-' is zero and '.' is a thousands separator
+    assert list(df.columns) == CITY_CASES_COLUMNS
+    assert df.values.tolist() == EXPECTED
+
+
+def test_dtypes_are_narrowed(tmp_path):
+    df = read_city_cases(write_export(tmp_path / "export.csv"))
+
+    assert df.dtypes.astype(str).tolist() == ["int32", "category", "int32"]
+    wide = df.astype({"Cod Mun": "int64", "Nome Mun": object, "Casos Provaveis": "int64"})
+    assert df.memory_usage(deep=True).sum() < wide.memory_usage(deep=True).sum()
+
+
+def test_chunks_add_up_to_one_read(tmp_path):
+    path = write_export(tmp_path / "export.csv")
+
+    chunks = list(iter_city_cases(path, chunk_rows=3))
+    assert [len(c) for c in chunks] == [3, 1]
+    assert all(c.dtypes.astype(str).tolist() == ["int32", "category", "int32"] for c in chunks)
+    # Each chunk has its own categories; the concatenation is a category again
+    df = read_city_cases(path, chunk_rows=3)
+    assert str(df['Nome Mun'].dtype) == 'category'
+    pd.testing.assert_frame_equal(df, read_city_cases(path), check_categorical=False)
+
+
+def test_export_without_rows_and_without_header(tmp_path):
+    empty = read_city_cases(write_export(tmp_path / "empty.csv", EXPORT.split('"110001')[0] + '"Total";"0"\n'))
+    assert empty.empty and empty.dtypes.astype(str).tolist() == ["int32", "category", "int32"]
+
+    with pytest.raises(TabnetFormatError):
+        read_city_cases(write_export(tmp_path / "error.csv", "Erro na tabulação\n"))
@@ -0,0 +1,61 @@
+import pytest, os, sys, shutil
+from datetime import datetime
+from openpyxl import load_workbook
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.validation import CHECKS, load_sources, validate_workbook
+from modules.loaders import clear_cache
+
+
+RUN_DATE = datetime(2025, 6, 29, 18, 0)
+WORKBOOK = os.path.join(BASE_DIR, "_results", "Epidemiology_Dengue_2025_06_29.xlsx")
+
+
+@pytest.fixture
+def sources():
+    clear_cache()
+    yield load_sources(os.path.join(BASE_DIR, "output"), RUN_DATE)
+    clear_cache()
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / os.path.basename(WORKBOOK))
+    shutil.copy2(WORKBOOK, path)
+    return path
+
+
+def failed(report):
+    return {name for name, result in report.results.items() if not result.passed}
+
+
+# --- Tests ---
+def test_published_workbook_passes(workbook, sources):
+    report = validate_workbook(workbook, sources=sources)
+    assert report.passed and set(report.results) == set(CHECKS)
+
+
+def test_broken_sheets_are_caught(workbook, sources):
+    wb = load_workbook(workbook)
+    wb["City Cases"].cell(row=2, column=3).value += 1
+    big_numbers = wb["Big Numbers UF"]
+    acre = next(row for row in range(2, big_numbers.max_row + 1) if big_numbers.cell(row, 2).value == "Acre")
+    big_numbers.cell(acre, 7).value = -1
+    del wb["SE Completa"]
+    wb.save(workbook)
+
+    report = validate_workbook(workbook, sources=sources)
+    assert failed(report) == {"update_city_cases", "big_numbers_uf", "se_completa"}
+    assert report["update_city_cases"].failures[0].startswith("Row 2 'Casos Provaveis'")
+    assert report["big_numbers_uf"].failures == ["Mismatch acre casos_provaveis: 9065 vs -1"]
+    assert report["se_completa"].failures == ["Sheet 'SE Completa' not found in workbook"]
+
+
+def test_missing_source_fails_its_checks(workbook, sources):
+    sources["big_numbers_uf"] = FileNotFoundError("big_numbers_uf_2025_06_29.yaml")
+    report = validate_workbook(workbook, sources=sources)
+    assert failed(report) == {"big_numbers_uf", "dengue_cases_year"}
+    assert report["dengue_cases_year"].failures[0].startswith("Source 'big_numbers_uf' unavailable")
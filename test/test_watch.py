@@ -0,0 +1,64 @@
+import pytest, os, sys, shutil
+from datetime import datetime
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.watch import WarmPipeline
+from modules.loaders import clear_cache
+
+
+PUBLISHED = "Epidemiology_Dengue_2025_06_29.xlsx"
+TODAY = "2025_06_30"
+
+
+class NextDay(datetime):
+    """`datetime.now()` the day after the published workbook, the day of the new snapshot."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 6, 30, 12, 0)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # A private _results/ with yesterday's workbook and today's snapshot (a copy of 2025_06_29);
+    # TEMP_DIR, SOURCE_DIR and OUTPUT_DIR are relative to it
+    (tmp_path / "_results").mkdir()
+    shutil.copy2(os.path.join(BASE_DIR, "_results", PUBLISHED), tmp_path / "_results" / PUBLISHED)
+    snapshot = tmp_path / "output" / f"dengue_{TODAY}"
+    snapshot.mkdir(parents=True)
+    source = os.path.join(BASE_DIR, "output", "dengue_2025_06_29")
+    for name in os.listdir(source):
+        shutil.copy2(os.path.join(source, name), snapshot / name.replace("2025_06_29", TODAY))
+    monkeypatch.chdir(tmp_path)
+    for module in ("modules.watch", "modules.workbook_session", "modules.validation",
+                   "data_transformation_pipeline.stages"):
+        monkeypatch.setattr(f"{module}.datetime", NextDay)
+    clear_cache()
+    yield tmp_path
+    clear_cache()
+
+
+# --- Tests ---
+def test_update_never_deletes_the_published_workbook(workspace):
+    published = workspace / "_results" / PUBLISHED
+    content = published.read_bytes()
+    pipeline = WarmPipeline(output_dir="output")
+
+    assert pipeline.update(None)
+    # Today's workbook is published next to yesterday's, which is left as it was
+    assert (workspace / "_results" / f"Epidemiology_Dengue_{TODAY}.xlsx").exists()
+    assert published.read_bytes() == content
+    # The session worked on a copy in temp/
+    assert os.path.dirname(os.path.abspath(pipeline.session.source_path)) == str(workspace / "temp")
+
+
+def test_update_stores_the_snapshot_like_main(workspace):
+    # A tree migrated to the object store: the published snapshot moves into it
+    (workspace / "output" / "_objects").mkdir()
+    assert WarmPipeline(output_dir="output").update(None)
+
+    names = os.listdir(workspace / "output" / f"dengue_{TODAY}")
+    assert names and all(name.endswith(".ref") for name in names)
@@ -0,0 +1,76 @@
+import pytest, os, sys, zipfile
+from openpyxl import Workbook, load_workbook
+from openpyxl.comments import Comment
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from modules.xlsx_patch import PatchNotPossible, STYLES_PART, save_patched, sheet_parts
+from modules.sheet_writer import register_column_style
+
+
+EDITED = ("City Cases", "SE Completa")
+
+
+@pytest.fixture
+def source(tmp_path):
+    # Two sheets the pipeline writes and one it never touches
+    wb = Workbook()
+    wb.active.title = "City Cases"
+    for name in ("Notes", "SE Completa"):
+        wb.create_sheet(name)
+    for name in wb.sheetnames:
+        for row in range(1, 50):
+            wb[name].append([f"{name} {row}", row, row * 1.5, None if row % 7 else "x"])
+    path = str(tmp_path / "source.xlsx")
+    wb.save(path)
+    return path
+
+
+def edit(wb):
+    wb["City Cases"].cell(row=2, column=2, value=12345)
+    wb["City Cases"].append(["new row", 1, 2.5])
+    wb["SE Completa"].delete_rows(40, 10)
+    style = register_column_style(wb, "test_percent", number_format="0.00%")
+    wb["SE Completa"].cell(row=3, column=3).style = style
+
+
+# --- Tests ---
+def test_patched_save_equals_a_full_save(source, tmp_path):
+    full_path, patched_path = str(tmp_path / "full.xlsx"), str(tmp_path / "patched.xlsx")
+    wb = load_workbook(source)
+    edit(wb)
+    wb.save(full_path)
+    wb = load_workbook(source)
+    edit(wb)
+    rewritten = save_patched(wb, source, patched_path, EDITED)
+
+    with zipfile.ZipFile(full_path) as full, zipfile.ZipFile(patched_path) as patched, \
+            zipfile.ZipFile(source) as src:
+        parts = sheet_parts(src)
+        assert rewritten == sorted([parts[name] for name in EDITED] + [STYLES_PART])
+        assert patched.testzip() is None and patched.namelist() == src.namelist()
+        # The edited sheets and the styles are what openpyxl writes, the rest the source's bytes
+        for part in src.namelist():
+            expected = full.read(part) if part in rewritten else src.read(part)
+            assert patched.read(part) == expected, part
+
+    full_wb, patched_wb = load_workbook(full_path), load_workbook(patched_path)
+    for name in full_wb.sheetnames:
+        assert list(patched_wb[name].iter_rows(values_only=True)) == list(full_wb[name].iter_rows(values_only=True))
+    assert patched_wb["SE Completa"].cell(row=3, column=3).number_format == "0.00%"
+
+
+def test_unchanged_styles_are_copied(source, tmp_path):
+    wb = load_workbook(source)
+    wb["City Cases"].cell(row=2, column=2, value=1)
+    assert STYLES_PART not in save_patched(wb, source, str(tmp_path / "patched.xlsx"), ("City Cases",))
+
+
+def test_sheet_with_comments_needs_a_full_save(source, tmp_path):
+    wb = load_workbook(source)
+    wb["City Cases"]["A1"].comment = Comment("note", "author")
+    with pytest.raises(PatchNotPossible):
+        save_patched(wb, source, str(tmp_path / "patched.xlsx"), ("City Cases",))
+    assert not os.path.exists(tmp_path / "patched.xlsx")